@@ -0,0 +1 @@
+"""Camada de dados e processamento compartilhada pelas páginas do dashboard."""
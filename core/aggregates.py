@@ -0,0 +1,184 @@
+"""Agregados pré-calculados dos atendimentos por município.
+
+O cubo guarda uma linha por município (UF × município × contagens) e os pares
+distintos (município, primeiro nome) com o número de atendimentos de cada um.
+Filtros, gráficos e métricas das páginas
+são respondidos a partir dele em O(#municípios), sem voltar às linhas de
+atendimento. Contagens de nomes distintos usam por padrão os sketches
+HyperLogLog de ``core.sketches``; a contagem exata continua disponível.
+"""
+import json
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from core.municipalities import SEM_MUNICIPIO
+from core.sketches import ERRO_RELATIVO_PADRAO, SketchesMunicipais, hash_valores
+
+# Tipos das colunas de texto da tabela por município, iguais no cubo montado ao
+# vivo e no reaberto de um artefato (o Censo pode vir do cache com string[pyarrow])
+TIPOS_MUNICIPIOS = {'UF': str, 'MUNICÍPIO': object}
+
+
+class CuboAtendimentos:
+    """Volume de atendimentos e nomes distintos por município (índice = código IBGE)."""
+
+    def __init__(self, municipios, pares_municipio, pares_nome, nomes, sketches, pares_volume=None):
+        self.municipios = municipios
+        self._pares_municipio = pares_municipio
+        self._pares_nome = pares_nome
+        self._pares_volume = pares_volume
+        self.nomes = nomes
+        self.sketches = sketches
+        # Identifica esta instância nas chaves dos caches derivados (ex.: figuras)
+        self.versao = uuid.uuid4().hex
+
+    @classmethod
+    def construir(cls, df_atendimentos, dimensao, ufs=None, erro_relativo=ERRO_RELATIVO_PADRAO):
+        """Monta o cubo a partir dos atendimentos normalizados (com COD_MUNICIPIO)."""
+        resolvidos = df_atendimentos[df_atendimentos['COD_MUNICIPIO'] != SEM_MUNICIPIO]
+        codigos_nome, nomes = pd.factorize(resolvidos['PRIMEIRO_NOME'])
+        pares = pd.DataFrame({
+            'COD_MUNICIPIO': resolvidos['COD_MUNICIPIO'].to_numpy(),
+            'NOME': codigos_nome,
+        }).groupby(['COD_MUNICIPIO', 'NOME']).size().reset_index(name='VOLUME')
+        return cls.de_agregados(
+            resolvidos.groupby('COD_MUNICIPIO').size(),
+            pares['COD_MUNICIPIO'].to_numpy(),
+            pares['NOME'].to_numpy(),
+            nomes,
+            dimensao,
+            ufs=ufs,
+            erro_relativo=erro_relativo,
+            pares_volume=pares['VOLUME'].to_numpy(),
+        )
+
+    @classmethod
+    def de_agregados(cls, volume, pares_municipio, pares_nome, nomes, dimensao, ufs=None,
+                     erro_relativo=ERRO_RELATIVO_PADRAO, sketches=None, pares_volume=None):
+        """Monta o cubo a partir de agregados já materializados.
+
+        ``volume`` é o número de atendimentos por código de município;
+        ``pares_municipio``/``pares_nome`` são os pares distintos (código,
+        posição do nome em ``nomes``) e ``pares_volume`` o número de
+        atendimentos de cada par. ``sketches`` já mantidos por quem chama
+        são usados como estão; sem eles, são construídos a partir dos pares.
+        """
+        municipios = dimensao.tabela[['UF', 'MUNICÍPIO', 'pessoas']]
+        if ufs is not None:
+            municipios = municipios[municipios['UF'].isin(ufs)]
+        municipios = municipios.astype(TIPOS_MUNICIPIOS).join(
+            volume.rename('VOLUME_ATENDIMENTOS').rename_axis(municipios.index.name), how='inner'
+        )
+
+        pares = pd.DataFrame({'COD_MUNICIPIO': pares_municipio, 'NOME': pares_nome})
+        if pares_volume is not None:
+            pares['VOLUME'] = pares_volume
+        pares = pares[pares['COD_MUNICIPIO'].isin(municipios.index)]
+        municipios['NOMES_UNICOS'] = (
+            pares.groupby('COD_MUNICIPIO').size().reindex(municipios.index, fill_value=0)
+        )
+        municipios['TAXA_100K'] = taxa_100k(municipios['VOLUME_ATENDIMENTOS'], municipios['pessoas'])
+        municipios['DISCREPANCIA'] = municipios['pessoas'] < municipios['VOLUME_ATENDIMENTOS']
+
+        pares_municipio = pares['COD_MUNICIPIO'].to_numpy(np.int32)
+        pares_nome = pares['NOME'].to_numpy(np.int32)
+        if sketches is None:
+            sketches = SketchesMunicipais.construir(
+                pares_municipio, hash_valores(nomes)[pares_nome], erro_relativo
+            )
+        pares_volume = pares['VOLUME'].to_numpy(np.int64) if pares_volume is not None else None
+        return cls(municipios, pares_municipio, pares_nome, pd.Index(nomes), sketches, pares_volume)
+
+    def salvar(self, diretorio):
+        """Grava o cubo em ``diretorio`` (Parquet para as tabelas, ``.npy`` para os sketches)."""
+        os.makedirs(diretorio, exist_ok=True)
+        self.municipios.to_parquet(os.path.join(diretorio, 'municipios.parquet'))
+        colunas_pares = {'COD_MUNICIPIO': self._pares_municipio, 'NOME': self._pares_nome}
+        if self._pares_volume is not None:
+            colunas_pares['VOLUME'] = self._pares_volume
+        pq.write_table(pa.table(colunas_pares), os.path.join(diretorio, 'pares.parquet'))
+        pq.write_table(pa.table({'NOME': pa.array(self.nomes.astype(str), pa.string())}),
+                       os.path.join(diretorio, 'nomes.parquet'))
+        np.save(os.path.join(diretorio, 'sketches_codigos.npy'), self.sketches.codigos)
+        np.save(os.path.join(diretorio, 'sketches_registros.npy'), self.sketches.registros)
+        with open(os.path.join(diretorio, 'sketches.json'), 'w', encoding='utf-8') as f:
+            json.dump({'precisao': self.sketches.precisao}, f)
+
+    @classmethod
+    def abrir(cls, diretorio):
+        """Cubo gravado por ``salvar``; os registradores dos sketches são mapeados, não copiados."""
+        pares = pq.read_table(os.path.join(diretorio, 'pares.parquet'), memory_map=True)
+        nomes = pq.read_table(os.path.join(diretorio, 'nomes.parquet'), memory_map=True)
+        with open(os.path.join(diretorio, 'sketches.json'), encoding='utf-8') as f:
+            precisao = json.load(f)['precisao']
+        sketches = SketchesMunicipais(
+            np.load(os.path.join(diretorio, 'sketches_codigos.npy')),
+            np.load(os.path.join(diretorio, 'sketches_registros.npy'), mmap_mode='r'),
+            precisao,
+        )
+        return cls(
+            pd.read_parquet(os.path.join(diretorio, 'municipios.parquet')).astype(TIPOS_MUNICIPIOS),
+            pares['COD_MUNICIPIO'].to_numpy(),
+            pares['NOME'].to_numpy(),
+            pd.Index(nomes['NOME'].to_pylist()),
+            sketches,
+            pares['VOLUME'].to_numpy() if 'VOLUME' in pares.column_names else None,
+        )
+
+    def filtrar(self, ufs=None, municipios=None):
+        """Linhas do cubo para as UFs e/ou códigos de município selecionados."""
+        mascara = np.ones(len(self.municipios), dtype=bool)
+        if ufs is not None:
+            mascara &= self.municipios['UF'].isin(ufs).to_numpy()
+        if municipios is not None:
+            mascara &= self.municipios.index.isin(municipios)
+        return self.municipios[mascara]
+
+    def nomes_unicos(self, codigos_municipio, exato=False):
+        """Primeiros nomes distintos no conjunto de municípios (aproximado, salvo ``exato=True``)."""
+        if not exato:
+            return self.sketches.estimar(codigos_municipio)
+        mascara = np.isin(self._pares_municipio, np.asarray(codigos_municipio))
+        return int(np.unique(self._pares_nome[mascara]).size)
+
+    def volume_por_grupo_de_nome(self, grupos, codigos_municipio=None):
+        """Atendimentos por município (linhas) e grupo de primeiro nome (colunas).
+
+        ``grupos`` é um Categorical alinhado a ``self.nomes`` (o grupo de cada
+        nome distinto, por exemplo o sexo estimado); o grupo de cada par sai
+        de uma indexação pelo código do nome, sem voltar aos atendimentos.
+        """
+        if self._pares_volume is None:
+            raise ValueError('Cubo sem atendimentos por par município × nome; gere os agregados novamente.')
+        pares = pd.DataFrame({
+            'COD_MUNICIPIO': self._pares_municipio,
+            'GRUPO': pd.Categorical.from_codes(np.asarray(grupos.codes)[self._pares_nome], dtype=grupos.dtype),
+            'VOLUME': self._pares_volume,
+        })
+        if codigos_municipio is not None:
+            pares = pares[np.isin(self._pares_municipio, np.asarray(codigos_municipio))]
+        return pares.pivot_table(
+            index='COD_MUNICIPIO', columns='GRUPO', values='VOLUME', aggfunc='sum', fill_value=0, observed=False
+        )
+
+
+def taxa_100k(atendimentos, pessoas):
+    """Atendimentos por 100 mil habitantes, com duas casas decimais."""
+    return (atendimentos / pessoas * 100000).round(2)
+
+
+def resumo_por_uf(municipios):
+    """Totais por UF de um recorte do cubo (volume, população, municípios e taxas)."""
+    resumo = municipios.groupby('UF', observed=True).agg(
+        VOLUME_ATENDIMENTOS=('VOLUME_ATENDIMENTOS', 'sum'),
+        pessoas=('pessoas', 'sum'),
+        QTD_MUNICIPIOS=('MUNICÍPIO', 'count'),
+        TAXA_100K_MEDIA=('TAXA_100K', 'mean'),
+    ).reset_index()
+    resumo['TAXA_100K'] = taxa_100k(resumo['VOLUME_ATENDIMENTOS'], resumo['pessoas'])
+    return resumo
@@ -0,0 +1,137 @@
+"""Artefatos versionados com os agregados do dashboard.
+
+O job em lote (``python -m core.batch``) grava cada execução em um diretório
+próprio dentro de ``data/artefatos`` e só então aponta o arquivo ``ATUAL``
+para ele. Um diretório publicado nunca é alterado: as páginas leem o artefato
+apontado por ``ATUAL`` enquanto as origens registradas no manifesto não
+mudarem, e recalculam ao vivo apenas na ausência de um artefato válido.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from core.aggregates import CuboAtendimentos
+from core.cache import descrever_fonte, fonte_inalterada
+
+DIRETORIO_ARTEFATOS = './data/artefatos'
+ARQUIVO_ATUAL = 'ATUAL'
+ARQUIVO_MANIFESTO = 'manifesto.json'
+# Sobe quando o conteúdo gravado muda; artefatos de formatos anteriores são recalculados
+FORMATO_ARTEFATO = 3
+
+
+def nova_versao(fontes):
+    """Nome do diretório de uma execução: instante UTC + prefixo do hash das origens."""
+    instante = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())
+    conteudo = hashlib.sha256()
+    for nome in sorted(fontes):
+        conteudo.update((fontes[nome] or {}).get('sha256', '').encode())
+    return f'{instante}-{conteudo.hexdigest()[:8]}'
+
+
+def versao_atual(diretorio=DIRETORIO_ARTEFATOS):
+    """Diretório do artefato publicado ou ``None``."""
+    ponteiro = os.path.join(diretorio, ARQUIVO_ATUAL)
+    if not os.path.exists(ponteiro):
+        return None
+    with open(ponteiro, encoding='utf-8') as f:
+        caminho = os.path.join(diretorio, f.read().strip())
+    return caminho if os.path.isdir(caminho) else None
+
+
+def ler_manifesto(caminho_versao):
+    with open(os.path.join(caminho_versao, ARQUIVO_MANIFESTO), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def artefato_valido(manifesto, caminhos_fontes, parametros):
+    """Indica se o manifesto foi gerado a partir das origens atuais e com os mesmos parâmetros."""
+    if manifesto.get('formato', 1) != FORMATO_ARTEFATO or manifesto.get('parametros') != parametros:
+        return False
+    fontes = manifesto.get('fontes', {})
+    return all(
+        nome in fontes and fonte_inalterada(fontes[nome], caminho)
+        for nome, caminho in caminhos_fontes.items()
+    )
+
+
+def localizar_valido(caminhos_fontes, parametros, diretorio=DIRETORIO_ARTEFATOS):
+    """Diretório do artefato publicado, se ele ainda corresponder às origens e parâmetros."""
+    caminho = versao_atual(diretorio)
+    if caminho is None or not artefato_valido(ler_manifesto(caminho), caminhos_fontes, parametros):
+        return None
+    return caminho
+
+
+def exportar(cubo, caminhos_fontes, parametros, diretorio=DIRETORIO_ARTEFATOS):
+    """Grava o cubo em uma nova versão e a publica como ``ATUAL``.
+
+    Só o que as páginas leem é gravado: resumos por UF, rankings e mapas são
+    derivados do cubo pelos índices de ``core.population`` e ``core.ranking``.
+    """
+    fontes = {
+        nome: descrever_fonte(caminho) if os.path.exists(caminho) else None
+        for nome, caminho in caminhos_fontes.items()
+    }
+    versao = nova_versao(fontes)
+    destino = os.path.join(diretorio, versao)
+    temporario = f'{destino}.tmp'
+    shutil.rmtree(temporario, ignore_errors=True)
+
+    cubo.salvar(temporario)
+    conferir_reabertura(cubo, temporario)
+    municipios = cubo.municipios
+
+    with open(os.path.join(temporario, ARQUIVO_MANIFESTO), 'w', encoding='utf-8') as f:
+        json.dump({
+            'versao': versao,
+            'formato': FORMATO_ARTEFATO,
+            'criado_em': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'fontes': fontes,
+            'parametros': parametros,
+            'municipios': int(len(municipios)),
+            'atendimentos': int(municipios['VOLUME_ATENDIMENTOS'].sum()),
+            'arquivos': sorted(os.listdir(temporario)),
+        }, f, ensure_ascii=False, indent=2)
+
+    os.replace(temporario, destino)
+    ponteiro = os.path.join(diretorio, ARQUIVO_ATUAL)
+    with open(f'{ponteiro}.tmp', 'w', encoding='utf-8') as f:
+        f.write(versao)
+    os.replace(f'{ponteiro}.tmp', ponteiro)
+    return destino
+
+
+def conferir_reabertura(cubo, caminho_versao):
+    """Garante que o cubo gravado em ``caminho_versao`` reabre com os mesmos tipos do cubo em memória."""
+    reabertos = CuboAtendimentos.abrir(caminho_versao).municipios.dtypes
+    if not reabertos.equals(cubo.municipios.dtypes):
+        diferentes = [
+            f'{coluna}: {cubo.municipios.dtypes.get(coluna)} → {reabertos.get(coluna)}'
+            for coluna in cubo.municipios.columns.union(reabertos.index)
+            if cubo.municipios.dtypes.get(coluna) != reabertos.get(coluna)
+        ]
+        raise ValueError(f'Cubo reaberto com tipos diferentes ({"; ".join(diferentes)})')
+
+
+def abrir_cubo(caminho_versao):
+    return CuboAtendimentos.abrir(caminho_versao)
+
+
+def remover_antigas(manter, diretorio=DIRETORIO_ARTEFATOS):
+    """Apaga as versões mais antigas, mantendo as ``manter`` mais recentes e a publicada."""
+    atual = versao_atual(diretorio)
+    versoes = sorted(
+        nome for nome in os.listdir(diretorio)
+        if os.path.isdir(os.path.join(diretorio, nome)) and not nome.endswith('.tmp')
+    )
+    removidas = []
+    for nome in versoes[:max(len(versoes) - manter, 0)]:
+        caminho = os.path.join(diretorio, nome)
+        if atual is not None and os.path.samefile(caminho, atual):
+            continue
+        shutil.rmtree(caminho)
+        removidas.append(nome)
+    return removidas
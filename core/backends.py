@@ -0,0 +1,101 @@
+"""Backends de execução do pipeline de atendimentos.
+
+``blocos`` (padrão) lê só MUNICÍPIO e PRIMEIRO_NOME em blocos de tamanho fixo
+e incorpora cada bloco aos agregados antes de ler o próximo (ver
+``core.incremental.agregar_em_blocos``); o pico de memória não cresce com o
+arquivo.
+``pandas`` carrega os atendimentos inteiros em memória, normaliza e agrega,
+mantendo as linhas normalizadas no cache colunar.
+``dask`` executa leitura → normalização → agregação particionado e fora da
+memória, usando todos os núcleos; apenas os agregados pequenos (volume por
+município e atendimentos por par município × nome) são materializados. A junção com
+o Censo e o filtro do Nordeste acontecem sobre esses agregados, que têm algumas
+centenas de milhares de linhas no pior caso.
+
+O backend é escolhido pela variável de ambiente ``SUS_BACKEND``.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from core.normalize import chave_primeiro_nome, nome_municipio, por_valores_unicos
+
+BACKENDS = ('blocos', 'pandas', 'dask')
+BACKEND_PADRAO = os.environ.get('SUS_BACKEND', 'blocos').lower()
+TAMANHO_BLOCO_DASK = os.environ.get('SUS_DASK_BLOCO', '64MB')
+AGENDADOR_DASK = os.environ.get('SUS_DASK_AGENDADOR', 'processes')
+
+
+def _normalizar_particao(particao):
+    particao = particao[particao['PRIMEIRO_NOME'].notna()]
+    return pd.DataFrame({
+        'MUNICÍPIO': particao['MUNICÍPIO'].astype(object),
+        'PRIMEIRO_NOME': por_valores_unicos(particao['PRIMEIRO_NOME'], chave_primeiro_nome).astype(object),
+    })
+
+
+def ler_dask_atendimentos(caminho, tamanho_bloco=TAMANHO_BLOCO_DASK):
+    """DADOS.txt como DataFrame Dask particionado (nada é lido até o ``compute``)."""
+    import dask.dataframe as dd
+
+    return dd.read_csv(
+        caminho,
+        dtype={'ID': 'int64', 'MUNICÍPIO': 'string', 'PRIMEIRO_NOME': 'string'},
+        blocksize=tamanho_bloco,
+    )
+
+
+def agregar_atendimentos_dask(caminho, dimensao, ufs=None, tamanho_bloco=TAMANHO_BLOCO_DASK,
+                              agendador=AGENDADOR_DASK):
+    """Agrega ``caminho`` com Dask e devolve (volume por código, pares município × nome, nomes, volume por par).
+
+    Os quatro primeiros itens seguem a ordem dos argumentos de
+    ``CuboAtendimentos.de_agregados``; o último vai em ``pares_volume``.
+    Municípios são agregados pelo nome bruto durante a leitura e só então
+    resolvidos para o código IBGE, sobre os poucos nomes distintos.
+    """
+    import dask
+
+    ddf = ler_dask_atendimentos(caminho, tamanho_bloco)[['MUNICÍPIO', 'PRIMEIRO_NOME']]
+    ddf = ddf.map_partitions(
+        _normalizar_particao,
+        meta=pd.DataFrame({'MUNICÍPIO': pd.Series(dtype=object), 'PRIMEIRO_NOME': pd.Series(dtype=object)}),
+    )
+    volume_bruto, pares_brutos = dask.compute(
+        ddf.groupby('MUNICÍPIO').size(),
+        ddf.groupby(['MUNICÍPIO', 'PRIMEIRO_NOME']).size().reset_index(),
+        scheduler=agendador,
+    )
+
+    # Resolução dos nomes de município: uma vez por nome limpo distinto
+    nomes_limpos = nome_municipio(pd.Series(volume_bruto.index, dtype=object))
+    volume_nome = pd.Series(volume_bruto.to_numpy(), index=nomes_limpos.to_numpy()).groupby(level=0).sum()
+    codigos = pd.Series(
+        dimensao.resolver_unicos(volume_nome.index, volume_nome.to_numpy(), ufs),
+        index=volume_nome.index,
+    )
+    codigo_bruto = pd.Series(codigos.reindex(nomes_limpos.to_numpy()).to_numpy(), index=volume_bruto.index)
+
+    volume = pd.Series(volume_nome.to_numpy(), index=codigos.to_numpy()).groupby(level=0).sum()
+    pares = pd.DataFrame({
+        'COD_MUNICIPIO': codigo_bruto.reindex(pares_brutos['MUNICÍPIO'].to_numpy()).to_numpy(),
+        'PRIMEIRO_NOME': pares_brutos['PRIMEIRO_NOME'].to_numpy(),
+        'VOLUME': pares_brutos.iloc[:, -1].to_numpy(),
+    })
+    pares = pares[pares['COD_MUNICIPIO'] >= 0]
+    codigos_nome, nomes = pd.factorize(pares['PRIMEIRO_NOME'])
+    pares = pd.DataFrame({
+        'COD_MUNICIPIO': pares['COD_MUNICIPIO'].to_numpy(),
+        'NOME': codigos_nome,
+        'VOLUME': pares['VOLUME'].to_numpy(),
+    }).groupby(['COD_MUNICIPIO', 'NOME']).sum().reset_index()
+
+    volume = volume[volume.index >= 0]
+    return (
+        volume,
+        pares['COD_MUNICIPIO'].to_numpy(np.int32),
+        pares['NOME'].to_numpy(np.int32),
+        nomes,
+        pares['VOLUME'].to_numpy(np.int64),
+    )
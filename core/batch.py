@@ -0,0 +1,124 @@
+"""Job em lote: calcula os agregados do dashboard fora do Streamlit e os publica.
+
+Uso (a partir da raiz do projeto, por exemplo em um cron noturno)::
+
+    python -m core.batch [--backend dask] [--erro-relativo 0.02] [--manter 3] [--forcar]
+    python -m core.batch --incremental
+    python -m core.batch --geocodificar
+    python -m core.batch --generos
+
+Sem ``--forcar`` nada é recalculado se o artefato publicado já corresponde às
+origens atuais. Com ``--incremental`` apenas as linhas acrescentadas a
+DADOS.txt desde a última execução são processadas (ver ``core.incremental``).
+``--geocodificar`` completa, pela rede, as coordenadas dos municípios que a
+malha local não cobriu (ver ``core.centroids``); é o único passo que consulta
+serviços externos.
+``--generos`` classifica, pela API de Nomes do IBGE, os primeiros nomes do cubo
+publicado que ainda não estão no cache de gêneros (ver ``core.gender``).
+O código de saída é 0 em caso de sucesso.
+"""
+import argparse
+import logging
+import time
+
+from core.artifacts import DIRETORIO_ARTEFATOS, exportar, localizar_valido, remover_antigas
+from core.backends import BACKEND_PADRAO, BACKENDS
+from core.centroids import completar_por_geocodificacao
+from core.gender import completar_generos
+from core.data import (
+    CAMINHO_ATENDIMENTOS,
+    CAMINHO_IBGE,
+    ESTADOS_NORDESTE,
+    atualizar_centroides_da_malha,
+    carregar_cubo_atendimentos,
+    carregar_dimensao_municipios,
+    ingerir,
+)
+from core.incremental import DIRETORIO_INCREMENTAL, atualizar
+from core.sketches import ERRO_RELATIVO_PADRAO
+
+logger = logging.getLogger('core.batch')
+
+
+def executar(caminho_atendimentos=CAMINHO_ATENDIMENTOS, caminho_ibge=CAMINHO_IBGE, backend=BACKEND_PADRAO,
+             erro_relativo=ERRO_RELATIVO_PADRAO, diretorio=DIRETORIO_ARTEFATOS, manter=3, forcar=False,
+             incremental=False, diretorio_incremental=DIRETORIO_INCREMENTAL):
+    """Gera e publica uma nova versão dos artefatos; devolve o diretório publicado."""
+    fontes = {'atendimentos': caminho_atendimentos, 'ibge': caminho_ibge}
+    parametros = {'erro_relativo': erro_relativo}
+
+    publicado = None if forcar else localizar_valido(fontes, parametros, diretorio)
+    if publicado is not None:
+        logger.info('Artefato %s já corresponde às origens atuais; nada a fazer', publicado)
+        return publicado
+
+    inicio = time.perf_counter()
+    if incremental:
+        estado, novas = atualizar(caminho_atendimentos, erro_relativo, diretorio_incremental)
+        logger.info('%d linhas novas incorporadas (%d no total)', novas, estado.marca['linhas'])
+        cubo = estado.cubo(carregar_dimensao_municipios(caminho_ibge), ESTADOS_NORDESTE, erro_relativo)
+    else:
+        if caminho_atendimentos == CAMINHO_ATENDIMENTOS and caminho_ibge == CAMINHO_IBGE:
+            # Caches colunares e perfis também ficam prontos para as páginas
+            ingerir(backend=backend)
+        cubo = carregar_cubo_atendimentos(
+            caminho_atendimentos, caminho_ibge, erro_relativo, backend=backend, usar_artefatos=False
+        )
+    destino = exportar(cubo, fontes, parametros, diretorio)
+    logger.info('Publicado %s (%d municípios) em %.1fs', destino, len(cubo.municipios), time.perf_counter() - inicio)
+
+    for versao in remover_antigas(manter, diretorio):
+        logger.info('Versão antiga removida: %s', versao)
+    return destino
+
+
+def geocodificar_faltantes(caminho_ibge=CAMINHO_IBGE):
+    """Completa os centroides do Nordeste: primeiro pela malha local, depois pelo geocodificador."""
+    atualizar_centroides_da_malha()
+    tabela = carregar_dimensao_municipios(caminho_ibge).tabela
+    acrescentados = completar_por_geocodificacao(tabela[tabela['UF'].isin(ESTADOS_NORDESTE)])
+    logger.info('%d municípios geocodificados', acrescentados)
+    return acrescentados
+
+
+def classificar_generos(caminho_atendimentos=CAMINHO_ATENDIMENTOS, caminho_ibge=CAMINHO_IBGE,
+                        erro_relativo=ERRO_RELATIVO_PADRAO, backend=BACKEND_PADRAO, trabalhadores=8):
+    """Classifica os primeiros nomes distintos do cubo atual ainda ausentes do cache de gêneros."""
+    cubo = carregar_cubo_atendimentos(caminho_atendimentos, caminho_ibge, erro_relativo, backend=backend)
+    acrescentados = completar_generos(cubo.nomes, trabalhadores=trabalhadores)
+    logger.info('%d nomes classificados (%d distintos no cubo)', acrescentados, len(cubo.nomes))
+    return acrescentados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pré-calcula e publica os agregados do dashboard SUS.')
+    parser.add_argument('--atendimentos', default=CAMINHO_ATENDIMENTOS, help='CSV de atendimentos')
+    parser.add_argument('--ibge', default=CAMINHO_IBGE, help='Censo por município (.zip, .csv ou .xlsx)')
+    parser.add_argument('--backend', choices=BACKENDS, default=BACKEND_PADRAO)
+    parser.add_argument('--erro-relativo', type=float, default=ERRO_RELATIVO_PADRAO,
+                        help='erro padrão dos sketches de nomes distintos')
+    parser.add_argument('--saida', default=DIRETORIO_ARTEFATOS, help='diretório dos artefatos')
+    parser.add_argument('--manter', type=int, default=3, help='versões antigas mantidas')
+    parser.add_argument('--forcar', action='store_true', help='recalcula mesmo com artefato válido')
+    parser.add_argument('--incremental', action='store_true',
+                        help='processa só as linhas acrescentadas desde a última execução')
+    parser.add_argument('--estado', default=DIRETORIO_INCREMENTAL, help='diretório do estado incremental')
+    parser.add_argument('--geocodificar', action='store_true',
+                        help='completa pela rede as coordenadas dos municípios sem centroide')
+    parser.add_argument('--generos', action='store_true',
+                        help='classifica pela rede os primeiros nomes ainda fora do cache de gêneros')
+    parser.add_argument('--trabalhadores', type=int, default=8, help='consultas simultâneas de --generos')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    if args.geocodificar:
+        geocodificar_faltantes(args.ibge)
+    destino = executar(args.atendimentos, args.ibge, args.backend, args.erro_relativo,
+                       args.saida, args.manter, args.forcar, args.incremental, args.estado)
+    if args.generos:
+        classificar_generos(args.atendimentos, args.ibge, args.erro_relativo, args.backend, args.trabalhadores)
+    print(destino)
+
+
+if __name__ == '__main__':
+    main()
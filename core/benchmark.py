@@ -0,0 +1,336 @@
+"""Benchmark reprodutível do pipeline com atendimentos sintéticos.
+
+Uso (a partir da raiz do projeto)::
+
+    python -m core.benchmark                        # 10⁴, 10⁵ e 10⁶ linhas
+    python -m core.benchmark --escalas 1e4 1e6 1e8 --repeticoes 1
+    python -m core.benchmark --comparar             # só compara as duas últimas execuções
+
+Os arquivos de atendimentos são gerados a partir dos municípios do Nordeste
+do Censo que acompanha o repositório (``data/populacao_municipios.zip``): o
+volume de cada município segue a população com um expoente maior que 1 (as
+cidades grandes concentram atendimentos) e os primeiros nomes seguem uma lei
+de Zipf com cauda longa, com as sujeiras que a normalização precisa tratar
+(nomes nulos, minúsculas, partículas "DE"/"DA", municípios sem acento e com
+espaços à direita). A mesma ``semente`` gera sempre o mesmo arquivo, que fica
+em ``data/benchmarks/dados`` e é reaproveitado.
+
+Cada etapa (carga, normalização, junção com o Censo, agregação, a mesma
+agregação como consulta planejada de ``core.query``, agregação em blocos e
+construção das figuras) é medida com ``core.instrumentation`` e os
+resultados são acrescentados a ``data/benchmarks/resultados.jsonl`` com o
+commit corrente, de modo que versões diferentes possam ser comparadas: ao
+final, a execução é comparada com a anterior e o código de saída é 1 se alguma
+etapa ficou mais lenta que ``--limite``. Só entram na comparação execuções
+do mesmo ambiente (máquina, semente e versões de Python, pandas e numpy); os
+resultados ficam só na máquina local. Para criar a referência, rode o
+benchmark uma vez no commit de partida antes de medir as mudanças: sem
+execução anterior no mesmo ambiente não há comparação, e a execução atual
+passa a ser a referência. Acima de ``LIMITE_EM_MEMORIA`` linhas
+só o caminho em blocos (o padrão do dashboard) é medido, pois as etapas em
+memória não caberiam na RAM.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.aggregates import CuboAtendimentos, resumo_por_uf
+from core.census import CAMINHO_CENSO, ler_censo
+from core.data import ESTADOS_NORDESTE, ler_csv_atendimentos
+from core.figures import (
+    figura_barras_uf,
+    figura_distribuicao_taxa,
+    figura_sunburst,
+    figura_taxa_uf,
+    figura_top_municipios,
+    figura_volume_uf,
+)
+from core.incremental import agregar_em_blocos
+from core.instrumentation import iniciar_pagina, medir
+from core.municipalities import DimensaoMunicipios
+from core.normalize import normalizar_atendimentos, normalizar_ibge, remover_acentos
+from core.query import ATRIBUTOS_MUNICIPIO, Consulta, FonteAtendimentos
+
+DIRETORIO_BENCHMARKS = './data/benchmarks'
+ESCALAS_PADRAO = (10**4, 10**5, 10**6)
+LIMITE_EM_MEMORIA = 10**7
+LINHAS_POR_BLOCO_GERADO = 1_000_000
+# Campos do contexto que precisam coincidir para duas execuções serem comparáveis
+AMBIENTE = ('maquina', 'semente', 'python', 'pandas', 'numpy')
+
+# Forma das distribuições sintéticas
+EXPOENTE_POPULACAO = 1.15
+EXPOENTE_ZIPF_NOMES = 1.07
+TAMANHO_CAUDA_NOMES = 20_000
+FRACAO_NOMES_NULOS = 0.01
+FRACAO_NOMES_MINUSCULOS = 0.03
+FRACAO_NOMES_SEM_ACENTO = 0.05
+FRACAO_MUNICIPIOS_SEM_ACENTO = 0.02
+
+NOMES_COMUNS = [
+    'MARIA', 'JOSÉ', 'ANA', 'JOÃO', 'ANTÔNIO', 'FRANCISCO', 'FRANCISCA', 'CARLOS', 'PAULO', 'PEDRO',
+    'LUCAS', 'LUIZ', 'MARCOS', 'LUIS', 'GABRIEL', 'RAFAEL', 'ANTÔNIA', 'DANIEL', 'MARCELO', 'BRUNO',
+    'EDUARDO', 'FELIPE', 'RAIMUNDO', 'RODRIGO', 'MANOEL', 'MATEUS', 'ANDRÉ', 'FERNANDO', 'FÁBIO', 'LEONARDO',
+    'GUSTAVO', 'GUILHERME', 'LEANDRO', 'TIAGO', 'ANDERSON', 'RICARDO', 'MÁRCIO', 'JORGE', 'SEBASTIÃO', 'ALEXANDRE',
+    'ADRIANA', 'JULIANA', 'MÁRCIA', 'FERNANDA', 'PATRÍCIA', 'ALINE', 'SANDRA', 'CAMILA', 'AMANDA', 'BRUNA',
+    'JÉSSICA', 'LETÍCIA', 'JÚLIA', 'LUCIANA', 'VANESSA', 'MARIANA', 'GABRIELA', 'VERA', 'VITÓRIA', 'LARISSA',
+    'CLÁUDIA', 'BEATRIZ', 'LUANA', 'RITA', 'SÔNIA', 'RENATA', 'ELIANE', 'JOSEFA', 'SEVERINA', 'RAIMUNDA',
+    'MARIA DE FÁTIMA', 'MARIA DAS GRAÇAS', 'MARIA DO SOCORRO', 'JOSÉ DA SILVA', 'ANA DE JESUS',
+]
+SILABAS = ['BA', 'BE', 'CA', 'CI', 'DA', 'DE', 'EL', 'FA', 'GI', 'JA', 'JO', 'KE', 'LA', 'LI', 'LU', 'MA',
+           'MI', 'NA', 'NE', 'NO', 'RA', 'RE', 'RI', 'SA', 'SE', 'TA', 'TE', 'VA', 'VI', 'WE', 'YA', 'ZE']
+
+
+def vocabulario_nomes(rng, tamanho_cauda=TAMANHO_CAUDA_NOMES):
+    """Primeiros nomes (comuns seguidos de uma cauda sintética) e suas probabilidades de Zipf."""
+    silabas = np.array(SILABAS, dtype=object)
+    quantidade = rng.integers(2, 5, tamanho_cauda)
+    cauda = {
+        ''.join(silabas[rng.integers(0, len(silabas), k)])
+        for k in quantidade
+    } - set(NOMES_COMUNS)
+    nomes = np.array(NOMES_COMUNS + sorted(cauda), dtype=object)
+    pesos = 1.0 / np.arange(1, len(nomes) + 1) ** EXPOENTE_ZIPF_NOMES
+    return nomes, pesos / pesos.sum()
+
+
+def _variantes(fracoes, rng, tamanho):
+    """Variante de sujeira de cada linha: 0 = original, ``i`` = i-ésima fração de ``fracoes``."""
+    sorteio = rng.random(tamanho)
+    variante = np.zeros(tamanho, dtype=np.int8)
+    limite = 0.0
+    for codigo, fracao in enumerate(fracoes, start=1):
+        variante[(sorteio >= limite) & (sorteio < limite + fracao)] = codigo
+        limite += fracao
+    return variante
+
+
+def gerar_atendimentos(caminho, linhas, censo, semente=0, linhas_por_bloco=LINHAS_POR_BLOCO_GERADO):
+    """Grava ``linhas`` atendimentos sintéticos (ID, MUNICÍPIO, PRIMEIRO_NOME) em ``caminho``."""
+    rng = np.random.default_rng(semente)
+    nordeste = censo[censo['UF'].isin(ESTADOS_NORDESTE)]
+    nomes_municipio = nordeste['Municípios'].astype(object).str.upper()
+    # Municípios como no extrato do SUS: maiúsculos e completados com espaços até 100 caracteres
+    municipios = np.stack([
+        nomes_municipio.str.ljust(100).to_numpy(),
+        remover_acentos(nomes_municipio).str.ljust(100).to_numpy(),
+    ])
+    pesos_municipio = nordeste['pessoas'].to_numpy(np.float64) ** EXPOENTE_POPULACAO
+    pesos_municipio /= pesos_municipio.sum()
+
+    nomes, pesos_nome = vocabulario_nomes(rng)
+    serie_nomes = pd.Series(nomes, dtype=object)
+    nomes = np.stack([
+        nomes,
+        serie_nomes.str.lower().to_numpy(),
+        remover_acentos(serie_nomes).to_numpy(),
+        np.full(len(nomes), None, dtype=object),
+    ])
+
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    temporario = f'{caminho}.tmp'
+    with open(temporario, 'w', encoding='utf-8', newline='') as f:
+        for inicio in range(0, linhas, linhas_por_bloco):
+            tamanho = min(linhas_por_bloco, linhas - inicio)
+            posicao_municipio = rng.choice(len(pesos_municipio), tamanho, p=pesos_municipio)
+            variante_municipio = _variantes([FRACAO_MUNICIPIOS_SEM_ACENTO], rng, tamanho)
+            posicao_nome = rng.choice(len(pesos_nome), tamanho, p=pesos_nome)
+            variante_nome = _variantes(
+                [FRACAO_NOMES_MINUSCULOS, FRACAO_NOMES_SEM_ACENTO, FRACAO_NOMES_NULOS], rng, tamanho
+            )
+            pd.DataFrame({
+                'ID': np.arange(inicio + 1, inicio + tamanho + 1),
+                'MUNICÍPIO': municipios[variante_municipio, posicao_municipio],
+                'PRIMEIRO_NOME': nomes[variante_nome, posicao_nome],
+            }).to_csv(f, index=False, header=inicio == 0)
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def dataset_sintetico(linhas, censo, semente=0, diretorio=DIRETORIO_BENCHMARKS):
+    """Caminho do arquivo sintético de ``linhas`` atendimentos, gerando-o se ainda não existir."""
+    caminho = os.path.join(diretorio, 'dados', f'atendimentos_{linhas}_{semente}.csv')
+    if not os.path.exists(caminho):
+        gerar_atendimentos(caminho, linhas, censo, semente)
+    return caminho
+
+
+def _construir_figuras(cubo):
+    municipios = cubo.municipios
+    bi = municipios.rename(columns={'VOLUME_ATENDIMENTOS': 'TOTAL_ATENDIMENTOS'}).reset_index()
+    resumo_uf = resumo_por_uf(municipios).rename(columns={'VOLUME_ATENDIMENTOS': 'TOTAL_ATENDIMENTOS'})
+    return [
+        figura_volume_uf(resumo_uf),
+        figura_taxa_uf(resumo_uf),
+        figura_top_municipios(bi.nlargest(15, 'TOTAL_ATENDIMENTOS')),
+        figura_distribuicao_taxa(bi),
+        figura_barras_uf(municipios[['UF', 'MUNICÍPIO', 'VOLUME_ATENDIMENTOS']]),
+        figura_sunburst(municipios[['UF', 'MUNICÍPIO', 'VOLUME_ATENDIMENTOS']]),
+    ]
+
+
+def medir_pipeline(caminho, dimensao, em_memoria=True, caminho_censo=CAMINHO_CENSO):
+    """Executa o pipeline uma vez sobre ``caminho`` e devolve as etapas medidas (nível 0)."""
+    execucao = iniciar_pagina('benchmark')
+    with medir('agregacao_blocos', caminho) as etapa:
+        estado = agregar_em_blocos(caminho, progresso=False)
+        cubo = etapa.saida(estado.cubo(dimensao, ufs=ESTADOS_NORDESTE))
+        etapa.linhas_entrada = estado.marca['linhas']
+
+    if em_memoria:
+        with medir('carga') as etapa:
+            brutos = etapa.saida(ler_csv_atendimentos(caminho))
+        with medir('normalizacao', brutos) as etapa:
+            df = etapa.saida(normalizar_atendimentos(brutos))
+        del brutos
+        with medir('juncao', df) as etapa:
+            df['COD_MUNICIPIO'] = dimensao.resolver(df['MUNICÍPIO'], ufs=ESTADOS_NORDESTE)
+            etapa.linhas_saida = int((df['COD_MUNICIPIO'] >= 0).sum())
+        with medir('agregacao', df) as etapa:
+            cubo = etapa.saida(CuboAtendimentos.construir(df, dimensao, ufs=ESTADOS_NORDESTE))
+        del df
+        # Mesmo resultado por município, com filtro e projeção antes da normalização e da junção
+        consulta = (
+            Consulta(FonteAtendimentos(caminho, caminho_censo))
+            .agregar(*ATRIBUTOS_MUNICIPIO)
+            .filtrar_ufs(ESTADOS_NORDESTE)
+        )
+        with medir('consulta_planejada') as etapa:
+            etapa.saida(consulta.executar())
+
+    with medir('figuras', cubo) as etapa:
+        etapa.linhas_saida = len(_construir_figuras(cubo))
+    return [e for e in execucao['etapas'] if e.nivel == 0]
+
+
+def _commit_atual():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        alterado = bool(subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True, check=True
+        ).stdout.strip())
+        return commit, alterado
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def executar(escalas=ESCALAS_PADRAO, repeticoes=3, semente=0, diretorio=DIRETORIO_BENCHMARKS,
+             caminho_censo=CAMINHO_CENSO):
+    """Mede todas as escalas e acrescenta os resultados a ``resultados.jsonl``; devolve-os em DataFrame."""
+    censo = ler_censo(caminho_censo)
+    dimensao = DimensaoMunicipios(normalizar_ibge(censo))
+    commit, alterado = _commit_atual()
+    contexto = {
+        'execucao': datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ'),
+        'commit': commit,
+        'alterado': alterado,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'maquina': f'{platform.system()}-{platform.machine()}-{os.cpu_count()}cpu',
+        'semente': semente,
+    }
+
+    registros = []
+    for linhas in escalas:
+        inicio = time.perf_counter()
+        caminho = dataset_sintetico(linhas, censo, semente, diretorio)
+        print(f'{linhas:>12,} linhas: dados prontos em {time.perf_counter() - inicio:.1f}s', file=sys.stderr)
+
+        medidas = {}
+        for _ in range(repeticoes):
+            for etapa in medir_pipeline(caminho, dimensao, linhas <= LIMITE_EM_MEMORIA, caminho_censo):
+                medidas.setdefault(etapa.nome, []).append(etapa)
+        for nome, etapas in medidas.items():
+            tempos = [e.segundos * 1000 for e in etapas]
+            registros.append({
+                **contexto,
+                'escala': linhas,
+                'etapa': nome,
+                'repeticoes': len(tempos),
+                'ms_mediana': round(float(np.median(tempos)), 3),
+                'ms_min': round(min(tempos), 3),
+                'linhas_entrada': etapas[-1].linhas_entrada,
+                'linhas_saida': etapas[-1].linhas_saida,
+                'memoria_delta_bytes': etapas[-1].memoria_delta,
+            })
+
+    os.makedirs(diretorio, exist_ok=True)
+    with open(os.path.join(diretorio, 'resultados.jsonl'), 'a', encoding='utf-8') as f:
+        for registro in registros:
+            f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+    return pd.DataFrame(registros)
+
+
+def ler_resultados(diretorio=DIRETORIO_BENCHMARKS):
+    caminho = os.path.join(diretorio, 'resultados.jsonl')
+    if not os.path.exists(caminho):
+        return pd.DataFrame()
+    return pd.read_json(caminho, lines=True, dtype={'execucao': str, 'commit': str})
+
+
+def comparar(resultados, limite=0.2):
+    """Última execução contra a anterior no mesmo ambiente, por escala e etapa.
+
+    Só conta como anterior uma execução com a mesma máquina, semente e versões
+    de Python, pandas e numpy (``AMBIENTE``); sem ela, devolve um DataFrame
+    vazio. ``regressao`` marca as etapas que pioraram mais que ``limite``.
+    """
+    if resultados.empty:
+        return pd.DataFrame()
+    execucoes = resultados.drop_duplicates('execucao').sort_values('execucao')
+    ambiente = execucoes[list(AMBIENTE)].astype(str).agg('|'.join, axis=1)
+    mesmas = execucoes[ambiente == ambiente.iloc[-1]]['execucao'].tolist()
+    if len(mesmas) < 2:
+        return pd.DataFrame()
+    chave = ['escala', 'etapa']
+    anterior = resultados[resultados['execucao'] == mesmas[-2]].set_index(chave)
+    atual = resultados[resultados['execucao'] == mesmas[-1]].set_index(chave)
+    comparacao = pd.DataFrame({
+        'ms_antes': anterior['ms_mediana'],
+        'ms_agora': atual['ms_mediana'],
+    }).dropna()
+    comparacao['variacao'] = comparacao['ms_agora'] / comparacao['ms_antes'] - 1
+    comparacao['regressao'] = comparacao['variacao'] > limite
+    comparacao.attrs['versoes'] = (
+        f"{anterior['commit'].iloc[0]} ({mesmas[-2]}) → {atual['commit'].iloc[0]} ({mesmas[-1]})"
+    )
+    return comparacao.sort_index()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark do pipeline com atendimentos sintéticos.')
+    parser.add_argument('--escalas', nargs='+', type=lambda v: int(float(v)), default=list(ESCALAS_PADRAO),
+                        help='quantidades de linhas (aceita notação como 1e6)')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--saida', default=DIRETORIO_BENCHMARKS, help='diretório dos dados e resultados')
+    parser.add_argument('--limite', type=float, default=0.2, help='piora relativa considerada regressão')
+    parser.add_argument('--comparar', action='store_true', help='apenas compara as duas últimas execuções')
+    args = parser.parse_args(argv)
+
+    if not args.comparar:
+        medidos = executar(args.escalas, args.repeticoes, args.semente, args.saida)
+        print(medidos.pivot(index='etapa', columns='escala', values='ms_mediana').to_string())
+
+    comparacao = comparar(ler_resultados(args.saida), args.limite)
+    if comparacao.empty:
+        print('\nSem execução anterior no mesmo ambiente: esta execução passa a ser a referência.', file=sys.stderr)
+        return 0
+    print(f"\nComparação {comparacao.attrs['versoes']}:")
+    print(comparacao.to_string(formatters={'variacao': '{:+.1%}'.format}))
+    return 1 if comparacao['regressao'].any() else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
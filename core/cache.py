@@ -0,0 +1,117 @@
+"""Cache colunar (Parquet) dos datasets brutos.
+
+Na primeira carga cada CSV é convertido em um arquivo Parquet tipado dentro de
+``data/cache``. As cargas seguintes leem o Parquet com memory-mapping e só
+voltam ao CSV quando o arquivo de origem muda. A origem é identificada por
+mtime + tamanho; quando esses mudam, o hash do conteúdo decide se o cache
+ainda vale (um ``touch`` ou uma cópia não invalidam o cache). Caches derivados
+por uma regra que pode mudar (por exemplo, a resolução de municípios) também
+gravam os ``parametros`` dessa regra e são refeitos quando eles mudam.
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DIRETORIO_CACHE = './data/cache'
+CHAVE_METADADOS = b'sus_fonte'
+
+# Strings voltam do Parquet como strings Arrow, sem conversão para objetos Python
+_TIPOS_ARROW = {
+    pa.string(): pd.StringDtype('pyarrow'),
+    pa.large_string(): pd.StringDtype('pyarrow'),
+}
+
+
+def assinatura_arquivo(caminho):
+    """Identificador barato de versão do arquivo: (mtime em ns, tamanho em bytes)."""
+    info = os.stat(caminho)
+    return (info.st_mtime_ns, info.st_size)
+
+
+def hash_arquivo(caminho, tamanho_bloco=1 << 20):
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def caminho_cache(nome, diretorio=DIRETORIO_CACHE):
+    return os.path.join(diretorio, f'{nome}.parquet')
+
+
+def descrever_fonte(caminho_fonte):
+    """Versão do arquivo de origem gravada junto dos artefatos derivados dele."""
+    mtime_ns, tamanho = assinatura_arquivo(caminho_fonte)
+    return {
+        'caminho': caminho_fonte,
+        'mtime_ns': mtime_ns,
+        'tamanho': tamanho,
+        'sha256': hash_arquivo(caminho_fonte),
+    }
+
+
+def fonte_inalterada(fonte, caminho_fonte):
+    """Indica se ``caminho_fonte`` ainda tem o conteúdo descrito por ``fonte``."""
+    if not os.path.exists(caminho_fonte):
+        # Sem a origem, o artefato derivado é a única cópia disponível
+        return True
+    if fonte is None:
+        return False
+    mtime_ns, tamanho = assinatura_arquivo(caminho_fonte)
+    if fonte['mtime_ns'] == mtime_ns and fonte['tamanho'] == tamanho:
+        return True
+    return tamanho == fonte['tamanho'] and hash_arquivo(caminho_fonte) == fonte['sha256']
+
+
+def _ler_metadados(caminho_parquet):
+    metadados = pq.read_schema(caminho_parquet).metadata or {}
+    if CHAVE_METADADOS not in metadados:
+        return None
+    return json.loads(metadados[CHAVE_METADADOS])
+
+
+def cache_valido(caminho_parquet, caminho_fonte, parametros=None):
+    """Indica se o Parquet ainda corresponde ao conteúdo atual do arquivo de origem e aos ``parametros``."""
+    if not os.path.exists(caminho_parquet):
+        return False
+    fonte = _ler_metadados(caminho_parquet)
+    if fonte is not None and fonte.get('parametros') != parametros:
+        return False
+    return fonte_inalterada(fonte, caminho_fonte)
+
+
+def gravar_cache(df, caminho_parquet, caminho_fonte, parametros=None):
+    """Grava ``df`` em Parquet registrando a versão do arquivo de origem (e os ``parametros``) nos metadados."""
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    metadados = dict(tabela.schema.metadata or {})
+    fonte = descrever_fonte(caminho_fonte)
+    if parametros is not None:
+        fonte['parametros'] = parametros
+    metadados[CHAVE_METADADOS] = json.dumps(fonte).encode()
+    tabela = tabela.replace_schema_metadata(metadados)
+
+    os.makedirs(os.path.dirname(caminho_parquet), exist_ok=True)
+    temporario = f'{caminho_parquet}.tmp'
+    pq.write_table(tabela, temporario)
+    os.replace(temporario, caminho_parquet)
+
+
+def ler_cache(caminho_parquet):
+    tabela = pq.read_table(caminho_parquet, memory_map=True)
+    return tabela.to_pandas(types_mapper=_TIPOS_ARROW.get)
+
+
+def carregar_com_cache(nome, caminho_fonte, ler_fonte, diretorio=DIRETORIO_CACHE, parametros=None):
+    """Lê o dataset ``nome`` do cache ou, se estiver desatualizado, de ``ler_fonte(caminho_fonte)``."""
+    caminho_parquet = caminho_cache(nome, diretorio)
+    if cache_valido(caminho_parquet, caminho_fonte, parametros):
+        return ler_cache(caminho_parquet)
+
+    df = ler_fonte(caminho_fonte)
+    gravar_cache(df, caminho_parquet, caminho_fonte, parametros)
+    return df
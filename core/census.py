@@ -0,0 +1,73 @@
+"""Leitura da população residente por município (Censo 2022).
+
+O repositório traz o Censo compactado em ``data/populacao_municipios.zip``,
+com o mesmo conteúdo em ``.csv`` e ``.xlsx``. O CSV é lido direto de dentro do
+``.zip``, em streaming, sem extrair nada para o disco; a planilha só é usada
+quando o arquivo não tem CSV, pois sua leitura é bem mais lenta. Caminhos para
+um ``.csv`` ou ``.xlsx`` já extraído também são aceitos.
+
+Os nomes dos membros são comparados já decodificados: arquivos ``.zip`` sem a
+marca de UTF-8 têm os nomes reinterpretados (``cp437`` → UTF-8), então nomes
+acentuados como "População" funcionam nos dois casos.
+"""
+import zipfile
+
+import pandas as pd
+
+CAMINHO_CENSO = './data/populacao_municipios.zip'
+
+TIPOS_IBGE = {
+    'Municípios': 'string[pyarrow]',
+    'Código municipal': 'int32',
+    'UF': 'category',
+    'pessoas': 'int64',
+}
+
+# Bit 11 dos flags: nome do membro gravado em UTF-8
+_FLAG_UTF8 = 0x800
+
+
+def nome_membro(info):
+    """Nome de um membro do ``.zip`` decodificado corretamente."""
+    if info.flag_bits & _FLAG_UTF8:
+        return info.filename
+    try:
+        return info.filename.encode('cp437').decode('utf-8')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return info.filename
+
+
+def localizar_membro(arquivo, extensao):
+    """Primeiro membro de ``arquivo`` (``ZipFile``) com a ``extensao`` pedida, ou ``None``."""
+    for info in arquivo.infolist():
+        if not info.is_dir() and nome_membro(info).lower().endswith(extensao):
+            return info
+    return None
+
+
+def _ler_csv(origem):
+    return pd.read_csv(origem, sep=';', dtype=TIPOS_IBGE, encoding='utf-8-sig')
+
+
+def _ler_xlsx(origem):
+    return pd.read_excel(origem, dtype={coluna: 'object' for coluna in TIPOS_IBGE}).astype(TIPOS_IBGE)
+
+
+def ler_censo(caminho=CAMINHO_CENSO):
+    """Censo por município (Municípios, Código municipal, UF, pessoas) com os tipos de ``TIPOS_IBGE``."""
+    # Uma planilha .xlsx também é um .zip: a extensão decide antes do conteúdo
+    if caminho.lower().endswith('.xlsx'):
+        return _ler_xlsx(caminho)
+    if not zipfile.is_zipfile(caminho):
+        return _ler_csv(caminho)
+
+    with zipfile.ZipFile(caminho) as arquivo:
+        membro = localizar_membro(arquivo, '.csv')
+        if membro is not None:
+            with arquivo.open(membro) as f:
+                return _ler_csv(f)
+        membro = localizar_membro(arquivo, '.xlsx')
+        if membro is None:
+            raise FileNotFoundError(f'{caminho} não contém o Censo em .csv nem em .xlsx')
+        with arquivo.open(membro) as f:
+            return _ler_xlsx(f)
@@ -0,0 +1,150 @@
+"""Coordenadas (centroides) dos municípios, indexadas pelo código IBGE.
+
+As coordenadas ficam em ``data/cache/centroides.parquet`` e são calculadas
+fora do caminho das páginas: a partir da malha municipal (``core.geometry``),
+quando ela existe, ou por geocodificação com o geopy no job em lote
+(``python -m core.batch --geocodificar``), que só consulta os municípios ainda
+sem coordenada. As páginas apenas leem o arquivo e fazem buscas vetorizadas
+por código; nenhuma chamada de rede acontece durante uma requisição.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from core.cache import DIRETORIO_CACHE
+
+CAMINHO_CENTROIDES = os.path.join(DIRETORIO_CACHE, 'centroides.parquet')
+CRS_METRICO = 5880  # SIRGAS 2000 / Brazil Polyconic, para centroides em metros
+AGENTE_GEOCODIFICADOR = 'analise-ibge-sus'
+
+# Usadas apenas enquanto não há coordenadas municipais gravadas
+CENTROIDES_UF_APROXIMADOS = {
+    'MA': {'lat': -4.9609, 'lon': -45.2744, 'nome': 'Maranhão'},
+    'PI': {'lat': -8.2377, 'lon': -43.1001, 'nome': 'Piauí'},
+    'CE': {'lat': -5.4984, 'lon': -39.3206, 'nome': 'Ceará'},
+    'RN': {'lat': -5.4026, 'lon': -36.9541, 'nome': 'Rio Grande do Norte'},
+    'PB': {'lat': -7.2400, 'lon': -36.7810, 'nome': 'Paraíba'},
+    'PE': {'lat': -8.8137, 'lon': -36.9541, 'nome': 'Pernambuco'},
+    'AL': {'lat': -9.5713, 'lon': -36.7820, 'nome': 'Alagoas'},
+    'SE': {'lat': -10.5741, 'lon': -37.3857, 'nome': 'Sergipe'},
+    'BA': {'lat': -12.5797, 'lon': -41.7007, 'nome': 'Bahia'},
+}
+
+
+def centroides_da_malha(caminho_malha, coluna_codigo='CD_MUN'):
+    """Centroide de cada município da malha (calculado em projeção métrica)."""
+    import geopandas as gpd
+
+    malha = gpd.read_file(caminho_malha, columns=[coluna_codigo])
+    pontos = malha.to_crs(CRS_METRICO).geometry.centroid.to_crs(4326)
+    return pd.DataFrame(
+        {'lat': pontos.y.to_numpy(), 'lon': pontos.x.to_numpy(), 'origem': 'malha'},
+        index=pd.Index(malha[coluna_codigo].astype(np.int32), name='Código municipal'),
+    )
+
+
+def geocodificar(tabela, pausa=1.0):
+    """Gera ``(código, lat, lon)`` via Nominatim para os municípios de ``tabela`` (MUNICÍPIO, UF).
+
+    Faz uma requisição por município, com ``pausa`` segundos entre elas
+    (política de uso do Nominatim). Municípios não encontrados são pulados.
+    """
+    from geopy.extra.rate_limiter import RateLimiter
+    from geopy.geocoders import Nominatim
+
+    buscar = RateLimiter(Nominatim(user_agent=AGENTE_GEOCODIFICADOR).geocode, min_delay_seconds=pausa)
+    for codigo, nome, uf in zip(tabela.index, tabela['MUNICÍPIO'], tabela['UF']):
+        local = buscar(f'{nome}, {uf}', country_codes='br', featuretype='city')
+        if local is not None:
+            yield codigo, local.latitude, local.longitude
+
+
+def completar_por_geocodificacao(tabela, caminho=CAMINHO_CENTROIDES, gravar_a_cada=50, pausa=1.0):
+    """Geocodifica os municípios de ``tabela`` ainda sem coordenada, gravando o progresso em lotes.
+
+    Uma execução interrompida perde no máximo ``gravar_a_cada`` consultas.
+    Devolve quantos municípios foram acrescentados.
+    """
+    from tqdm import tqdm
+
+    existentes = ler_centroides(caminho)
+    if existentes is not None:
+        tabela = tabela[~tabela.index.isin(existentes.index)]
+
+    lote, total = [], 0
+    for linha in tqdm(geocodificar(tabela, pausa), total=len(tabela), desc='Geocodificando'):
+        lote.append(linha)
+        if len(lote) >= gravar_a_cada:
+            total += _gravar_lote(lote, caminho)
+            lote = []
+    if lote:
+        total += _gravar_lote(lote, caminho)
+    return total
+
+
+def _gravar_lote(lote, caminho):
+    codigos, lat, lon = zip(*lote)
+    gravar_centroides(pd.DataFrame(
+        {'lat': lat, 'lon': lon, 'origem': 'geocodificador'},
+        index=pd.Index(codigos, name='Código municipal'),
+    ), caminho)
+    return len(lote)
+
+
+def ler_centroides(caminho=CAMINHO_CENTROIDES):
+    """Centroides gravados (índice = código IBGE) ou ``None``."""
+    if not os.path.exists(caminho):
+        return None
+    return pq.read_table(caminho).to_pandas()
+
+
+def gravar_centroides(centroides, caminho=CAMINHO_CENTROIDES):
+    """Grava ``centroides`` somando-os aos já existentes (os novos prevalecem)."""
+    existentes = ler_centroides(caminho)
+    if existentes is not None:
+        centroides = pd.concat([existentes[~existentes.index.isin(centroides.index)], centroides])
+    centroides = centroides.sort_index()
+    centroides.index = centroides.index.astype(np.int32)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    pq.write_table(pa.Table.from_pandas(centroides), f'{caminho}.tmp')
+    os.replace(f'{caminho}.tmp', caminho)
+    return centroides
+
+
+def coordenadas(centroides, codigos):
+    """Latitude e longitude (arrays, NaN quando desconhecidas) para cada código em ``codigos``."""
+    posicoes = centroides.index.get_indexer(np.asarray(codigos))
+    encontrados = posicoes >= 0
+    lat = np.full(len(posicoes), np.nan)
+    lon = np.full(len(posicoes), np.nan)
+    lat[encontrados] = centroides['lat'].to_numpy()[posicoes[encontrados]]
+    lon[encontrados] = centroides['lon'].to_numpy()[posicoes[encontrados]]
+    return lat, lon
+
+
+def centroides_por_uf(municipios, centroides=None):
+    """Posição de cada UF: média dos centroides municipais ponderada pela população.
+
+    Sem coordenadas municipais, recai nos centroides aproximados das UFs.
+    """
+    ufs = pd.Index(municipios['UF'].unique(), name='UF')
+    if centroides is not None:
+        lat, lon = coordenadas(centroides, municipios.index)
+        conhecidos = ~np.isnan(lat)
+        if conhecidos.any():
+            pesos = municipios['pessoas'].to_numpy(np.float64)[conhecidos]
+            ponderado = pd.DataFrame({
+                'UF': municipios['UF'].to_numpy()[conhecidos],
+                'lat': lat[conhecidos] * pesos,
+                'lon': lon[conhecidos] * pesos,
+                'peso': pesos,
+            }).groupby('UF').sum()
+            return pd.DataFrame({
+                'lat': ponderado['lat'] / ponderado['peso'],
+                'lon': ponderado['lon'] / ponderado['peso'],
+            }).reindex(ufs)
+    aproximados = pd.DataFrame.from_dict(CENTROIDES_UF_APROXIMADOS, orient='index')[['lat', 'lon']]
+    return aproximados.reindex(ufs)
@@ -0,0 +1,391 @@
+"""Acesso aos datasets compartilhado entre todas as sessões do Streamlit.
+
+Cada arquivo é lido uma única vez por processo do servidor e o mesmo objeto é
+entregue a todas as sessões. Os DataFrames retornados devem ser tratados como
+somente leitura: páginas que precisam alterar colunas devem trabalhar sobre
+uma cópia ou sobre um recorte.
+
+A leitura passa pelo cache colunar de ``core.cache``; o CSV só é processado
+quando o cache não existe ou está desatualizado.
+"""
+import os
+
+import pandas as pd
+import streamlit as st
+
+from core.aggregates import CuboAtendimentos
+from core.artifacts import abrir_cubo, localizar_valido
+from core.backends import BACKEND_PADRAO, BACKENDS, agregar_atendimentos_dask, ler_dask_atendimentos
+from core.cache import assinatura_arquivo, carregar_com_cache
+from core.census import CAMINHO_CENSO, ler_censo
+from core.gender import CAMINHO_GENEROS, ler_generos, sexo_dos_nomes
+from core.centroids import CAMINHO_CENTROIDES, centroides_da_malha, gravar_centroides, ler_centroides
+from core.filters import IndiceFiltros
+from core.geometry import NIVEIS_DETALHE, NIVEL_PADRAO, carregar_geojson, localizar_malha
+from core.instrumentation import cronometrar, medir
+from core.incremental import LINHAS_BLOCO, agregar_em_blocos
+from core.municipalities import VERSAO_RESOLUCAO, DimensaoMunicipios
+from core.normalize import normalizar_atendimentos, normalizar_ibge
+from core.population import IndicePopulacional
+from core.ranking import RankingMunicipios
+from core.profiling import carregar_perfil, perfil_dataset, perfil_dataset_dask, perfil_em_blocos
+from core.spatial import IndiceEspacial
+from core.sketches import ERRO_RELATIVO_PADRAO
+
+CAMINHO_ATENDIMENTOS = './data/DADOS.txt'
+# Lido direto do .zip versionado (ver core.census)
+CAMINHO_IBGE = CAMINHO_CENSO
+
+ESTADOS_NORDESTE = ["MA", "PI", "CE", "RN", "PB", "PE", "AL", "SE", "BA"]
+
+TIPOS_ATENDIMENTOS = {
+    'ID': 'int64',
+    'MUNICÍPIO': 'category',
+    'PRIMEIRO_NOME': 'string[pyarrow]',
+}
+# Fora do backend pandas, as páginas só materializam as primeiras linhas dos atendimentos
+LINHAS_PREVIA = 10_000
+
+
+def versao_arquivo(caminho):
+    """Chave de versão usada pelo cache em memória; ``None`` se só existir o cache em disco."""
+    if not os.path.exists(caminho):
+        return None
+    return assinatura_arquivo(caminho)
+
+
+@cronometrar('csv.atendimentos')
+def ler_csv_atendimentos(caminho):
+    return pd.read_csv(caminho, dtype=TIPOS_ATENDIMENTOS)
+
+
+@cronometrar('csv.ibge')
+def ler_csv_ibge(caminho):
+    return ler_censo(caminho)
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _ler_atendimentos(caminho, versao):
+    return carregar_com_cache('atendimentos', caminho, ler_csv_atendimentos)
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _ler_ibge(caminho, versao):
+    return carregar_com_cache('ibge', caminho, ler_csv_ibge)
+
+
+def _preparar_atendimentos(caminho, versao):
+    brutos = _ler_atendimentos(caminho, versao)
+    with medir('normalizacao.atendimentos', brutos) as etapa:
+        df = etapa.saida(normalizar_atendimentos(brutos))
+    with medir('resolucao.municipios', df):
+        df['COD_MUNICIPIO'] = carregar_dimensao_municipios().resolver(df['MUNICÍPIO'], ufs=ESTADOS_NORDESTE)
+    return df
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _ler_atendimentos_normalizados(caminho, versao):
+    return carregar_com_cache(
+        'atendimentos_normalizados',
+        caminho,
+        lambda c: _preparar_atendimentos(c, versao),
+        parametros={'resolucao': VERSAO_RESOLUCAO},
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _ler_ibge_normalizado(caminho, versao):
+    return carregar_com_cache(
+        'ibge_normalizado',
+        caminho,
+        lambda c: normalizar_ibge(_ler_ibge(c, versao)),
+    )
+
+
+def carregar_atendimentos(caminho=CAMINHO_ATENDIMENTOS):
+    """Atendimentos SUS (ID, MUNICÍPIO, PRIMEIRO_NOME) compartilhados entre sessões."""
+    return _ler_atendimentos(caminho, versao_arquivo(caminho))
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _ler_previa_atendimentos(caminho, versao, linhas):
+    return pd.read_csv(caminho, dtype=TIPOS_ATENDIMENTOS, nrows=linhas)
+
+
+def carregar_previa_atendimentos(caminho=CAMINHO_ATENDIMENTOS, linhas=LINHAS_PREVIA):
+    """Primeiras ``linhas`` dos atendimentos, lidas sem percorrer o resto do arquivo."""
+    return _ler_previa_atendimentos(caminho, versao_arquivo(caminho), linhas)
+
+
+def atendimentos_em_memoria(backend=BACKEND_PADRAO):
+    """Indica se o ``backend`` carrega os atendimentos inteiros em um DataFrame (só o pandas)."""
+    return _validar_backend(backend) == 'pandas'
+
+
+def carregar_ibge(caminho=CAMINHO_IBGE):
+    """População residente por município (Censo 2022) compartilhada entre sessões."""
+    return _ler_ibge(caminho, versao_arquivo(caminho))
+
+
+def carregar_atendimentos_normalizados(caminho=CAMINHO_ATENDIMENTOS):
+    """Atendimentos sem nomes nulos, com nomes canônicos e o COD_MUNICIPIO resolvido."""
+    return _ler_atendimentos_normalizados(caminho, versao_arquivo(caminho))
+
+
+def carregar_ibge_normalizado(caminho=CAMINHO_IBGE):
+    """Censo com MUNICÍPIO em maiúsculas e CHAVE_MUNICIPIO compatível com os atendimentos."""
+    return _ler_ibge_normalizado(caminho, versao_arquivo(caminho))
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _montar_dimensao_municipios(caminho, versao):
+    return DimensaoMunicipios(_ler_ibge_normalizado(caminho, versao))
+
+
+def carregar_dimensao_municipios(caminho=CAMINHO_IBGE):
+    """Dimensão de municípios indexada pelo código IBGE, com busca por nome e UF."""
+    return _montar_dimensao_municipios(caminho, versao_arquivo(caminho))
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+@cronometrar('atendimentos.blocos')
+def _agregar_em_blocos(caminho, versao, erro_relativo):
+    return agregar_em_blocos(caminho, erro_relativo, progresso=False)
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+@cronometrar('municipios.correspondencias')
+def _montar_correspondencias(caminho_atendimentos, versao_atendimentos, caminho_ibge, versao_ibge):
+    # Atendimentos por nome de município normalizado, do mesmo estado em blocos do cubo:
+    # o arquivo nunca é carregado inteiro
+    estado = _agregar_em_blocos(caminho_atendimentos, versao_atendimentos, ERRO_RELATIVO_PADRAO)
+    dimensao = _montar_dimensao_municipios(caminho_ibge, versao_ibge)
+    return dimensao.correspondencias(estado.municipios, estado.volume, ufs=ESTADOS_NORDESTE)
+
+
+def carregar_correspondencias(caminho_atendimentos=CAMINHO_ATENDIMENTOS, caminho_ibge=CAMINHO_IBGE):
+    """Como cada nome de município distinto dos atendimentos foi resolvido (exato, aproximado ou sem correspondência).
+
+    As contagens vêm da agregação em blocos e, como no cubo, não incluem
+    atendimentos sem primeiro nome.
+    """
+    return _montar_correspondencias(
+        caminho_atendimentos, versao_arquivo(caminho_atendimentos), caminho_ibge, versao_arquivo(caminho_ibge)
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=len(NIVEIS_DETALHE))
+def _ler_geojson_municipios(caminho_malha, versao_malha, nivel, caminho_ibge, versao_ibge):
+    tabela = _montar_dimensao_municipios(caminho_ibge, versao_ibge).tabela
+    return carregar_geojson(caminho_malha, tabela.index[tabela['UF'].isin(ESTADOS_NORDESTE)], nivel)
+
+
+def carregar_geojson_municipios(nivel=NIVEL_PADRAO, caminho_ibge=CAMINHO_IBGE):
+    """Contornos simplificados dos municípios do Nordeste (``id`` = código IBGE).
+
+    Devolve ``None`` quando não há malha municipal em ``data/malhas``.
+    """
+    caminho_malha = localizar_malha()
+    if caminho_malha is None:
+        return None
+    return _ler_geojson_municipios(
+        caminho_malha, versao_arquivo(caminho_malha), nivel, caminho_ibge, versao_arquivo(caminho_ibge)
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _ler_centroides(caminho, versao):
+    return ler_centroides(caminho)
+
+
+def carregar_centroides(caminho=CAMINHO_CENTROIDES):
+    """Centroides municipais gravados (lat, lon por código IBGE) ou ``None``; nunca consulta a rede."""
+    return _ler_centroides(caminho, versao_arquivo(caminho))
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _montar_indice_espacial(caminho, versao):
+    centroides = ler_centroides(caminho)
+    return None if centroides is None else IndiceEspacial.de_centroides(centroides)
+
+
+def carregar_indice_espacial(caminho=CAMINHO_CENTROIDES):
+    """R-tree dos centroides municipais para consultas por raio, vizinhança e retângulo (ou ``None``)."""
+    return _montar_indice_espacial(caminho, versao_arquivo(caminho))
+
+
+def atualizar_centroides_da_malha(caminho=CAMINHO_CENTROIDES):
+    """Recalcula os centroides a partir da malha local quando ela é mais nova que o arquivo gravado."""
+    caminho_malha = localizar_malha()
+    if caminho_malha is None:
+        return False
+    if os.path.exists(caminho) and os.path.getmtime(caminho) >= os.path.getmtime(caminho_malha):
+        return False
+    gravar_centroides(centroides_da_malha(caminho_malha), caminho)
+    return True
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+@cronometrar('cubo.montar')
+def _montar_cubo_atendimentos(caminho_atendimentos, versao_atendimentos, caminho_ibge, versao_ibge,
+                              erro_relativo, backend):
+    dimensao = _montar_dimensao_municipios(caminho_ibge, versao_ibge)
+    if backend == 'blocos':
+        estado = _agregar_em_blocos(caminho_atendimentos, versao_atendimentos, erro_relativo)
+        return estado.cubo(dimensao, ufs=ESTADOS_NORDESTE, erro_relativo=erro_relativo)
+    if backend == 'dask':
+        volume, pares_municipio, pares_nome, nomes, pares_volume = agregar_atendimentos_dask(
+            caminho_atendimentos, dimensao, ufs=ESTADOS_NORDESTE
+        )
+        return CuboAtendimentos.de_agregados(
+            volume, pares_municipio, pares_nome, nomes, dimensao,
+            ufs=ESTADOS_NORDESTE,
+            erro_relativo=erro_relativo,
+            pares_volume=pares_volume,
+        )
+    return CuboAtendimentos.construir(
+        _ler_atendimentos_normalizados(caminho_atendimentos, versao_atendimentos),
+        dimensao,
+        ufs=ESTADOS_NORDESTE,
+        erro_relativo=erro_relativo,
+    )
+
+
+def _validar_backend(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend desconhecido: {backend!r} (use um de {', '.join(BACKENDS)})")
+    return backend
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+@cronometrar('cubo.abrir_artefato')
+def _abrir_cubo_publicado(caminho_versao):
+    # Versões publicadas são imutáveis: o caminho basta como chave
+    return abrir_cubo(caminho_versao)
+
+
+def carregar_cubo_atendimentos(
+    caminho_atendimentos=CAMINHO_ATENDIMENTOS,
+    caminho_ibge=CAMINHO_IBGE,
+    erro_relativo=ERRO_RELATIVO_PADRAO,
+    backend=BACKEND_PADRAO,
+    usar_artefatos=True,
+):
+    """Agregado por município do Nordeste (volume, nomes distintos, discrepâncias).
+
+    Se o job em lote já publicou um artefato para as origens atuais, ele é
+    lido em vez de recalcular. ``erro_relativo`` define o erro padrão dos
+    sketches de nomes distintos e ``backend`` escolhe entre o pipeline em
+    memória (pandas) e o particionado (dask).
+    """
+    if usar_artefatos:
+        publicado = localizar_valido(
+            {'atendimentos': caminho_atendimentos, 'ibge': caminho_ibge},
+            {'erro_relativo': erro_relativo},
+        )
+        if publicado is not None:
+            return _abrir_cubo_publicado(publicado)
+    return _montar_cubo_atendimentos(
+        caminho_atendimentos, versao_arquivo(caminho_atendimentos),
+        caminho_ibge, versao_arquivo(caminho_ibge),
+        erro_relativo, _validar_backend(backend),
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+@cronometrar('indice.populacional')
+def _montar_indice_populacional(versao_cubo, _municipios):
+    return IndicePopulacional(_municipios)
+
+
+def carregar_indice_populacional(cubo):
+    """Índice por faixa populacional dos municípios de ``cubo`` (montado uma vez por versão do cubo)."""
+    return _montar_indice_populacional(cubo.versao, cubo.municipios)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+@cronometrar('indice.filtros')
+def _montar_indice_filtros(versao_cubo, _municipios):
+    return IndiceFiltros(_municipios)
+
+
+def carregar_indice_filtros(cubo):
+    """Bitmaps por UF e índice UF → municípios dos filtros da barra lateral (montados uma vez por versão do cubo)."""
+    return _montar_indice_filtros(cubo.versao, cubo.municipios)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+@cronometrar('indice.ranking')
+def _montar_ranking_municipios(versao_cubo, _municipios):
+    return RankingMunicipios(_municipios)
+
+
+def carregar_ranking_municipios(cubo):
+    """Ordenações de ``cubo`` por volume e por taxa para os rankings (montadas uma vez por versão do cubo)."""
+    return _montar_ranking_municipios(cubo.versao, cubo.municipios)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+@cronometrar('generos.sexo_dos_nomes')
+def _montar_sexo_dos_nomes(versao_cubo, caminho_generos, versao_generos, _nomes):
+    generos = ler_generos(caminho_generos)
+    return None if generos is None else sexo_dos_nomes(_nomes, generos)
+
+
+def carregar_sexo_dos_nomes(cubo, caminho_generos=CAMINHO_GENEROS):
+    """Sexo estimado de cada nome distinto de ``cubo`` (alinhado a ``cubo.nomes``) ou ``None`` sem cache de gêneros.
+
+    Só lê o cache gravado pelo job em lote; nunca consulta a rede.
+    """
+    return _montar_sexo_dos_nomes(cubo.versao, caminho_generos, versao_arquivo(caminho_generos), cubo.nomes)
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _ler_perfil_atendimentos(caminho, versao, backend):
+    if backend == 'blocos':
+        return carregar_perfil('atendimentos', caminho, lambda: perfil_em_blocos(
+            pd.read_csv(caminho, dtype=TIPOS_ATENDIMENTOS, chunksize=LINHAS_BLOCO)
+        ))
+    if backend == 'dask':
+        return carregar_perfil('atendimentos', caminho, lambda: perfil_dataset_dask(ler_dask_atendimentos(caminho)))
+    return carregar_perfil('atendimentos', caminho, lambda: perfil_dataset(_ler_atendimentos(caminho, versao)))
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _ler_perfil_ibge(caminho, versao):
+    return carregar_perfil('ibge', caminho, lambda: perfil_dataset(_ler_ibge(caminho, versao)))
+
+
+def carregar_perfil_atendimentos(caminho=CAMINHO_ATENDIMENTOS, backend=BACKEND_PADRAO):
+    """Perfil das colunas dos atendimentos (nulos, distintos, tipos, extremos, mais frequentes)."""
+    return _ler_perfil_atendimentos(caminho, versao_arquivo(caminho), _validar_backend(backend))
+
+
+def carregar_perfil_ibge(caminho=CAMINHO_IBGE):
+    """Perfil das colunas do Censo (nulos, distintos, tipos, extremos, mais frequentes)."""
+    return _ler_perfil_ibge(caminho, versao_arquivo(caminho))
+
+
+def ingerir(backend=BACKEND_PADRAO):
+    """Converte os CSVs de origem para o cache colunar e monta os agregados, sem depender do Streamlit.
+
+    Fora do backend ``pandas`` os atendimentos não são materializados: apenas o
+    perfil e o cubo são calculados, em blocos ou particionados.
+    """
+    _validar_backend(backend)
+    if backend == 'pandas':
+        carregar_com_cache('atendimentos', CAMINHO_ATENDIMENTOS, ler_csv_atendimentos)
+        carregar_atendimentos_normalizados()
+    carregar_com_cache('ibge', CAMINHO_IBGE, ler_csv_ibge)
+    carregar_ibge_normalizado()
+    carregar_perfil_atendimentos(backend=backend)
+    carregar_perfil_ibge()
+    carregar_cubo_atendimentos(backend=backend)
+    if localizar_malha() is not None:
+        for nivel in NIVEIS_DETALHE:
+            carregar_geojson_municipios(nivel)
+        atualizar_centroides_da_malha()
+
+
+if __name__ == '__main__':
+    ingerir()
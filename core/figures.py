@@ -0,0 +1,385 @@
+"""Figuras Plotly das páginas, memorizadas pelo estado dos filtros.
+
+Cada interação com um widget reexecuta a página inteira. As funções
+``figura_*`` deste módulo são puras (só dependem dos argumentos) e as páginas
+as chamam através de ``CacheFiguras.obter``, que guarda a figura pronta sob o
+hash canônico do estado dos filtros (UFs selecionadas, faixa populacional,
+consulta espacial, versão dos dados...). Voltar a uma combinação de filtros já
+vista devolve a figura sem recalcular nada.
+
+O cache é um LRU limitado a ``MAX_FIGURAS`` entradas, compartilhado por todas
+as sessões do servidor, com contadores de acertos, falhas e remoções. As
+figuras devolvidas são compartilhadas e devem ser tratadas como somente
+leitura.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+import streamlit as st
+
+from core.centroids import centroides_por_uf, coordenadas
+from core.instrumentation import medir
+
+MAX_FIGURAS = 128
+
+
+def _canonico(valor):
+    """Converte escalares e coleções numpy/pandas em tipos JSON estáveis."""
+    if isinstance(valor, np.generic):
+        return valor.item()
+    if isinstance(valor, (set, frozenset)):
+        return sorted(_canonico(v) for v in valor)
+    if isinstance(valor, np.ndarray):
+        return valor.tolist()
+    return str(valor)
+
+
+def chave_estado(nome, estado):
+    """Hash canônico (sha256) da figura ``nome`` sob o estado de filtros ``estado``.
+
+    Dicionários são serializados com as chaves ordenadas, de modo que a ordem
+    em que a página monta o estado não altera a chave.
+    """
+    texto = json.dumps([nome, estado], sort_keys=True, separators=(',', ':'), default=_canonico)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+class CacheFiguras:
+    """LRU limitado de figuras, seguro para várias sessões simultâneas."""
+
+    def __init__(self, max_entradas=MAX_FIGURAS):
+        self.max_entradas = max_entradas
+        self._figuras = OrderedDict()
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+
+    def __len__(self):
+        return len(self._figuras)
+
+    def obter(self, nome, estado, construir):
+        """Figura em cache para (``nome``, ``estado``) ou ``construir()``, que passa a ser guardada."""
+        chave = chave_estado(nome, estado)
+        with self._trava:
+            if chave in self._figuras:
+                self._figuras.move_to_end(chave)
+                self.acertos += 1
+                return self._figuras[chave]
+            self.falhas += 1
+
+        # Construída fora da trava: outras sessões não esperam por esta figura
+        with medir(f'figura.{nome}'):
+            figura = construir()
+        with self._trava:
+            self._figuras[chave] = figura
+            self._figuras.move_to_end(chave)
+            while len(self._figuras) > self.max_entradas:
+                self._figuras.popitem(last=False)
+                self.remocoes += 1
+        return figura
+
+    def estatisticas(self):
+        with self._trava:
+            consultas = self.acertos + self.falhas
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'remocoes': self.remocoes,
+                'entradas': len(self._figuras),
+                'capacidade': self.max_entradas,
+                'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+            }
+
+    def limpar(self):
+        with self._trava:
+            self._figuras.clear()
+
+
+@st.cache_resource(show_spinner=False)
+def cache_figuras():
+    """Cache de figuras do processo do servidor (o mesmo para todas as sessões)."""
+    return CacheFiguras()
+
+
+def painel_cache_figuras(cache):
+    """Resumo do cache de figuras na barra lateral."""
+    info = cache.estatisticas()
+    st.caption(
+        f"🧮 Cache de gráficos: {info['acertos']} acertos, {info['falhas']} falhas, "
+        f"{info['remocoes']} remoções, {info['entradas']}/{info['capacidade']} entradas "
+        f"({info['taxa_acerto']:.0%} de acerto)"
+    )
+
+
+# --- Página de BI e mapas (colunas TOTAL_ATENDIMENTOS, pessoas, TAXA_100K) ---
+# ``resumo_uf`` segue ``resumo_por_uf``, com VOLUME_ATENDIMENTOS renomeada para TOTAL_ATENDIMENTOS.
+
+def figura_volume_uf(resumo_uf):
+    volume_uf = resumo_uf[['UF', 'TOTAL_ATENDIMENTOS', 'pessoas']]
+
+    fig = px.bar(
+        volume_uf,
+        x='UF',
+        y='TOTAL_ATENDIMENTOS',
+        title='📈 Volume de Atendimentos por Estado',
+        color='UF',
+        text='TOTAL_ATENDIMENTOS',
+        color_discrete_sequence=px.colors.qualitative.Bold
+    )
+    fig.update_traces(texttemplate='%{text:,}', textposition='outside')
+    fig.update_layout(
+        xaxis_title='Estado',
+        yaxis_title='Total de Atendimentos',
+        showlegend=False
+    )
+    return fig
+
+
+def figura_top_municipios(top_municipios):
+    """Barras horizontais dos municípios já selecionados pelo ranking de volume."""
+    fig = px.bar(
+        top_municipios,
+        x='TOTAL_ATENDIMENTOS',
+        y='MUNICÍPIO',
+        orientation='h',
+        title=f'🏆 Top {len(top_municipios)} Municípios - Volume de Atendimentos',
+        color='TOTAL_ATENDIMENTOS',
+        color_continuous_scale='Viridis',
+        text='TOTAL_ATENDIMENTOS'
+    )
+    fig.update_traces(texttemplate='%{text:,}', textposition='outside')
+    fig.update_layout(
+        xaxis_title='Total de Atendimentos',
+        yaxis_title='Município',
+        yaxis={'categoryorder': 'total ascending'}
+    )
+    return fig
+
+
+def figura_taxa_uf(resumo_uf):
+    # Taxa por UF (média das taxas municipais)
+    taxa_uf = resumo_uf[['UF', 'TAXA_100K_MEDIA', 'pessoas', 'TOTAL_ATENDIMENTOS']].rename(
+        columns={'TAXA_100K_MEDIA': 'TAXA_100K'}
+    )
+
+    fig = px.bar(
+        taxa_uf,
+        x='UF',
+        y='TAXA_100K',
+        title='📊 Taxa Média de Atendimentos por 100k hab. - por Estado',
+        color='TAXA_100K',
+        color_continuous_scale='Blues',
+        text='TAXA_100K'
+    )
+    fig.update_traces(texttemplate='%{text:.1f}', textposition='outside')
+    fig.update_layout(
+        xaxis_title='Estado',
+        yaxis_title='Atendimentos por 100k habitantes'
+    )
+    return fig
+
+
+def figura_distribuicao_taxa(municipios):
+    fig = px.box(
+        municipios,
+        x='TAXA_100K',
+        title='📋 Distribuição da Taxa de Atendimentos por 100k hab.',
+        orientation='h'
+    )
+    fig.update_layout(xaxis_title='Atendimentos por 100k habitantes')
+    return fig
+
+
+def dados_mapa_uf(resumo_uf, municipios, centroides=None):
+    """Totais por UF com a posição de cada estado (centroide dos ``municipios`` ponderado pela população)."""
+    dados_mapa = resumo_uf[['UF', 'TOTAL_ATENDIMENTOS', 'pessoas', 'QTD_MUNICIPIOS', 'TAXA_100K']]
+    posicoes_uf = centroides_por_uf(municipios.set_index('Código municipal'), centroides)
+    return dados_mapa.join(posicoes_uf, on='UF')
+
+
+def figura_mapa_uf(dados_mapa, metrica):
+    """Bolhas por estado; ``metrica`` é TOTAL_ATENDIMENTOS ou TAXA_100K."""
+    if metrica == 'TOTAL_ATENDIMENTOS':
+        titulo, escala = "🗺️ Mapa de Calor - Volume de Atendimentos por Estado", "Viridis"
+    else:
+        titulo, escala = "📊 Mapa - Taxa de Atendimentos por 100k hab.", "Blues"
+
+    fig = px.scatter_map(
+        dados_mapa,
+        lat="lat",
+        lon="lon",
+        size=metrica,
+        color=metrica,
+        hover_name="UF",
+        hover_data={
+            "TOTAL_ATENDIMENTOS": True,
+            "QTD_MUNICIPIOS": True,
+            "TAXA_100K": True,
+            "lat": False,
+            "lon": False
+        },
+        size_max=30,
+        zoom=4,
+        title=titulo,
+        color_continuous_scale=escala,
+        map_style="carto-positron"
+    )
+    fig.update_layout(height=500)
+    return fig
+
+
+def figura_mapa_municipios(municipios, centroides):
+    dados_municipios = municipios.copy()
+    dados_municipios['lat'], dados_municipios['lon'] = coordenadas(centroides, dados_municipios['Código municipal'])
+    dados_municipios = dados_municipios.dropna(subset=['lat'])
+
+    fig = px.scatter_map(
+        dados_municipios,
+        lat="lat",
+        lon="lon",
+        size="TOTAL_ATENDIMENTOS",
+        color="TAXA_100K",
+        hover_name="MUNICÍPIO",
+        hover_data={
+            "UF": True,
+            "TOTAL_ATENDIMENTOS": True,
+            "TAXA_100K": True,
+            "lat": False,
+            "lon": False
+        },
+        size_max=25,
+        zoom=4.3,
+        title="📍 Atendimentos por Município (tamanho = volume, cor = taxa por 100k hab.)",
+        color_continuous_scale="Blues",
+        map_style="carto-positron"
+    )
+    fig.update_layout(height=600)
+    return fig
+
+
+def figura_coropletico(municipios, geojson, metrica, rotulos):
+    fig = px.choropleth_map(
+        municipios,
+        geojson=geojson,
+        locations='Código municipal',
+        featureidkey='id',
+        color=metrica,
+        hover_name='MUNICÍPIO',
+        hover_data={
+            'UF': True,
+            'TOTAL_ATENDIMENTOS': ':,',
+            'pessoas': ':,',
+            'TAXA_100K': ':.1f',
+            'Código municipal': False
+        },
+        labels=rotulos,
+        color_continuous_scale='Viridis' if metrica == 'TOTAL_ATENDIMENTOS' else 'Blues',
+        map_style='carto-positron',
+        center={'lat': -9.5, 'lon': -41.0},
+        zoom=4.3,
+        opacity=0.8,
+        title=f"🧭 {rotulos[metrica]} por Município"
+    )
+    fig.update_traces(marker_line_width=0.2)
+    fig.update_layout(height=650, margin={'r': 0, 't': 40, 'l': 0, 'b': 0})
+    return fig
+
+
+# --- Página de análises (colunas UF, MUNICÍPIO, VOLUME_ATENDIMENTOS) ---
+
+def figura_vazia(titulo):
+    """Figura só com o título e um aviso, para recortes sem nenhuma linha."""
+    fig = go.Figure()
+    fig.update_layout(
+        title=titulo,
+        xaxis={'visible': False},
+        yaxis={'visible': False},
+        annotations=[{
+            'text': 'Nenhum dado para os filtros selecionados',
+            'showarrow': False,
+            'xref': 'paper',
+            'yref': 'paper',
+            'x': 0.5,
+            'y': 0.5,
+        }],
+    )
+    return fig
+
+
+def figura_barras_uf(atendimentos_por_municipio):
+    if atendimentos_por_municipio.empty:
+        return figura_vazia('📈 Volume de Atendimentos por UF (Região)')
+    fig = px.bar(
+        atendimentos_por_municipio.groupby('UF', as_index=False)['VOLUME_ATENDIMENTOS'].sum(),
+        x='UF',
+        y='VOLUME_ATENDIMENTOS',
+        color='UF',
+        text='VOLUME_ATENDIMENTOS',
+        title='📈 Volume de Atendimentos por UF (Região)'
+    )
+    fig.update_traces(textposition='outside')
+    return fig
+
+
+def figura_sunburst(atendimentos_por_municipio):
+    if atendimentos_por_municipio.empty:
+        return figura_vazia('🗺️ Volume de Atendimentos por UF e Município')
+    return px.sunburst(
+        atendimentos_por_municipio,
+        path=['UF', 'MUNICÍPIO'],
+        values='VOLUME_ATENDIMENTOS',
+        color='UF',
+        color_discrete_sequence=px.colors.qualitative.Pastel,
+        title='🗺️ Volume de Atendimentos por UF e Município'
+    )
+
+
+# --- Sexo estimado pelo primeiro nome (colunas UF/MUNICÍPIO, SEXO, VOLUME_ATENDIMENTOS) ---
+
+CORES_SEXO = {'Feminino': '#d6604d', 'Masculino': '#4393c3', 'Indefinido': '#bababa', 'Não classificado': '#e0e0e0'}
+
+
+def figura_sexo_uf(sexo_uf):
+    if sexo_uf.empty:
+        return figura_vazia('🚻 Atendimentos por UF e Sexo Estimado')
+    fig = px.bar(
+        sexo_uf,
+        x='UF',
+        y='VOLUME_ATENDIMENTOS',
+        color='SEXO',
+        color_discrete_map=CORES_SEXO,
+        category_orders={'SEXO': list(CORES_SEXO)},
+        title='🚻 Atendimentos por UF e Sexo Estimado'
+    )
+    fig.update_layout(xaxis_title='Estado', yaxis_title='Atendimentos', legend_title='Sexo')
+    return fig
+
+
+def figura_sexo_municipios(sexo_municipios):
+    """Barras 100% empilhadas dos municípios em ``sexo_municipios`` (rótulo em MUNICÍPIO)."""
+    if sexo_municipios.empty:
+        return figura_vazia('🏙️ Sexo Estimado nos Municípios com Mais Atendimentos')
+    fig = px.bar(
+        sexo_municipios,
+        x='VOLUME_ATENDIMENTOS',
+        y='MUNICÍPIO',
+        color='SEXO',
+        orientation='h',
+        color_discrete_map=CORES_SEXO,
+        category_orders={'SEXO': list(CORES_SEXO)},
+        title=f"🏙️ Sexo Estimado nos {sexo_municipios['MUNICÍPIO'].nunique()} Municípios com Mais Atendimentos"
+    )
+    fig.update_layout(
+        barnorm='percent',
+        xaxis_title='% dos atendimentos',
+        yaxis_title='Município',
+        yaxis={'categoryorder': 'array', 'categoryarray': sexo_municipios['MUNICÍPIO'].unique()[::-1]},
+        legend_title='Sexo'
+    )
+    return fig
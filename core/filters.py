@@ -0,0 +1,69 @@
+"""Filtros de UF e município da barra lateral resolvidos por bitmaps.
+
+A tabela de municípios do cubo tem uma linha por município. Para cada UF é
+pré-calculado um bitmap compactado (``np.packbits``, um bit por linha) das
+suas linhas, e cada município tem a posição da sua linha. Um filtro vira
+operações bit a bit sobre vetores de ``ceil(n / 8)`` bytes:
+
+* UFs selecionadas: OU dos bitmaps das UFs;
+* municípios selecionados: bitmap com os bits das posições escolhidas;
+* recorte: E entre os dois.
+
+O índice UF → municípios (códigos de cada UF) alimenta a lista
+dependente do formulário; combinações de UFs já pedidas ficam memorizadas,
+então trocar as UFs não reordena a tabela a cada execução da página.
+"""
+import numpy as np
+
+
+class IndiceFiltros:
+    """Bitmaps por UF e posições por município sobre as linhas de ``municipios``."""
+
+    def __init__(self, municipios):
+        self._n = len(municipios)
+        self._posicao = {codigo: i for i, codigo in enumerate(municipios.index)}
+        ufs = municipios['UF'].astype(str).to_numpy()
+        self.ufs = sorted(set(ufs))
+        self._bitmaps = {uf: np.packbits(ufs == uf) for uf in self.ufs}
+
+        codigos = municipios.index.to_numpy()
+        self._por_uf = {uf: codigos[ufs == uf].tolist() for uf in self.ufs}
+        self._opcoes = {}
+        # Rótulo "Município (UF)" de cada código, usado na lista e na ordenação
+        self.rotulos = dict(zip(codigos.tolist(), (municipios['MUNICÍPIO'].astype(str) + ' (' + ufs + ')').tolist()))
+
+    def __len__(self):
+        return self._n
+
+    def municipios_das_ufs(self, ufs):
+        """Códigos dos municípios das ``ufs``, ordenados pelo nome (memorizado por combinação de UFs)."""
+        chave = frozenset(ufs)
+        opcoes = self._opcoes.get(chave)
+        if opcoes is None:
+            por_nome = sorted(
+                (self.rotulos[codigo], codigo) for uf in chave & self._por_uf.keys() for codigo in self._por_uf[uf]
+            )
+            opcoes = self._opcoes[chave] = tuple(codigo for _, codigo in por_nome)
+        return opcoes
+
+    def bitmap_ufs(self, ufs):
+        bitmap = np.zeros((self._n + 7) // 8, dtype=np.uint8)
+        for uf in ufs:
+            if uf in self._bitmaps:
+                np.bitwise_or(bitmap, self._bitmaps[uf], out=bitmap)
+        return bitmap
+
+    def bitmap_municipios(self, codigos):
+        marcados = np.zeros(self._n, dtype=bool)
+        posicoes = [self._posicao[codigo] for codigo in codigos if codigo in self._posicao]
+        marcados[posicoes] = True
+        return np.packbits(marcados)
+
+    def posicoes(self, ufs=None, municipios=None):
+        """Posições (em ``municipios``, em ordem) das linhas nas ``ufs`` e nos ``municipios`` pedidos."""
+        bitmap = np.full((self._n + 7) // 8, 0xFF, dtype=np.uint8)
+        if ufs is not None:
+            np.bitwise_and(bitmap, self.bitmap_ufs(ufs), out=bitmap)
+        if municipios is not None:
+            np.bitwise_and(bitmap, self.bitmap_municipios(municipios), out=bitmap)
+        return np.flatnonzero(np.unpackbits(bitmap, count=self._n))
@@ -0,0 +1,173 @@
+"""Sexo estimado a partir do primeiro nome, com cache persistente nome → gênero.
+
+A classificação consulta a API de Nomes do IBGE (frequências do nome por
+sexo no Censo), com classes e cortes tirados da biblioteca gender-guesser-br,
+e é feita uma única vez por primeiro nome canônico distinto, nunca por
+atendimento. A biblioteca não é usada: ela devolve frequência zero tanto para
+um nome sem registros ("desconhecido") quanto para uma consulta que falhou. Os resultados ficam em ``data/cache/generos.parquet``; cada
+execução do job em lote (``python -m core.batch --generos``) só classifica os
+nomes que ainda não estão no arquivo. As páginas apenas leem o cache e levam o
+grupo de cada nome aos atendimentos por indexação vetorizada sobre os pares
+município × nome do cubo; nenhuma chamada de rede acontece durante uma
+requisição.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote
+from urllib.request import urlopen
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from core.cache import DIRETORIO_CACHE
+
+CAMINHO_GENEROS = os.path.join(DIRETORIO_CACHE, 'generos.parquet')
+API_NOMES = 'https://servicodados.ibge.gov.br/api/v2/censos/nomes/{nome}?sexo={sexo}'
+# Cortes tirados dos padrões do gender-guesser-br (proporção de um sexo entre os registros do nome)
+CORTE_AMBOS = 0.6
+CORTE_MAIORIA = 0.8
+
+# Classes de gênero (nomes tirados do gender-guesser-br) e o grupo exibido nas páginas
+SEXO_POR_GENERO = {
+    'feminino': 'Feminino',
+    'provavelmente_feminino': 'Feminino',
+    'masculino': 'Masculino',
+    'provavelmente_masculino': 'Masculino',
+    'ambos': 'Indefinido',
+    'desconhecido': 'Indefinido',
+}
+NAO_CLASSIFICADO = 'Não classificado'
+SEXOS = ['Feminino', 'Masculino', 'Indefinido', NAO_CLASSIFICADO]
+
+
+def frequencia_nome(nome, sexo, tempo_limite=30):
+    """Registros de ``nome`` com o ``sexo`` ('f' ou 'm') no Censo, somados entre as décadas.
+
+    Um nome sem registros devolve 0; falhas da consulta (rede, limite da API,
+    resposta inesperada) levantam ``OSError`` ou ``ValueError``.
+    """
+    with urlopen(API_NOMES.format(nome=quote(nome), sexo=sexo), timeout=tempo_limite) as resposta:
+        registros = json.load(resposta)
+    if not isinstance(registros, list):
+        raise ValueError(f'Resposta inesperada da API de Nomes para {nome!r}')
+    return sum(periodo['frequencia'] for registro in registros for periodo in registro['res'])
+
+
+def genero_por_frequencias(feminino, masculino):
+    """Classe de gênero para as frequências feminina e masculina de um nome (mesmos cortes do gender-guesser-br)."""
+    total = feminino + masculino
+    if not total:
+        return 'desconhecido'
+    if feminino / total > CORTE_MAIORIA:
+        return 'feminino'
+    if feminino / total > CORTE_AMBOS:
+        return 'provavelmente_feminino'
+    if masculino / total > CORTE_MAIORIA:
+        return 'masculino'
+    if masculino / total > CORTE_AMBOS:
+        return 'provavelmente_masculino'
+    return 'ambos'
+
+
+def classificar_nome(nome):
+    """Gênero do primeiro nome ``nome`` segundo a API de Nomes do IBGE, ou ``None`` se a consulta falhou.
+
+    Falhas (rede, limite da API) não são gravadas no cache: o nome volta a
+    ser consultado na próxima execução.
+    """
+    primeiro = nome.split()[0]
+    try:
+        return genero_por_frequencias(frequencia_nome(primeiro, 'f'), frequencia_nome(primeiro, 'm'))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def classificar_nomes(nomes, trabalhadores=8):
+    """Gera ``(nome, gênero)`` para cada nome de ``nomes``; o gênero é ``None`` quando a consulta falhou.
+
+    Cada classificação é dominada pela espera da API do IBGE, então as
+    consultas rodam em paralelo em ``trabalhadores`` threads.
+    """
+    with ThreadPoolExecutor(max_workers=trabalhadores) as executor:
+        tarefas = {executor.submit(classificar_nome, nome): nome for nome in nomes}
+        for tarefa in as_completed(tarefas):
+            yield tarefas[tarefa], tarefa.result()
+
+
+def completar_generos(nomes, caminho=CAMINHO_GENEROS, trabalhadores=8, gravar_a_cada=500):
+    """Classifica os nomes distintos de ``nomes`` ainda fora do cache, gravando o progresso em lotes.
+
+    Uma execução interrompida perde no máximo ``gravar_a_cada`` consultas.
+    Nomes cuja consulta falhou ficam fora do cache, e um lote com falhas
+    também não grava "desconhecido": com a API instável, um nome sem
+    registros pode ser resposta degradada. Esses nomes são consultados de
+    novo na próxima execução. Devolve quantos nomes foram acrescentados.
+    """
+    from tqdm import tqdm
+
+    pendentes = pd.Index(nomes).dropna().unique()
+    pendentes = pendentes[pendentes != '']
+    existentes = ler_generos(caminho)
+    if existentes is not None:
+        pendentes = pendentes[~pendentes.isin(existentes.index)]
+
+    lote, falhas, total = [], 0, 0
+    for nome, genero in tqdm(classificar_nomes(pendentes, trabalhadores), total=len(pendentes),
+                             desc='Classificando nomes'):
+        if genero is None:
+            falhas += 1
+        else:
+            lote.append((nome, genero))
+        if len(lote) + falhas >= gravar_a_cada:
+            total += _gravar_lote(lote, caminho, falhas)
+            lote, falhas = [], 0
+    if lote:
+        total += _gravar_lote(lote, caminho, falhas)
+    return total
+
+
+def _gravar_lote(lote, caminho, falhas=0):
+    if falhas:
+        lote = [(nome, genero) for nome, genero in lote if genero != 'desconhecido']
+    if not lote:
+        return 0
+    nomes, generos = zip(*lote)
+    gravar_generos(pd.Series(generos, index=pd.Index(nomes, name='NOME'), name='GENERO'), caminho)
+    return len(lote)
+
+
+def ler_generos(caminho=CAMINHO_GENEROS):
+    """Cache gravado (Series GENERO indexada pelo primeiro nome canônico) ou ``None``."""
+    if not os.path.exists(caminho):
+        return None
+    return pq.read_table(caminho).to_pandas().set_index('NOME')['GENERO']
+
+
+def gravar_generos(generos, caminho=CAMINHO_GENEROS):
+    """Grava ``generos`` somando-os aos já existentes (os novos prevalecem)."""
+    existentes = ler_generos(caminho)
+    if existentes is not None:
+        generos = pd.concat([existentes[~existentes.index.isin(generos.index)], generos])
+    generos = generos.sort_index()
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    pq.write_table(
+        pa.table({'NOME': pa.array(generos.index, pa.string()), 'GENERO': pa.array(generos.to_numpy(), pa.string())}),
+        f'{caminho}.tmp',
+    )
+    os.replace(f'{caminho}.tmp', caminho)
+    return generos
+
+
+def sexo_dos_nomes(nomes, generos):
+    """Categorical (categorias ``SEXOS``) com o sexo de cada nome de ``nomes``.
+
+    Uma única busca vetorizada no índice do cache; nomes ausentes dele ficam
+    como ``NAO_CLASSIFICADO``.
+    """
+    posicoes = generos.index.get_indexer(pd.Index(nomes))
+    sexo_do_cache = pd.Categorical(generos.map(SEXO_POR_GENERO).fillna('Indefinido'), categories=SEXOS).codes
+    codigos = np.where(posicoes >= 0, sexo_do_cache[posicoes], SEXOS.index(NAO_CLASSIFICADO))
+    return pd.Categorical.from_codes(codigos, categories=SEXOS)
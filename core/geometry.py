@@ -0,0 +1,90 @@
+"""Geometrias municipais simplificadas para os mapas coropléticos.
+
+A malha municipal do IBGE (shapefile, GeoPackage ou GeoJSON, com a coluna
+``CD_MUN``) não faz parte do repositório: ela deve ser baixada do portal de
+malhas territoriais do IBGE e colocada em ``data/malhas``. Sem o arquivo, as
+páginas apenas deixam de exibir o mapa municipal.
+
+Para cada nível de detalhe a malha é lida uma vez, recortada aos municípios
+pedidos, simplificada preservando as fronteiras compartilhadas e gravada como
+GeoJSON compacto (coordenadas arredondadas, só o código como identificador) em
+``data/cache``. O arquivo é refeito apenas quando a malha de origem muda.
+"""
+import glob
+import json
+import os
+
+from core.cache import DIRETORIO_CACHE, descrever_fonte, fonte_inalterada
+
+DIRETORIO_MALHAS = './data/malhas'
+EXTENSOES_MALHA = ('*.shp', '*.gpkg', '*.geojson', '*.json')
+COLUNA_CODIGO = 'CD_MUN'
+
+# Tolerância de simplificação (graus) e casas decimais das coordenadas por nível de detalhe
+NIVEIS_DETALHE = {
+    'baixo': (0.02, 3),
+    'medio': (0.005, 4),
+    'alto': (0.001, 4),
+}
+NIVEL_PADRAO = 'medio'
+
+
+def localizar_malha(diretorio=DIRETORIO_MALHAS):
+    """Primeiro arquivo de malha encontrado em ``diretorio`` ou ``None``."""
+    for extensao in EXTENSOES_MALHA:
+        encontrados = sorted(glob.glob(os.path.join(diretorio, extensao)))
+        if encontrados:
+            return encontrados[0]
+    return None
+
+
+def caminho_geojson(nivel, diretorio=DIRETORIO_CACHE):
+    return os.path.join(diretorio, f'malha_{nivel}.geojson')
+
+
+def simplificar_malha(caminho_malha, codigos, nivel=NIVEL_PADRAO):
+    """FeatureCollection dos municípios em ``codigos``, simplificada para ``nivel``."""
+    import geopandas as gpd
+    import shapely
+
+    tolerancia, casas = NIVEIS_DETALHE[nivel]
+    malha = gpd.read_file(caminho_malha, columns=[COLUNA_CODIGO])
+    malha = malha[malha[COLUNA_CODIGO].astype(int).isin(set(int(c) for c in codigos))]
+    malha = malha.to_crs(4326)
+
+    if shapely.coverage_is_valid(malha.geometry.values):
+        # Fronteiras compartilhadas são simplificadas uma única vez, sem abrir frestas entre vizinhos
+        geometrias = malha.geometry.simplify_coverage(tolerancia)
+    else:
+        geometrias = malha.geometry.simplify(tolerancia, preserve_topology=True)
+    geometrias = shapely.set_precision(geometrias.values, 10 ** -casas)
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {'type': 'Feature', 'id': int(codigo), 'properties': {}, 'geometry': shapely.geometry.mapping(geometria)}
+            for codigo, geometria in zip(malha[COLUNA_CODIGO], geometrias)
+            if not geometria.is_empty
+        ],
+    }
+
+
+def carregar_geojson(caminho_malha, codigos, nivel=NIVEL_PADRAO, diretorio=DIRETORIO_CACHE):
+    """GeoJSON simplificado do cache ou, se a malha ou os municípios mudaram, recalculado."""
+    codigos = sorted(int(c) for c in codigos)
+    caminho = caminho_geojson(nivel, diretorio)
+    if os.path.exists(caminho):
+        with open(caminho, encoding='utf-8') as f:
+            gravado = json.load(f)
+        if gravado.get('codigos') == codigos and fonte_inalterada(gravado.get('sus_fonte'), caminho_malha):
+            return gravado['geojson']
+
+    geojson = simplificar_malha(caminho_malha, codigos, nivel)
+    os.makedirs(diretorio, exist_ok=True)
+    with open(f'{caminho}.tmp', 'w', encoding='utf-8') as f:
+        json.dump({
+            'sus_fonte': descrever_fonte(caminho_malha),
+            'codigos': codigos,
+            'geojson': geojson,
+        }, f, separators=(',', ':'))
+    os.replace(f'{caminho}.tmp', caminho)
+    return geojson
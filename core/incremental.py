@@ -0,0 +1,268 @@
+"""Ingestão incremental de atendimentos acrescentados ao final de DADOS.txt.
+
+O estado guarda os agregados no nível do nome de município normalizado
+(volume, pares distintos município × nome com seus atendimentos e
+registradores HyperLogLog) e a
+marca d'água: quantos bytes do arquivo já foram incorporados e o hash dos
+bytes imediatamente anteriores a ela (a âncora). Cada atualização lê apenas o
+que foi acrescentado depois da marca, em blocos, e grava estado e marca juntos
+ao fim de cada bloco (troca atômica do diretório). Uma execução interrompida
+retoma do último bloco gravado.
+
+Os códigos IBGE e o cubo são derivados do estado a cada atualização, então o
+custo depende do delta e do número de pares distintos, não do histórico de
+linhas. Se o arquivo foi reescrito (encolheu ou a âncora não confere), o estado
+é descartado e reconstruído do início. Uma última linha sem quebra de linha
+fica para a próxima atualização, pois ainda pode estar sendo escrita.
+"""
+import hashlib
+import io
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from tqdm import tqdm
+
+from core.aggregates import CuboAtendimentos
+from core.municipalities import SEM_MUNICIPIO
+from core.normalize import chave_primeiro_nome, nome_municipio, por_valores_unicos
+from core.sketches import ERRO_RELATIVO_PADRAO, SketchesMunicipais, hash_valores, posicoes_e_ranks, precisao_para_erro
+
+DIRETORIO_INCREMENTAL = './data/incremental'
+TAMANHO_ANCORA = 4096
+TAMANHO_BLOCO = 64 << 20
+LINHAS_BLOCO = 1_000_000
+# Só as colunas que entram nos agregados são lidas
+COLUNAS_AGREGADAS = {'MUNICÍPIO': 'category', 'PRIMEIRO_NOME': 'string[pyarrow]'}
+
+
+def ancora(caminho, offset):
+    """Hash dos ``TAMANHO_ANCORA`` bytes anteriores a ``offset``."""
+    inicio = max(offset - TAMANHO_ANCORA, 0)
+    with open(caminho, 'rb') as f:
+        f.seek(inicio)
+        return hashlib.sha256(f.read(offset - inicio)).hexdigest()
+
+
+def ler_acrescimos(caminho, offset=0, colunas=None, tamanho_bloco=TAMANHO_BLOCO):
+    """Gera ``(colunas, linhas, novo_offset)`` para cada bloco de linhas completas após ``offset``."""
+    with open(caminho, 'rb') as f:
+        if offset == 0:
+            colunas = pd.read_csv(io.BytesIO(f.readline()), nrows=0).columns.tolist()
+            offset = f.tell()
+        f.seek(offset)
+        pendente = b''
+        while bloco := f.read(tamanho_bloco):
+            bloco = pendente + bloco
+            fim = bloco.rfind(b'\n') + 1
+            pendente = bloco[fim:]
+            if fim == 0:
+                continue
+            offset += fim
+            linhas = pd.read_csv(io.BytesIO(bloco[:fim]), header=None, names=colunas,
+                                 usecols=list(COLUNAS_AGREGADAS), dtype=COLUNAS_AGREGADAS)
+            yield colunas, linhas, offset
+
+
+def _estender(indice, serie):
+    """Posição de cada valor de ``serie`` (Categorical) em ``indice``, acrescentando os novos."""
+    categorias = serie.cat.categories
+    posicoes = indice.get_indexer(categorias)
+    novas = posicoes < 0
+    posicoes[novas] = np.arange(len(indice), len(indice) + novas.sum())
+    indice = indice.append(pd.Index(categorias[novas], dtype=object))
+    return indice, posicoes[serie.cat.codes.to_numpy()]
+
+
+class EstadoIncremental:
+    """Agregados acumulados por nome de município normalizado, mais a marca d'água."""
+
+    def __init__(self, marca, municipios, volume, nomes, pares, registros, contagens):
+        self.marca = marca
+        self.municipios = municipios
+        self.volume = volume
+        self.nomes = nomes
+        self.pares = pares
+        self.registros = registros
+        # Atendimentos de cada par, alinhados a ``pares``
+        self.contagens = contagens
+
+    @classmethod
+    def vazio(cls, precisao):
+        marca = {'colunas': None, 'offset': 0, 'linhas': 0, 'ancora': None, 'precisao': precisao}
+        return cls(
+            marca,
+            pd.Index([], dtype=object),
+            np.zeros(0, dtype=np.int64),
+            pd.Index([], dtype=object),
+            np.zeros(0, dtype=np.int64),
+            np.zeros((0, 1 << precisao), dtype=np.uint8),
+            np.zeros(0, dtype=np.int64),
+        )
+
+    @property
+    def precisao(self):
+        return self.marca['precisao']
+
+    def continua(self, caminho):
+        """Indica se ``caminho`` é o mesmo arquivo da marca, apenas com linhas acrescentadas."""
+        offset = self.marca['offset']
+        if not os.path.exists(caminho) or os.path.getsize(caminho) < offset:
+            return False
+        return offset == 0 or ancora(caminho, offset) == self.marca['ancora']
+
+    def incorporar(self, linhas):
+        """Soma um lote de linhas brutas (MUNICÍPIO, PRIMEIRO_NOME) ao estado.
+
+        A normalização é a mesma de ``normalizar_atendimentos``: linhas sem
+        primeiro nome são descartadas.
+        """
+        linhas = linhas[linhas['PRIMEIRO_NOME'].notna() & linhas['MUNICÍPIO'].notna()]
+        self.municipios, municipio = _estender(self.municipios, por_valores_unicos(linhas['MUNICÍPIO'], nome_municipio))
+        self.nomes, nome = _estender(self.nomes, por_valores_unicos(linhas['PRIMEIRO_NOME'], chave_primeiro_nome))
+
+        volume = np.bincount(municipio, minlength=len(self.municipios))
+        volume[:len(self.volume)] += self.volume
+        self.volume = volume
+        self.registros = np.vstack([
+            self.registros,
+            np.zeros((len(self.municipios) - len(self.registros), self.registros.shape[1]), dtype=np.uint8),
+        ])
+
+        # Pares ficam ordenados: a busca dos novos custa O(delta · log histórico)
+        chaves, contagens = np.unique((municipio.astype(np.int64) << 32) | nome, return_counts=True)
+        posicoes = np.searchsorted(self.pares, chaves)
+        existentes = np.zeros(len(chaves), dtype=bool)
+        dentro = posicoes < len(self.pares)
+        existentes[dentro] = self.pares[posicoes[dentro]] == chaves[dentro]
+        self.contagens[posicoes[existentes]] += contagens[existentes]
+        novas = chaves[~existentes]
+        self.pares = np.insert(self.pares, posicoes[~existentes], novas)
+        self.contagens = np.insert(self.contagens, posicoes[~existentes], contagens[~existentes])
+
+        posicoes_hll, ranks = posicoes_e_ranks(hash_valores(self.nomes[novas & 0xFFFFFFFF]), self.precisao)
+        np.maximum.at(self.registros, (novas >> 32, posicoes_hll), ranks)
+
+    def cubo(self, dimensao, ufs=None, erro_relativo=ERRO_RELATIVO_PADRAO):
+        """Cubo por código IBGE derivado do estado (resolução refeita sobre os nomes distintos)."""
+        codigos = dimensao.resolver_unicos(self.municipios, self.volume, ufs)
+        resolvidos = codigos != SEM_MUNICIPIO
+        volume = pd.Series(self.volume[resolvidos], index=codigos[resolvidos]).groupby(level=0).sum()
+        volume = volume[volume > 0]
+
+        pares = pd.DataFrame({
+            'COD_MUNICIPIO': codigos[self.pares >> 32],
+            'NOME': (self.pares & 0xFFFFFFFF).astype(np.int32),
+            'VOLUME': self.contagens,
+        })
+        # Nomes de município diferentes podem resolver para o mesmo código
+        pares = pares[pares['COD_MUNICIPIO'] != SEM_MUNICIPIO].groupby(['COD_MUNICIPIO', 'NOME']).sum().reset_index()
+
+        # Sketch de cada código: máximo dos registradores dos nomes que resolvem para ele
+        ordem = np.argsort(codigos[resolvidos], kind='stable')
+        codigos_ordenados = codigos[resolvidos][ordem]
+        unicos, inicios = np.unique(codigos_ordenados, return_index=True)
+        registros = self.registros[resolvidos][ordem]
+        if len(unicos):
+            registros = np.maximum.reduceat(registros, inicios, axis=0)
+
+        return CuboAtendimentos.de_agregados(
+            volume,
+            pares['COD_MUNICIPIO'].to_numpy(np.int32),
+            pares['NOME'].to_numpy(np.int32),
+            self.nomes,
+            dimensao,
+            ufs=ufs,
+            erro_relativo=erro_relativo,
+            sketches=SketchesMunicipais(unicos, registros, self.precisao),
+            pares_volume=pares['VOLUME'].to_numpy(np.int64),
+        )
+
+    def salvar(self, diretorio=DIRETORIO_INCREMENTAL):
+        """Grava estado e marca em um diretório novo e o troca pelo anterior."""
+        temporario, antigo = f'{diretorio}.tmp', f'{diretorio}.old'
+        shutil.rmtree(temporario, ignore_errors=True)
+        os.makedirs(temporario)
+        pq.write_table(pa.table({'MUNICÍPIO': pa.array(self.municipios, pa.string()), 'VOLUME': self.volume}),
+                       os.path.join(temporario, 'municipios.parquet'))
+        pq.write_table(pa.table({'NOME': pa.array(self.nomes, pa.string())}), os.path.join(temporario, 'nomes.parquet'))
+        np.save(os.path.join(temporario, 'pares.npy'), self.pares)
+        np.save(os.path.join(temporario, 'registros.npy'), self.registros)
+        np.save(os.path.join(temporario, 'contagens.npy'), self.contagens)
+        with open(os.path.join(temporario, 'marca.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.marca, f, ensure_ascii=False)
+
+        if os.path.exists(diretorio):
+            shutil.rmtree(antigo, ignore_errors=True)
+            os.replace(diretorio, antigo)
+        os.replace(temporario, diretorio)
+        shutil.rmtree(antigo, ignore_errors=True)
+
+    @classmethod
+    def abrir(cls, diretorio=DIRETORIO_INCREMENTAL):
+        """Estado gravado ou ``None``; uma troca interrompida recupera a versão anterior.
+
+        Estados gravados antes da contagem por par também dão ``None`` e são
+        reconstruídos do início.
+        """
+        if not os.path.exists(diretorio) and os.path.exists(f'{diretorio}.old'):
+            os.replace(f'{diretorio}.old', diretorio)
+        if not all(os.path.exists(os.path.join(diretorio, arquivo)) for arquivo in ('marca.json', 'contagens.npy')):
+            return None
+        with open(os.path.join(diretorio, 'marca.json'), encoding='utf-8') as f:
+            marca = json.load(f)
+        municipios = pq.read_table(os.path.join(diretorio, 'municipios.parquet'))
+        return cls(
+            marca,
+            pd.Index(municipios['MUNICÍPIO'].to_pylist(), dtype=object),
+            municipios['VOLUME'].to_numpy(),
+            pd.Index(pq.read_table(os.path.join(diretorio, 'nomes.parquet'))['NOME'].to_pylist(), dtype=object),
+            np.load(os.path.join(diretorio, 'pares.npy')),
+            np.load(os.path.join(diretorio, 'registros.npy')),
+            np.load(os.path.join(diretorio, 'contagens.npy')),
+        )
+
+
+def atualizar(caminho, erro_relativo=ERRO_RELATIVO_PADRAO, diretorio=DIRETORIO_INCREMENTAL,
+              tamanho_bloco=TAMANHO_BLOCO):
+    """Incorpora ao estado as linhas acrescentadas a ``caminho``; devolve (estado, linhas novas)."""
+    precisao = precisao_para_erro(erro_relativo)
+    estado = EstadoIncremental.abrir(diretorio)
+    if estado is None or estado.precisao != precisao or not estado.continua(caminho):
+        estado = EstadoIncremental.vazio(precisao)
+
+    linhas_antes = estado.marca['linhas']
+    for colunas, linhas, offset in ler_acrescimos(caminho, estado.marca['offset'], estado.marca['colunas'],
+                                                  tamanho_bloco):
+        estado.incorporar(linhas)
+        estado.marca.update(
+            colunas=colunas,
+            offset=offset,
+            linhas=estado.marca['linhas'] + len(linhas),
+            ancora=ancora(caminho, offset),
+        )
+        estado.salvar(diretorio)
+    return estado, estado.marca['linhas'] - linhas_antes
+
+
+def agregar_em_blocos(caminho, erro_relativo=ERRO_RELATIVO_PADRAO, linhas_bloco=LINHAS_BLOCO, progresso=True):
+    """Estado agregado de ``caminho`` inteiro, lido em blocos de ``linhas_bloco`` linhas.
+
+    Só MUNICÍPIO e PRIMEIRO_NOME são lidos. Cada bloco é incorporado e
+    descartado antes do próximo, então o pico de memória depende do tamanho do
+    bloco e do número de pares distintos, não do tamanho do arquivo. Nada é
+    gravado em disco.
+    """
+    estado = EstadoIncremental.vazio(precisao_para_erro(erro_relativo))
+    with open(caminho, 'rb') as f, tqdm(total=os.path.getsize(caminho), unit='B', unit_scale=True,
+                                         desc='Atendimentos', disable=not progresso) as barra:
+        blocos = pd.read_csv(f, usecols=list(COLUNAS_AGREGADAS), dtype=COLUNAS_AGREGADAS, chunksize=linhas_bloco)
+        for bloco in blocos:
+            estado.incorporar(bloco)
+            estado.marca['linhas'] += len(bloco)
+            barra.update(f.tell() - barra.n)
+    return estado
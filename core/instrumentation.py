@@ -0,0 +1,163 @@
+"""Medição das etapas do caminho quente das páginas (tempo, linhas e memória).
+
+Cada etapa é envolvida por ``medir`` (gerenciador de contexto) ou decorada com
+``cronometrar``. São registrados o tempo de parede, as linhas de entrada e de
+saída (quando informadas) e a variação da memória residente do processo. Cada
+medição é emitida como uma linha JSON no logger ``core.desempenho`` e, durante
+uma execução de página iniciada por ``iniciar_pagina``, guardada para o painel
+de desempenho da barra lateral (``painel_desempenho``).
+
+O nível do log vem da variável de ambiente ``SUS_LOG_DESEMPENHO`` (padrão
+``INFO``; use ``WARNING`` para silenciar). Fora das páginas (job em lote,
+notebooks) as medições só vão para o log.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+logger = logging.getLogger('core.desempenho')
+if not logger.handlers:
+    _saida = logging.StreamHandler(sys.stderr)
+    _saida.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_saida)
+    logger.setLevel(os.environ.get('SUS_LOG_DESEMPENHO', 'INFO').upper())
+    logger.propagate = False
+
+# Medições da execução de página corrente (cada execução roda em sua própria thread)
+_execucao = contextvars.ContextVar('execucao_desempenho', default=None)
+_nivel = contextvars.ContextVar('nivel_desempenho', default=0)
+
+
+def memoria_residente():
+    """Memória residente do processo em bytes, ou ``None`` se a plataforma não a expõe."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def contar_linhas(valor):
+    """Linhas de um DataFrame/Series/array (ou de ``valor.municipios``), senão ``None``."""
+    if valor is None or isinstance(valor, int):
+        return valor
+    if hasattr(valor, 'shape') and len(getattr(valor, 'shape', ())) > 0:
+        return int(valor.shape[0])
+    municipios = getattr(valor, 'municipios', None)
+    return None if municipios is None else len(municipios)
+
+
+class Etapa:
+    """Uma medição; ``linhas_saida`` pode ser preenchida dentro do bloco medido."""
+
+    def __init__(self, nome, linhas_entrada=None, nivel=0):
+        self.nome = nome
+        self.linhas_entrada = linhas_entrada
+        self.linhas_saida = None
+        self.nivel = nivel
+        self.segundos = None
+        self.memoria_delta = None
+
+    def saida(self, valor):
+        """Registra as linhas de saída a partir do resultado da etapa e o devolve."""
+        self.linhas_saida = contar_linhas(valor)
+        return valor
+
+    def como_dict(self):
+        return {
+            'etapa': self.nome,
+            'nivel': self.nivel,
+            'ms': round(self.segundos * 1000, 3),
+            'linhas_entrada': self.linhas_entrada,
+            'linhas_saida': self.linhas_saida,
+            'memoria_delta_bytes': self.memoria_delta,
+        }
+
+
+def iniciar_pagina(pagina):
+    """Começa a coletar as medições de uma execução da página ``pagina``."""
+    execucao = {'pagina': pagina, 'inicio': time.perf_counter(), 'etapas': []}
+    _execucao.set(execucao)
+    _nivel.set(0)
+    return execucao
+
+
+@contextmanager
+def medir(nome, linhas_entrada=None):
+    """Mede o bloco como a etapa ``nome``; produz a ``Etapa`` para registrar as linhas de saída.
+
+    ``linhas_entrada`` aceita um número ou o próprio dado de entrada.
+    """
+    nivel = _nivel.get()
+    etapa = Etapa(nome, contar_linhas(linhas_entrada), nivel)
+    execucao = _execucao.get()
+    if execucao is not None:
+        # Guardada já no início: no painel, etapas internas aparecem sob a externa
+        execucao['etapas'].append(etapa)
+    memoria_antes = memoria_residente()
+    token = _nivel.set(nivel + 1)
+    inicio = time.perf_counter()
+    try:
+        yield etapa
+    finally:
+        etapa.segundos = time.perf_counter() - inicio
+        _nivel.reset(token)
+        memoria_depois = memoria_residente()
+        if memoria_antes is not None and memoria_depois is not None:
+            etapa.memoria_delta = memoria_depois - memoria_antes
+        registro = etapa.como_dict()
+        if execucao is not None:
+            registro['pagina'] = execucao['pagina']
+        logger.info(json.dumps(registro, ensure_ascii=False))
+
+
+def cronometrar(nome=None):
+    """Decorador: mede cada chamada da função, com as linhas do resultado como saída."""
+    def decorador(funcao):
+        rotulo = nome or funcao.__qualname__
+
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            with medir(rotulo) as etapa:
+                return etapa.saida(funcao(*args, **kwargs))
+        return medida
+    return decorador
+
+
+def painel_desempenho():
+    """Painel opcional na barra lateral com as etapas medidas nesta execução da página."""
+    execucao = _execucao.get()
+    with st.sidebar:
+        if not st.toggle("⏱️ Painel de desempenho", value=False, key='painel_desempenho'):
+            return
+        if execucao is None:
+            st.caption("Nenhuma etapa medida nesta página.")
+            return
+        total_ms = (time.perf_counter() - execucao['inicio']) * 1000
+        etapas = [e.como_dict() for e in execucao['etapas'] if e.segundos is not None]
+        tabela = pd.DataFrame({
+            'Etapa': ['  ' * e['nivel'] + e['etapa'] for e in etapas],
+            'Tempo (ms)': [e['ms'] for e in etapas],
+            'Linhas (entrada)': pd.array([e['linhas_entrada'] for e in etapas], dtype='Int64'),
+            'Linhas (saída)': pd.array([e['linhas_saida'] for e in etapas], dtype='Int64'),
+            'Memória (MB)': [
+                None if e['memoria_delta_bytes'] is None else e['memoria_delta_bytes'] / 2**20 for e in etapas
+            ],
+        })
+        st.caption(f"Execução da página: {total_ms:,.0f} ms")
+        st.dataframe(
+            tabela,
+            hide_index=True,
+            column_config={
+                'Tempo (ms)': st.column_config.NumberColumn(format="%.1f"),
+                'Memória (MB)': st.column_config.NumberColumn(format="%+.1f"),
+            },
+        )
@@ -0,0 +1,126 @@
+"""Correspondência aproximada de nomes de município (erros de digitação, abreviações).
+
+Usada por ``DimensaoMunicipios`` apenas para os nomes distintos que não
+encontraram correspondência exata pela chave canônica. Cada nome do Censo é
+indexado, dentro da sua UF, por dois tipos de bloco:
+
+* os trigramas da chave expandida (abreviações como "S." → "SAO" e "STA" →
+  "SANTA" desfeitas, pontuação removida);
+* uma chave fonética simplificada do português ("CH"/"X", "Z"/"S", "Y"/"I",
+  letras repetidas...).
+
+Um nome procurado só é comparado com os municípios das UFs pedidas que
+compartilham a chave fonética ou mais trigramas com ele, nunca com a tabela
+inteira. A similaridade é a maior razão do ``difflib.SequenceMatcher`` (0 a 1)
+entre as chaves expandidas e entre as chaves fonéticas; os limites superiores
+baratos (``real_quick_ratio``/``quick_ratio``) descartam sem o cálculo completo
+as comparações que não podem superar o melhor já encontrado nem
+``LIMIAR_SIMILARIDADE``.
+"""
+import re
+from collections import Counter
+from difflib import SequenceMatcher
+
+LIMIAR_SIMILARIDADE = 0.85
+MAX_CANDIDATOS = 25
+
+ABREVIACOES = {
+    'S': 'SAO',
+    'STA': 'SANTA',
+    'STO': 'SANTO',
+    'N': 'NOSSA',
+    'NS': 'NOSSA',
+    'NSA': 'NOSSA',
+    'SRA': 'SENHORA',
+    'SR': 'SENHOR',
+    'PRES': 'PRESIDENTE',
+    'GOV': 'GOVERNADOR',
+    'DR': 'DOUTOR',
+    'CEL': 'CORONEL',
+    'MAL': 'MARECHAL',
+    'SEN': 'SENADOR',
+}
+
+_FONEMAS = [
+    (re.compile(r'^H'), ''),
+    (re.compile(r'PH'), 'F'),
+    (re.compile(r'[CS]H'), 'X'),
+    (re.compile(r'LH'), 'L'),
+    (re.compile(r'NH'), 'N'),
+    (re.compile(r'C(?=[EI])|Z'), 'S'),
+    (re.compile(r'QU|C'), 'K'),
+    (re.compile(r'G(?=[EI])'), 'J'),
+    (re.compile(r'Y'), 'I'),
+    (re.compile(r'W'), 'V'),
+    (re.compile(r'(.)\1+'), r'\1'),
+]
+
+
+def chave_expandida(chave):
+    """Chave canônica sem pontuação e com as abreviações usuais desfeitas."""
+    palavras = re.sub(r'[^A-Z0-9]+', ' ', chave).split()
+    return ' '.join(ABREVIACOES.get(palavra, palavra) for palavra in palavras)
+
+
+def chave_fonetica(chave):
+    """Chave fonética simplificada (sem espaços) de uma chave expandida."""
+    texto = chave.replace(' ', '')
+    for padrao, substituto in _FONEMAS:
+        texto = padrao.sub(substituto, texto)
+    return texto
+
+
+def trigramas(chave):
+    texto = f'  {chave} '
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceAproximado:
+    """Índice em blocos (UF × trigrama e UF × chave fonética) dos nomes de município."""
+
+    def __init__(self, codigos, chaves, ufs):
+        self._codigos = list(codigos)
+        self._chaves = [chave_expandida(chave) for chave in chaves]
+        self._foneticas = [chave_fonetica(chave) for chave in self._chaves]
+        self._ufs = list(ufs)
+        self._por_trigrama = {}
+        self._por_fonetica = {}
+        for posicao, (chave, fonetica, uf) in enumerate(zip(self._chaves, self._foneticas, self._ufs)):
+            for trigrama in trigramas(chave):
+                self._por_trigrama.setdefault((uf, trigrama), []).append(posicao)
+            self._por_fonetica.setdefault((uf, fonetica), []).append(posicao)
+        self._todas_ufs = sorted(set(self._ufs))
+
+    def _candidatos(self, chave, fonetica, ufs):
+        """Posições que dividem a chave fonética ou mais trigramas com ``chave``, nas ``ufs``."""
+        compartilhados = Counter()
+        for uf in ufs:
+            for trigrama in trigramas(chave):
+                compartilhados.update(self._por_trigrama.get((uf, trigrama), ()))
+        candidatos = {posicao for posicao, _ in compartilhados.most_common(MAX_CANDIDATOS)}
+        for uf in ufs:
+            candidatos.update(self._por_fonetica.get((uf, fonetica), ()))
+        return candidatos
+
+    def buscar(self, chave, ufs=None, limiar=LIMIAR_SIMILARIDADE):
+        """Códigos mais parecidos com ``chave`` (empatados) e a similaridade; ``([], 0.0)`` abaixo do ``limiar``."""
+        chave = chave_expandida(chave)
+        if not chave:
+            return [], 0.0
+        fonetica = chave_fonetica(chave)
+        comparadores = (
+            (SequenceMatcher(None, '', chave, autojunk=False), self._chaves),
+            (SequenceMatcher(None, '', fonetica, autojunk=False), self._foneticas),
+        )
+        melhor, codigos = limiar, []
+        for posicao in self._candidatos(chave, fonetica, self._todas_ufs if ufs is None else ufs):
+            similaridade = 0.0
+            for comparador, referencias in comparadores:
+                comparador.set_seq1(referencias[posicao])
+                if comparador.real_quick_ratio() >= melhor and comparador.quick_ratio() >= melhor:
+                    similaridade = max(similaridade, comparador.ratio())
+            if similaridade > melhor or not codigos and similaridade >= melhor:
+                melhor, codigos = similaridade, [self._codigos[posicao]]
+            elif similaridade == melhor:
+                codigos.append(self._codigos[posicao])
+        return (sorted(codigos), melhor) if codigos else ([], 0.0)
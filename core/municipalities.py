@@ -0,0 +1,158 @@
+"""Dimensão de municípios do Censo, indexada pelo código IBGE.
+
+Os atendimentos do SUS trazem apenas o nome do município. Juntar pelo nome
+multiplica linhas quando há municípios homônimos em estados diferentes
+(ÁGUA BRANCA existe no PI, na PB e em AL), então cada atendimento é resolvido
+para um único ``Código municipal`` na ingestão e as páginas agrupam e juntam
+por esse inteiro.
+
+Nomes sem correspondência exata (erros de digitação, acento trocado,
+abreviações como "S." por "SÃO") passam pela busca aproximada de
+``core.matching``, uma vez por nome distinto; só os que continuam sem
+correspondência ficam fora das métricas.
+"""
+import numpy as np
+import pandas as pd
+
+from core.matching import IndiceAproximado
+from core.normalize import chave_municipio
+
+SEM_MUNICIPIO = -1
+# Sobe quando a regra de resolução muda; caches com códigos já resolvidos são refeitos
+VERSAO_RESOLUCAO = 2
+
+# Como cada nome distinto foi resolvido (ver ``correspondencias``)
+CORRESPONDENCIA_EXATA = 'exata'
+CORRESPONDENCIA_APROXIMADA = 'aproximada'
+SEM_CORRESPONDENCIA = 'sem correspondência'
+
+
+class DimensaoMunicipios:
+    """Tabela de municípios (índice = código IBGE) com índices de busca por nome."""
+
+    def __init__(self, df_ibge):
+        self.tabela = (
+            df_ibge.set_index('Código municipal')[['MUNICÍPIO', 'UF', 'pessoas', 'CHAVE_MUNICIPIO']]
+            .sort_index()
+        )
+        self._por_nome_uf = {}
+        self._por_nome = {}
+        self._por_chave = {}
+        for codigo, nome, chave, uf in zip(
+            self.tabela.index, self.tabela['MUNICÍPIO'], self.tabela['CHAVE_MUNICIPIO'], self.tabela['UF']
+        ):
+            self._por_nome.setdefault(nome, []).append(codigo)
+            self._por_chave.setdefault(chave, []).append(codigo)
+            self._por_nome_uf[(chave, uf)] = codigo
+            self._por_nome_uf[(nome, uf)] = codigo
+        self._aproximado = None
+
+    def __len__(self):
+        return len(self.tabela)
+
+    def _nas_ufs(self, codigos, ufs):
+        if ufs is None:
+            return list(codigos)
+        return [c for c in codigos if self.tabela.at[c, 'UF'] in ufs]
+
+    def candidatos(self, nome, ufs=None, chave=None):
+        """Códigos cujo nome corresponde a ``nome``; na falta, busca pela chave canônica."""
+        codigos = self._nas_ufs(self._por_nome.get(nome, []), ufs)
+        if codigos:
+            return codigos
+        if chave is None:
+            chave = chave_municipio(pd.Series([nome], dtype=object)).iloc[0]
+        return self._nas_ufs(self._por_chave.get(chave, []), ufs)
+
+    @property
+    def aproximado(self):
+        """Índice de busca aproximada, montado na primeira vez que um nome fica sem correspondência exata."""
+        if self._aproximado is None:
+            self._aproximado = IndiceAproximado(
+                self.tabela.index, self.tabela['CHAVE_MUNICIPIO'], self.tabela['UF']
+            )
+        return self._aproximado
+
+    def codigo(self, nome, uf):
+        """Código do município ``nome`` na ``uf``, ou ``SEM_MUNICIPIO``."""
+        return self._por_nome_uf.get((nome, uf), SEM_MUNICIPIO)
+
+    def resolver(self, nomes, ufs=None):
+        """Resolve nomes de município dos atendimentos para códigos IBGE (int32).
+
+        A busca é feita uma vez por nome distinto (ver ``resolver_unicos``).
+        Nomes desconhecidos recebem ``SEM_MUNICIPIO``.
+        """
+        codigos_linhas, unicos = pd.factorize(nomes)
+        contagem = np.bincount(codigos_linhas[codigos_linhas >= 0], minlength=len(unicos))
+        resolvidos = self.resolver_unicos(unicos, contagem, ufs)
+        return np.where(codigos_linhas >= 0, resolvidos[codigos_linhas], SEM_MUNICIPIO).astype(np.int32)
+
+    def resolver_unicos(self, nomes, contagem, ufs=None):
+        """Resolve nomes distintos, sabendo quantos atendimentos cada um tem.
+
+        A busca é feita primeiro com acentos, depois pela chave canônica e,
+        por fim, pela busca aproximada (``core.matching``) restrita às
+        ``ufs``. Quando o nome é ambíguo, ele vai para o candidato cuja UF
+        concentra mais atendimentos já resolvidos sem ambiguidade (o extrato é
+        regional), desempatando pela maior população.
+        """
+        return self._resolver_unicos(nomes, contagem, ufs)[0]
+
+    def correspondencias(self, nomes, contagem, ufs=None):
+        """Como cada nome distinto foi resolvido, para relatórios de qualidade da junção.
+
+        Uma linha por nome com NOME, ATENDIMENTOS, COD_MUNICIPIO,
+        MUNICIPIO_IBGE, UF, CORRESPONDENCIA (``CORRESPONDENCIA_EXATA``,
+        ``CORRESPONDENCIA_APROXIMADA`` ou ``SEM_CORRESPONDENCIA``) e a
+        SIMILARIDADE da busca aproximada (1 nas exatas, 0 sem correspondência).
+        """
+        resolvidos, aproximados, similaridade = self._resolver_unicos(nomes, contagem, ufs)
+        encontrados = resolvidos != SEM_MUNICIPIO
+        correspondencia = np.where(
+            encontrados,
+            np.where(aproximados, CORRESPONDENCIA_APROXIMADA, CORRESPONDENCIA_EXATA),
+            SEM_CORRESPONDENCIA,
+        )
+        municipios = self.tabela.reindex(resolvidos)
+        return pd.DataFrame({
+            'NOME': np.asarray(nomes, dtype=object),
+            'ATENDIMENTOS': np.asarray(contagem),
+            'COD_MUNICIPIO': resolvidos,
+            'MUNICIPIO_IBGE': municipios['MUNICÍPIO'].to_numpy(),
+            'UF': municipios['UF'].to_numpy(),
+            'CORRESPONDENCIA': correspondencia.astype(object),
+            'SIMILARIDADE': np.where(encontrados, np.where(aproximados, similaridade, 1.0), 0.0),
+        })
+
+    def _resolver_unicos(self, nomes, contagem, ufs):
+        nomes = pd.Series(np.asarray(nomes, dtype=object))
+        contagem = np.asarray(contagem)
+        chaves = chave_municipio(nomes)
+
+        resolvidos = np.full(len(nomes), SEM_MUNICIPIO, dtype=np.int32)
+        aproximados = np.zeros(len(nomes), dtype=bool)
+        similaridade = np.zeros(len(nomes))
+        ambiguos = {}
+        for i, (nome, chave) in enumerate(zip(nomes, chaves)):
+            candidatos = self.candidatos(nome, ufs, chave)
+            if not candidatos and isinstance(chave, str):
+                candidatos, similaridade[i] = self.aproximado.buscar(chave, ufs)
+                aproximados[i] = True
+            if len(candidatos) == 1:
+                resolvidos[i] = candidatos[0]
+            elif candidatos:
+                ambiguos[i] = candidatos
+
+        if ambiguos:
+            unico = resolvidos != SEM_MUNICIPIO
+            volume_uf = (
+                pd.Series(contagem[unico], index=self.tabela['UF'].reindex(resolvidos[unico]).to_numpy())
+                .groupby(level=0).sum()
+            )
+            for i, candidatos in ambiguos.items():
+                resolvidos[i] = max(
+                    candidatos,
+                    key=lambda c: (volume_uf.get(self.tabela.at[c, 'UF'], 0), self.tabela.at[c, 'pessoas']),
+                )
+        return resolvidos, aproximados, similaridade
@@ -0,0 +1,78 @@
+"""Normalização vetorizada de nomes de municípios e primeiros nomes.
+
+As limpezas são aplicadas sobre os valores distintos de cada coluna (algumas
+centenas de municípios e alguns milhares de nomes) e depois mapeadas de volta
+para as linhas pelos códigos de ``pd.factorize``. O custo por linha fica em
+uma indexação de array, independente de quantos atendimentos existam.
+"""
+import numpy as np
+import pandas as pd
+
+
+def limpar_espacos(serie):
+    """Remove espaços nas pontas e colapsa espaços internos repetidos."""
+    return serie.str.strip().str.replace(r'\s+', ' ', regex=True)
+
+
+def remover_acentos(serie):
+    return (
+        serie.str.normalize('NFKD')
+        .str.encode('ascii', errors='ignore')
+        .str.decode('ascii')
+    )
+
+
+def nome_municipio(serie):
+    """Nome de exibição: maiúsculo, com acentos, sem espaços sobrando."""
+    return limpar_espacos(serie).str.upper()
+
+
+def chave_municipio(serie):
+    """Chave canônica para junções: maiúscula, sem acentos e sem espaços sobrando."""
+    return remover_acentos(nome_municipio(serie))
+
+
+def chave_primeiro_nome(serie):
+    """Primeiro nome canônico, descartando palavras com menos de 3 letras ("DE", "DA"...)."""
+    sem_palavras_curtas = serie.str.replace(r'(?<!\S)\S{1,2}(?!\S)', '', regex=True)
+    return remover_acentos(limpar_espacos(sem_palavras_curtas).str.upper())
+
+
+def por_valores_unicos(serie, funcao):
+    """Aplica ``funcao`` apenas aos valores distintos de ``serie`` e devolve um Categorical."""
+    codigos, unicos = pd.factorize(serie)
+    normalizados = funcao(pd.Series(unicos, dtype=object))
+    novos_codigos, categorias = pd.factorize(normalizados)
+    # Valores nulos (código -1) continuam nulos
+    codigos_linhas = np.where(codigos >= 0, novos_codigos[codigos], -1)
+    return pd.Series(
+        pd.Categorical.from_codes(codigos_linhas, categories=categorias),
+        index=serie.index,
+        name=serie.name,
+    )
+
+
+def normalizar_atendimentos(df):
+    """Atendimentos prontos para análise: sem nomes nulos e com colunas canônicas.
+
+    Retorna ID, MUNICÍPIO (nome limpo), CHAVE_MUNICIPIO (sem acentos) e
+    PRIMEIRO_NOME (canônico), todas as colunas de texto como categorias.
+    """
+    df = df.loc[df['PRIMEIRO_NOME'].notna(), ['ID', 'MUNICÍPIO', 'PRIMEIRO_NOME']]
+    return pd.DataFrame({
+        'ID': df['ID'],
+        'MUNICÍPIO': por_valores_unicos(df['MUNICÍPIO'], nome_municipio),
+        'CHAVE_MUNICIPIO': por_valores_unicos(df['MUNICÍPIO'], chave_municipio),
+        'PRIMEIRO_NOME': por_valores_unicos(df['PRIMEIRO_NOME'], chave_primeiro_nome),
+    }).reset_index(drop=True)
+
+
+def normalizar_ibge(df):
+    """Censo com MUNICÍPIO em maiúsculas e a mesma CHAVE_MUNICIPIO dos atendimentos."""
+    return pd.DataFrame({
+        'MUNICÍPIO': nome_municipio(df['Municípios'].astype(object)),
+        'Código municipal': df['Código municipal'],
+        'UF': df['UF'],
+        'pessoas': df['pessoas'],
+        'CHAVE_MUNICIPIO': chave_municipio(df['Municípios'].astype(object)),
+    })
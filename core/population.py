@@ -0,0 +1,71 @@
+"""Consultas por faixa populacional sobre a tabela de municípios do cubo.
+
+Dentro de cada UF os municípios ficam ordenados pela população, com somas
+prefixadas de atendimentos, população e taxa por 100 mil habitantes. Uma
+faixa ``[minimo, maximo]`` vira duas buscas binárias por UF, e os totais do
+recorte saem de diferenças entre somas prefixadas, sem percorrer as linhas.
+As linhas só são materializadas quando a página precisa delas (ranking,
+gráficos por município), como fatias contíguas da ordem pré-calculada.
+"""
+import numpy as np
+import pandas as pd
+
+from core.aggregates import taxa_100k
+
+
+class IndicePopulacional:
+    """Municípios ordenados por (UF, população) com somas prefixadas por UF."""
+
+    def __init__(self, municipios):
+        ordem = np.lexsort((municipios['pessoas'].to_numpy(), municipios['UF'].to_numpy()))
+        ufs = municipios['UF'].to_numpy()[ordem]
+        self.ufs, inicios = np.unique(ufs, return_index=True)
+        self._limites = np.append(inicios, len(ordem))
+        self._ordem = ordem
+        self.pessoas = municipios['pessoas'].to_numpy(np.int64)[ordem]
+
+        # Uma soma prefixada por coluna, reiniciada em cada UF: acumulado[i] = soma de [inicio_uf, i)
+        self._acumulados = {}
+        for coluna, valores in (
+            ('VOLUME_ATENDIMENTOS', municipios['VOLUME_ATENDIMENTOS'].to_numpy(np.int64)[ordem]),
+            ('pessoas', self.pessoas),
+            ('TAXA_100K', municipios['TAXA_100K'].to_numpy(np.float64)[ordem]),
+        ):
+            acumulado = np.zeros(len(ordem) + 1, dtype=valores.dtype)
+            np.cumsum(valores, out=acumulado[1:])
+            self._acumulados[coluna] = acumulado
+
+    def __len__(self):
+        return len(self._ordem)
+
+    def _intervalos(self, ufs, minimo, maximo):
+        """Para cada UF pedida, as posições [inicio, fim) dos municípios na faixa."""
+        selecionadas = np.flatnonzero(np.isin(self.ufs, list(ufs))) if ufs is not None else np.arange(len(self.ufs))
+        inicios, fins = [], []
+        for i in selecionadas:
+            a, b = self._limites[i], self._limites[i + 1]
+            inicios.append(a + np.searchsorted(self.pessoas[a:b], minimo, side='left'))
+            fins.append(a + np.searchsorted(self.pessoas[a:b], maximo, side='right'))
+        return self.ufs[selecionadas], np.array(inicios, dtype=np.int64), np.array(fins, dtype=np.int64)
+
+    def resumo(self, ufs=None, minimo=-np.inf, maximo=np.inf):
+        """Mesmo resultado de ``resumo_por_uf`` para os municípios das ``ufs`` com população na faixa."""
+        siglas, inicios, fins = self._intervalos(ufs, minimo, maximo)
+        somas = {coluna: acumulado[fins] - acumulado[inicios] for coluna, acumulado in self._acumulados.items()}
+        quantidade = fins - inicios
+        resumo = pd.DataFrame({
+            'UF': siglas.astype(object),
+            'VOLUME_ATENDIMENTOS': somas['VOLUME_ATENDIMENTOS'],
+            'pessoas': somas['pessoas'],
+            'QTD_MUNICIPIOS': quantidade,
+            'TAXA_100K_MEDIA': somas['TAXA_100K'] / np.maximum(quantidade, 1),
+        })[quantidade > 0].reset_index(drop=True)
+        resumo['TAXA_100K'] = taxa_100k(resumo['VOLUME_ATENDIMENTOS'], resumo['pessoas'])
+        return resumo
+
+    def posicoes(self, ufs=None, minimo=-np.inf, maximo=np.inf):
+        """Posições (em ``municipios``) dos municípios na faixa, agrupados por UF e ordenados pela população."""
+        _, inicios, fins = self._intervalos(ufs, minimo, maximo)
+        if len(inicios) == 0:
+            return self._ordem[:0]
+        return np.concatenate([self._ordem[a:b] for a, b in zip(inicios, fins)])
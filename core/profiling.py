@@ -0,0 +1,212 @@
+"""Perfil estatístico dos datasets, calculado uma vez na ingestão.
+
+Cada coluna é percorrida uma única vez: ``pd.factorize`` fornece ao mesmo
+tempo os nulos, os valores distintos, os mais frequentes e o mínimo/máximo
+(sobre os distintos). A máscara de nulos de cada coluna é acumulada para
+contar as linhas com algum nulo, sem uma segunda varredura. O perfil é gravado
+em JSON ao lado do cache colunar e reaproveitado enquanto a origem não mudar.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from core.cache import DIRETORIO_CACHE, descrever_fonte, fonte_inalterada
+from core.sketches import estimar_cardinalidade, hash_valores, posicoes_e_ranks, precisao_para_erro
+
+TOP_VALORES = 5
+LIMITE_CONTAGENS = 100_000
+
+
+def _python(valor):
+    """Converte escalares numpy/pandas para tipos serializáveis em JSON."""
+    if valor is None or valor is pd.NA or (isinstance(valor, float) and np.isnan(valor)):
+        return None
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+
+def perfil_coluna(serie):
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+    nulos = codigos < 0
+    contagens = np.bincount(codigos[~nulos], minlength=len(unicos))
+    top = np.argsort(-contagens, kind='stable')[:TOP_VALORES]
+
+    minimo = maximo = None
+    if len(unicos):
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            valores = pd.Series(np.asarray(unicos, dtype=object))
+        else:
+            valores = pd.Series(unicos)
+        minimo, maximo = _python(valores.min()), _python(valores.max())
+
+    return {
+        'dtype': str(serie.dtype),
+        'nulos': int(nulos.sum()),
+        'distintos': int(len(unicos)),
+        'minimo': minimo,
+        'maximo': maximo,
+        'top': [[_python(unicos[i]), int(contagens[i])] for i in top],
+    }, nulos
+
+
+def perfil_dataset(df):
+    """Estatísticas de todas as colunas de ``df`` em uma única passada por coluna."""
+    linhas_com_nulos = np.zeros(len(df), dtype=bool)
+    colunas = {}
+    for nome in df.columns:
+        colunas[nome], nulos = perfil_coluna(df[nome])
+        linhas_com_nulos |= nulos
+
+    return {
+        'linhas': int(len(df)),
+        'colunas': colunas,
+        'nulos_total': int(sum(c['nulos'] for c in colunas.values())),
+        'linhas_com_nulos': int(linhas_com_nulos.sum()),
+    }
+
+
+def _acumular_bloco(acumulado, serie, precisao):
+    contagens = serie.value_counts(sort=False)
+    contagens = contagens[contagens > 0]
+    contagens.index = pd.Index(np.asarray(contagens.index, dtype=object))
+    acumulado['nulos'] += int(serie.isna().sum())
+    if not len(contagens):
+        return
+
+    posicoes, ranks = posicoes_e_ranks(hash_valores(contagens.index), precisao)
+    np.maximum.at(acumulado['registros'], posicoes, ranks)
+    extremos = [v for v in (acumulado['minimo'], acumulado['maximo']) if v is not None]
+    valores = pd.Series(list(contagens.index) + extremos, dtype=object)
+    acumulado['minimo'], acumulado['maximo'] = valores.min(), valores.max()
+
+    # Ordem de primeira aparição preservada para desempates iguais aos de perfil_dataset
+    if acumulado['contagens'] is not None:
+        contagens = pd.concat([acumulado['contagens'], contagens]).groupby(level=0, sort=False).sum()
+    somadas = contagens
+    if len(somadas) > LIMITE_CONTAGENS:
+        somadas = somadas.nlargest(LIMITE_CONTAGENS, keep='first')
+        acumulado['truncado'] = True
+    acumulado['contagens'] = somadas
+
+
+def perfil_em_blocos(blocos, erro_relativo=0.01):
+    """Mesmo perfil de ``perfil_dataset`` para um CSV lido em blocos, com memória limitada.
+
+    As contagens por valor são exatas enquanto a coluna tiver até
+    ``LIMITE_CONTAGENS`` valores distintos. Acima disso só os mais frequentes
+    são mantidos e o total de distintos passa a vir de um HyperLogLog.
+    """
+    precisao = precisao_para_erro(erro_relativo)
+    acumulados = {}
+    linhas = linhas_com_nulos = 0
+    for bloco in blocos:
+        linhas += len(bloco)
+        linhas_com_nulos += int(bloco.isna().any(axis=1).sum())
+        for nome in bloco.columns:
+            acumulado = acumulados.setdefault(nome, {
+                'dtype': str(bloco[nome].dtype), 'nulos': 0, 'minimo': None, 'maximo': None,
+                'contagens': None, 'truncado': False,
+                'registros': np.zeros(1 << precisao, dtype=np.uint8),
+            })
+            _acumular_bloco(acumulado, bloco[nome], precisao)
+
+    colunas = {}
+    for nome, a in acumulados.items():
+        contagens = a['contagens'] if a['contagens'] is not None else pd.Series(dtype='int64')
+        contagens = contagens.sort_values(ascending=False, kind='stable')
+        distintos = round(estimar_cardinalidade(a['registros'])) if a['truncado'] else len(contagens)
+        colunas[nome] = {
+            'dtype': a['dtype'],
+            'nulos': a['nulos'],
+            'distintos': int(distintos),
+            'minimo': _python(a['minimo']),
+            'maximo': _python(a['maximo']),
+            'top': [[_python(v), int(n)] for v, n in contagens.head(TOP_VALORES).items()],
+        }
+    return {
+        'linhas': int(linhas),
+        'colunas': colunas,
+        'nulos_total': int(sum(c['nulos'] for c in colunas.values())),
+        'linhas_com_nulos': int(linhas_com_nulos),
+    }
+
+
+def caminho_perfil(nome, diretorio=DIRETORIO_CACHE):
+    return os.path.join(diretorio, f'{nome}.perfil.json')
+
+
+def perfil_dataset_dask(ddf):
+    """Mesmo perfil de ``perfil_dataset`` calculado fora da memória com Dask.
+
+    Todas as estatísticas entram em um único ``dask.compute``, então o arquivo
+    é lido uma vez. Distintos usam ``nunique_approx`` (HyperLogLog do Dask).
+    """
+    import dask
+
+    tarefas = {}
+    for nome in ddf.columns:
+        serie = ddf[nome]
+        tarefas[nome] = {
+            'nulos': serie.isna().sum(),
+            'distintos': serie.nunique_approx(),
+            'minimo': serie.min(),
+            'maximo': serie.max(),
+            'top': serie.value_counts().nlargest(TOP_VALORES),
+        }
+    tarefas['_linhas'] = ddf.map_partitions(len).sum()
+    tarefas['_linhas_com_nulos'] = ddf.isna().any(axis=1).sum()
+    (resultado,) = dask.compute(tarefas)
+
+    colunas = {
+        nome: {
+            'dtype': str(ddf[nome].dtype),
+            'nulos': int(estatisticas['nulos']),
+            'distintos': int(estatisticas['distintos']),
+            'minimo': _python(estatisticas['minimo']),
+            'maximo': _python(estatisticas['maximo']),
+            'top': [[_python(v), int(n)] for v, n in estatisticas['top'].items()],
+        }
+        for nome, estatisticas in resultado.items() if not nome.startswith('_')
+    }
+    return {
+        'linhas': int(resultado['_linhas']),
+        'colunas': colunas,
+        'nulos_total': int(sum(c['nulos'] for c in colunas.values())),
+        'linhas_com_nulos': int(resultado['_linhas_com_nulos']),
+    }
+
+
+def carregar_perfil(nome, caminho_fonte, calcular, diretorio=DIRETORIO_CACHE):
+    """Perfil gravado de ``nome`` ou, se a origem mudou, recalculado por ``calcular()``."""
+    caminho = caminho_perfil(nome, diretorio)
+    if os.path.exists(caminho):
+        with open(caminho, encoding='utf-8') as f:
+            gravado = json.load(f)
+        if fonte_inalterada(gravado.get('fonte'), caminho_fonte):
+            return gravado['perfil']
+
+    perfil = calcular()
+    os.makedirs(diretorio, exist_ok=True)
+    with open(caminho, 'w', encoding='utf-8') as f:
+        fonte = descrever_fonte(caminho_fonte) if os.path.exists(caminho_fonte) else None
+        json.dump({'fonte': fonte, 'perfil': perfil}, f, ensure_ascii=False)
+    return perfil
+
+
+def tabela_perfil(perfil):
+    """Perfil das colunas como DataFrame para exibição."""
+    return pd.DataFrame([
+        {
+            'Coluna': nome,
+            'Tipo': c['dtype'],
+            'Nulos': c['nulos'],
+            'Distintos': c['distintos'],
+            'Mínimo': None if c['minimo'] is None else str(c['minimo']),
+            'Máximo': None if c['maximo'] is None else str(c['maximo']),
+            'Mais frequentes': ', '.join(f"{str(v).strip()} ({n:,})" for v, n in c['top']),
+        }
+        for nome, c in perfil['colunas'].items()
+    ])
@@ -0,0 +1,228 @@
+"""Consultas preguiçosas sobre os atendimentos, com filtros e projeções empurrados para o início.
+
+Uma ``Consulta`` apenas registra operações (``selecionar``, ``filtrar_ufs``,
+``filtrar_municipios``, ``agregar``) e nada é lido até ``executar``. Cada
+método devolve uma nova consulta, então uma página pode declarar o recorte
+uma vez e derivar dele as variações de que precisa.
+
+O plano executado não segue a ordem em que as operações foram declaradas:
+
+* os filtros por UF e por município são combinados (interseção) e aplicados
+  o mais cedo possível. Sobre o CSV bruto (``FonteAtendimentos``), só o Censo
+  das UFs pedidas é normalizado, os nomes de município são resolvidos uma vez
+  por nome distinto e as linhas fora do recorte saem antes da normalização
+  dos primeiros nomes;
+* só as colunas usadas por alguma operação são lidas e normalizadas; sem
+  PRIMEIRO_NOME na saída, os nomes não são normalizados;
+* a junção com o Censo acontece depois dos filtros e, quando há agregação
+  por atributos do município, sobre os totais por código em vez das linhas.
+
+``FonteCubo`` executa a mesma consulta sobre o cubo compartilhado das páginas,
+onde os filtros viram uma máscara sobre a tabela por município (ou operações
+sobre os bitmaps de ``core.filters``, quando o índice é passado). ``explicar``
+descreve o plano físico escolhido.
+"""
+import numpy as np
+import pandas as pd
+
+from core.census import CAMINHO_CENSO, ler_censo
+from core.municipalities import SEM_MUNICIPIO, DimensaoMunicipios
+from core.normalize import chave_primeiro_nome, nome_municipio, normalizar_ibge, por_valores_unicos
+
+METRICA = 'VOLUME_ATENDIMENTOS'
+# Atributos que dependem só do código do município (agregáveis antes da junção)
+ATRIBUTOS_MUNICIPIO = ('COD_MUNICIPIO', 'MUNICÍPIO', 'UF', 'pessoas')
+
+
+class Plano:
+    """Operações de uma consulta já combinadas e reordenadas."""
+
+    def __init__(self, ufs, municipios, colunas, agrupar):
+        self.ufs = ufs
+        self.municipios = municipios
+        self.colunas = colunas
+        self.agrupar = agrupar
+
+    @classmethod
+    def compilar(cls, operacoes, colunas_fonte):
+        """Combina ``operacoes`` na ordem declarada, validando as colunas disponíveis a cada passo."""
+        ufs = municipios = agrupar = None
+        colunas = list(colunas_fonte)
+        for tipo, valor in operacoes:
+            if tipo in ('filtrar_ufs', 'filtrar_municipios'):
+                coluna = 'UF' if tipo == 'filtrar_ufs' else 'COD_MUNICIPIO'
+                if agrupar is not None and coluna not in agrupar:
+                    raise ValueError(f'{tipo} depois de agregar exige {coluna} entre as chaves do agrupamento')
+                valores = frozenset(valor)
+                if tipo == 'filtrar_ufs':
+                    ufs = valores if ufs is None else ufs & valores
+                else:
+                    municipios = valores if municipios is None else municipios & valores
+                continue
+
+            faltando = [c for c in valor if c not in colunas]
+            if faltando:
+                raise ValueError(f'Colunas indisponíveis para {tipo}: {", ".join(faltando)}')
+            if tipo == 'selecionar':
+                colunas = list(valor)
+            else:
+                agrupar = list(valor)
+                colunas = agrupar + [METRICA]
+        return cls(ufs, municipios, colunas, agrupar)
+
+    @property
+    def colunas_linhas(self):
+        """Colunas necessárias no nível das linhas (antes de uma eventual agregação)."""
+        return list(self.agrupar) if self.agrupar is not None else [c for c in self.colunas if c != METRICA]
+
+
+class Consulta:
+    """Consulta imutável e preguiçosa sobre uma fonte (``FonteCubo`` ou ``FonteAtendimentos``)."""
+
+    def __init__(self, fonte, operacoes=()):
+        self.fonte = fonte
+        self.operacoes = tuple(operacoes)
+
+    def _com(self, tipo, valor):
+        return Consulta(self.fonte, self.operacoes + ((tipo, tuple(valor)),))
+
+    def selecionar(self, *colunas):
+        return self._com('selecionar', colunas)
+
+    def filtrar_ufs(self, ufs):
+        return self._com('filtrar_ufs', ufs)
+
+    def filtrar_municipios(self, codigos):
+        """Mantém só os municípios com os códigos IBGE em ``codigos``."""
+        return self._com('filtrar_municipios', codigos)
+
+    def agregar(self, *por):
+        """Total de atendimentos (``VOLUME_ATENDIMENTOS``) por ``por``."""
+        return self._com('agregar', por)
+
+    def plano(self):
+        return Plano.compilar(self.operacoes, self.fonte.colunas)
+
+    def explicar(self):
+        """Plano físico, uma etapa por linha, na ordem em que será executado."""
+        return '\n'.join(f'{i}. {etapa}' for i, etapa in enumerate(self.fonte.etapas(self.plano()), 1))
+
+    def executar(self):
+        return self.fonte.executar(self.plano())
+
+
+def _agregar_linhas(linhas, chaves):
+    return linhas.groupby(chaves, observed=True, sort=True).size().rename(METRICA).reset_index()
+
+
+class FonteCubo:
+    """O cubo por município das páginas (índice = código IBGE) como fonte de consultas."""
+
+    def __init__(self, cubo, indice_filtros=None):
+        self.cubo = cubo
+        self.indice_filtros = indice_filtros
+        self.colunas = ['COD_MUNICIPIO', *cubo.municipios.columns]
+
+    def etapas(self, plano):
+        etapas = []
+        if plano.ufs is not None or plano.municipios is not None:
+            etapas.append(
+                'máscara de UFs/municípios sobre a tabela por município do cubo'
+                if self.indice_filtros is None else 'OU/E dos bitmaps de UFs e municípios (core.filters)'
+            )
+        if plano.agrupar is not None:
+            etapas.append(f'soma de {METRICA} por {", ".join(plano.agrupar)}')
+        etapas.append(f'projeção: {", ".join(plano.colunas)}')
+        return etapas
+
+    def executar(self, plano):
+        if self.indice_filtros is None:
+            municipios = self.cubo.filtrar(ufs=plano.ufs, municipios=plano.municipios)
+        elif plano.ufs is None and plano.municipios is None:
+            municipios = self.cubo.municipios
+        else:
+            municipios = self.cubo.municipios.iloc[self.indice_filtros.posicoes(plano.ufs, plano.municipios)]
+        if plano.agrupar is not None:
+            municipios = municipios.reset_index()
+            return (
+                municipios.groupby(plano.agrupar, observed=True, sort=True)[METRICA].sum()
+                .reset_index()[plano.colunas]
+            )
+        # O código continua no índice, como em ``CuboAtendimentos.filtrar``
+        return municipios[[c for c in plano.colunas if c != 'COD_MUNICIPIO']]
+
+
+class FonteAtendimentos:
+    """CSV bruto de atendimentos juntado ao Censo (linhas sem primeiro nome ou sem município ficam de fora)."""
+
+    colunas = ['ID', 'PRIMEIRO_NOME', 'COD_MUNICIPIO', 'MUNICÍPIO', 'UF', 'pessoas']
+
+    def __init__(self, caminho, caminho_ibge=CAMINHO_CENSO):
+        self.caminho = caminho
+        self.caminho_ibge = caminho_ibge
+
+    def _lidas(self, plano):
+        # PRIMEIRO_NOME é sempre lido: linhas sem nome ficam fora de todas as métricas
+        return ['MUNICÍPIO', 'PRIMEIRO_NOME'] + (['ID'] if 'ID' in plano.colunas_linhas else [])
+
+    def _agrega_por_codigo(self, plano):
+        return plano.agrupar is not None and all(c in ATRIBUTOS_MUNICIPIO for c in plano.agrupar)
+
+    def etapas(self, plano):
+        ufs = 'todas as UFs' if plano.ufs is None else ', '.join(sorted(plano.ufs))
+        etapas = [
+            f'leitura de {", ".join(self._lidas(plano))}',
+            f'normalização do Censo ({ufs})',
+            'resolução dos nomes de município distintos'
+            + ('' if plano.municipios is None else f' e filtro de {len(plano.municipios)} municípios'),
+        ]
+        if 'PRIMEIRO_NOME' in plano.colunas_linhas:
+            etapas.append('normalização dos primeiros nomes das linhas restantes')
+        if self._agrega_por_codigo(plano):
+            etapas.append('contagem por código de município')
+            etapas.append('junção com o Censo sobre os totais por código')
+            if plano.agrupar != ['COD_MUNICIPIO']:
+                etapas.append(f'soma por {", ".join(plano.agrupar)}')
+        else:
+            etapas.append('junção com o Censo por código')
+            if plano.agrupar is not None:
+                etapas.append(f'contagem por {", ".join(plano.agrupar)}')
+        etapas.append(f'projeção: {", ".join(plano.colunas)}')
+        return etapas
+
+    def executar(self, plano):
+        linhas = pd.read_csv(
+            self.caminho,
+            usecols=self._lidas(plano),
+            dtype={'ID': 'int64', 'MUNICÍPIO': 'category', 'PRIMEIRO_NOME': 'string[pyarrow]'},
+        )
+        linhas = linhas[linhas['PRIMEIRO_NOME'].notna()]
+
+        censo = ler_censo(self.caminho_ibge)
+        if plano.ufs is not None:
+            censo = censo[censo['UF'].isin(plano.ufs)]
+        dimensao = DimensaoMunicipios(normalizar_ibge(censo))
+
+        codigos = dimensao.resolver(por_valores_unicos(linhas['MUNICÍPIO'], nome_municipio))
+        mascara = codigos != SEM_MUNICIPIO
+        if plano.municipios is not None:
+            mascara &= np.isin(codigos, list(plano.municipios))
+        linhas = pd.DataFrame({'COD_MUNICIPIO': codigos[mascara], **{
+            coluna: linhas[coluna].to_numpy()[mascara]
+            for coluna in ('ID', 'PRIMEIRO_NOME') if coluna in plano.colunas_linhas
+        }})
+        if 'PRIMEIRO_NOME' in linhas:
+            linhas['PRIMEIRO_NOME'] = por_valores_unicos(linhas['PRIMEIRO_NOME'], chave_primeiro_nome)
+
+        atributos = [c for c in plano.colunas_linhas if c in ('MUNICÍPIO', 'UF', 'pessoas')]
+        if self._agrega_por_codigo(plano):
+            totais = _agregar_linhas(linhas, ['COD_MUNICIPIO'])
+            totais = totais.join(dimensao.tabela[atributos], on='COD_MUNICIPIO')
+            if plano.agrupar != ['COD_MUNICIPIO']:
+                totais = totais.groupby(plano.agrupar, observed=True, sort=True)[METRICA].sum().reset_index()
+            return totais[plano.colunas]
+
+        linhas = linhas.join(dimensao.tabela[atributos], on='COD_MUNICIPIO')
+        if plano.agrupar is not None:
+            linhas = _agregar_linhas(linhas, plano.agrupar)
+        return linhas[plano.colunas]
@@ -0,0 +1,71 @@
+"""Rankings (maiores e menores K) dos municípios do cubo por métrica.
+
+As ordenações são calculadas uma vez por métrica e direção, no mesmo critério
+de ``nlargest``/``nsmallest`` (empates na ordem original, valores ausentes
+fora do ranking), globalmente e por UF. Uma consulta não ordena nada:
+
+* filtro só por UFs: as ``k`` primeiras posições de cada UF são intercaladas
+  pelo posto global;
+* filtro arbitrário (conjunto de posições): a ordenação global é percorrida em
+  blocos até reunir ``k`` municípios selecionados.
+
+As funções devolvem posições em ``municipios`` (use ``iloc``).
+"""
+import numpy as np
+
+
+class RankingMunicipios:
+    """Ordenações pré-calculadas dos municípios para consultas de top-K e bottom-K."""
+
+    TAMANHO_BLOCO = 1024
+
+    def __init__(self, municipios, metricas=('VOLUME_ATENDIMENTOS', 'TAXA_100K')):
+        self._n = len(municipios)
+        self._ufs = municipios['UF'].to_numpy()
+        self._ordens = {}
+        for metrica in metricas:
+            valores = municipios[metrica].to_numpy(np.float64)
+            validos = np.flatnonzero(~np.isnan(valores))
+            for maiores in (True, False):
+                chave = -valores[validos] if maiores else valores[validos]
+                ordem = validos[np.argsort(chave, kind='stable')]
+                posto = np.full(self._n, self._n, dtype=np.int64)
+                posto[ordem] = np.arange(len(ordem))
+                por_uf = {uf: ordem[self._ufs[ordem] == uf] for uf in np.unique(self._ufs)}
+                self._ordens[metrica, maiores] = (ordem, posto, por_uf)
+
+    def maiores(self, metrica, k, ufs=None, posicoes=None):
+        """Posições dos ``k`` municípios de maior ``metrica`` (em ordem decrescente)."""
+        return self._consultar(metrica, True, k, ufs, posicoes)
+
+    def menores(self, metrica, k, ufs=None, posicoes=None):
+        """Posições dos ``k`` municípios de menor ``metrica`` (em ordem crescente)."""
+        return self._consultar(metrica, False, k, ufs, posicoes)
+
+    def _consultar(self, metrica, maiores, k, ufs, posicoes):
+        ordem, posto, por_uf = self._ordens[metrica, maiores]
+        if posicoes is None:
+            if ufs is None:
+                return ordem[:k]
+            candidatos = [por_uf[uf][:k] for uf in ufs if uf in por_uf]
+            if not candidatos:
+                return ordem[:0]
+            candidatos = np.concatenate(candidatos)
+            return candidatos[np.argsort(posto[candidatos], kind='stable')][:k]
+
+        selecionados = np.zeros(self._n, dtype=bool)
+        selecionados[np.asarray(posicoes, dtype=np.int64)] = True
+        if ufs is not None:
+            selecionados &= np.isin(self._ufs, list(ufs))
+        passo = max(self.TAMANHO_BLOCO, 4 * k)
+        encontrados, total = [], 0
+        for inicio in range(0, len(ordem), passo):
+            trecho = ordem[inicio:inicio + passo]
+            trecho = trecho[selecionados[trecho]]
+            encontrados.append(trecho)
+            total += len(trecho)
+            if total >= k:
+                break
+        if not encontrados:
+            return ordem[:0]
+        return np.concatenate(encontrados)[:k]
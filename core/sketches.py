@@ -0,0 +1,78 @@
+"""Sketches HyperLogLog por município para contagens aproximadas de distintos.
+
+Cada município guarda um vetor de registradores construído na ingestão. A
+contagem de distintos para qualquer combinação de municípios é o máximo
+elemento a elemento dos registradores selecionados, seguido da estimativa do
+HyperLogLog: o custo depende do número de municípios e do tamanho do sketch,
+não do número de atendimentos.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+ERRO_RELATIVO_PADRAO = 0.02
+
+
+def precisao_para_erro(erro_relativo):
+    """Menor precisão ``p`` (2**p registradores) com erro padrão ≤ ``erro_relativo``."""
+    p = math.ceil(math.log2((1.04 / erro_relativo) ** 2))
+    return min(max(p, 4), 18)
+
+
+def hash_valores(valores):
+    """Hash de 64 bits vetorizado (o mesmo usado por ``pd.util.hash_pandas_object``)."""
+    return pd.util.hash_array(np.asarray(valores, dtype=object))
+
+
+def posicoes_e_ranks(hashes, precisao):
+    """Registrador de cada hash (bits altos) e posição do primeiro bit 1 no restante."""
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    posicoes = (hashes >> np.uint64(64 - precisao)).astype(np.int64)
+    restante = hashes << np.uint64(precisao)
+    # frexp devolve o expoente e tal que restante = m * 2**e, com 0.5 <= m < 1
+    _, comprimento = np.frexp(restante.astype(np.float64))
+    ranks = np.where(restante == 0, 64 - precisao + 1, 64 - comprimento + 1)
+    return posicoes, ranks.astype(np.uint8)
+
+
+def estimar_cardinalidade(registros):
+    """Estimativa do HyperLogLog com correção para cardinalidades pequenas."""
+    m = registros.shape[-1]
+    alfa = 0.7213 / (1 + 1.079 / m)
+    estimativa = alfa * m * m / np.sum(np.exp2(-registros.astype(np.float64)))
+    zeros = int(np.count_nonzero(registros == 0))
+    if estimativa <= 2.5 * m and zeros:
+        estimativa = m * math.log(m / zeros)
+    return estimativa
+
+
+class SketchesMunicipais:
+    """Um HyperLogLog por município; combinações são respondidas pela união dos sketches."""
+
+    def __init__(self, codigos, registros, precisao):
+        self.codigos = codigos
+        self.registros = registros
+        self.precisao = precisao
+
+    @property
+    def erro_padrao(self):
+        return 1.04 / math.sqrt(1 << self.precisao)
+
+    @classmethod
+    def construir(cls, cod_municipio, hashes, erro_relativo=ERRO_RELATIVO_PADRAO):
+        """Monta os sketches a partir de pares (código do município, hash do valor)."""
+        precisao = precisao_para_erro(erro_relativo)
+        codigos, linhas = np.unique(np.asarray(cod_municipio), return_inverse=True)
+        posicoes, ranks = posicoes_e_ranks(hashes, precisao)
+
+        registros = np.zeros((len(codigos), 1 << precisao), dtype=np.uint8)
+        np.maximum.at(registros, (linhas, posicoes), ranks)
+        return cls(codigos, registros, precisao)
+
+    def estimar(self, codigos_municipio):
+        """Quantidade aproximada de valores distintos na união dos municípios."""
+        linhas = np.flatnonzero(np.isin(self.codigos, np.asarray(codigos_municipio)))
+        if len(linhas) == 0:
+            return 0
+        return int(round(estimar_cardinalidade(self.registros[linhas].max(axis=0))))
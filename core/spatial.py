@@ -0,0 +1,84 @@
+"""Consultas espaciais sobre os centroides dos municípios.
+
+Os centroides (``core.centroids``) são indexados em uma R-tree
+(``shapely.STRtree``). Buscas por retângulo vão direto à árvore; buscas por
+raio usam o retângulo que envolve o círculo para selecionar candidatos e só
+então calculam a distância de haversine exata. Com alguns milhares de
+municípios, os k vizinhos mais próximos saem de um cálculo vetorizado de
+distâncias seguido de ``np.argpartition``. Todas as consultas devolvem
+códigos IBGE.
+"""
+import numpy as np
+import shapely
+
+RAIO_TERRA_KM = 6371.0088
+KM_POR_GRAU = np.pi * RAIO_TERRA_KM / 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distância em km pela fórmula de haversine (vetorizada)."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RAIO_TERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class IndiceEspacial:
+    """R-tree dos centroides municipais com consultas por raio, vizinhança e retângulo."""
+
+    def __init__(self, codigos, lat, lon):
+        self.codigos = np.asarray(codigos)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self._posicao = {int(c): i for i, c in enumerate(self.codigos)}
+        self._arvore = shapely.STRtree(shapely.points(self.lon, self.lat))
+
+    @classmethod
+    def de_centroides(cls, centroides):
+        validos = centroides.dropna(subset=['lat', 'lon'])
+        return cls(validos.index.to_numpy(), validos['lat'].to_numpy(), validos['lon'].to_numpy())
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def __contains__(self, codigo):
+        return int(codigo) in self._posicao
+
+    def posicao(self, codigo):
+        """(lat, lon) do município ``codigo``."""
+        i = self._posicao[int(codigo)]
+        return self.lat[i], self.lon[i]
+
+    def _no_retangulo(self, lat_min, lat_max, lon_min, lon_max):
+        return self._arvore.query(shapely.box(lon_min, lat_min, lon_max, lat_max))
+
+    def retangulo(self, lat_min, lat_max, lon_min, lon_max):
+        """Códigos dos municípios cujo centroide está dentro do retângulo."""
+        return self.codigos[np.sort(self._no_retangulo(lat_min, lat_max, lon_min, lon_max))]
+
+    def raio(self, lat, lon, raio_km):
+        """Códigos e distâncias (km) dos municípios a até ``raio_km`` do ponto, do mais próximo ao mais distante."""
+        delta_lat = raio_km / KM_POR_GRAU
+        delta_lon = raio_km / (KM_POR_GRAU * max(np.cos(np.radians(lat)), 1e-6))
+        candidatos = self._no_retangulo(lat - delta_lat, lat + delta_lat, lon - delta_lon, lon + delta_lon)
+        distancias = haversine_km(lat, lon, self.lat[candidatos], self.lon[candidatos])
+        dentro = distancias <= raio_km
+        candidatos, distancias = candidatos[dentro], distancias[dentro]
+        ordem = np.argsort(distancias, kind='stable')
+        return self.codigos[candidatos[ordem]], distancias[ordem]
+
+    def vizinhos(self, lat, lon, k, candidatos=None):
+        """Os ``k`` municípios mais próximos do ponto (códigos e distâncias em km).
+
+        ``candidatos`` restringe a busca a um subconjunto de códigos (por
+        exemplo, os municípios com taxa anômala).
+        """
+        posicoes = np.arange(len(self.codigos))
+        if candidatos is not None:
+            posicoes = posicoes[np.isin(self.codigos, np.asarray(candidatos))]
+        distancias = haversine_km(lat, lon, self.lat[posicoes], self.lon[posicoes])
+        k = min(k, len(posicoes))
+        if k == 0:
+            return self.codigos[:0], distancias[:0]
+        mais_proximos = np.argpartition(distancias, k - 1)[:k]
+        mais_proximos = mais_proximos[np.argsort(distancias[mais_proximos], kind='stable')]
+        return self.codigos[posicoes[mais_proximos]], distancias[mais_proximos]
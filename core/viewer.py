@@ -0,0 +1,147 @@
+"""Visualizador paginado de DataFrames grandes.
+
+Em vez de enviar o DataFrame inteiro para o navegador, apenas a janela visível
+é recortada e serializada. Ordenação, filtro por coluna e busca textual são
+resolvidos no servidor sobre os dados em cache; as ordenações e máscaras
+calculadas ficam guardadas para que trocar de página não refaça o trabalho.
+"""
+import math
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+TAMANHOS_PAGINA = [50, 100, 500, 1000]
+MAX_MASCARAS = 32
+
+_ordens = {}
+_mascaras = OrderedDict()
+
+
+def _entrada(df):
+    """Cache de ordenações associado ao objeto ``df`` (descartado quando ele é coletado)."""
+    entrada = _ordens.get(id(df))
+    if entrada is None or entrada[0]() is not df:
+        entrada = (weakref.ref(df, lambda _, chave=id(df): _ordens.pop(chave, None)), {})
+        _ordens[id(df)] = entrada
+    return entrada[1]
+
+
+def _eh_texto(serie):
+    return isinstance(serie.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(serie.dtype)
+
+
+def ordem(df, coluna):
+    """Posições de ``df`` ordenadas por ``coluna`` (calculadas uma vez por DataFrame)."""
+    ordens = _entrada(df)
+    if coluna not in ordens:
+        serie = df[coluna]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            # Ordena pelos rótulos, não pela ordem interna das categorias
+            posicao_rotulo = np.argsort(np.argsort(serie.cat.categories.astype(str)))
+            codigos = serie.cat.codes.to_numpy()
+            chave = np.where(codigos >= 0, posicao_rotulo[codigos], len(posicao_rotulo))
+            ordens[coluna] = np.argsort(chave, kind='stable')
+        else:
+            ordenada = serie.reset_index(drop=True).sort_values(kind='stable', na_position='last')
+            ordens[coluna] = ordenada.index.to_numpy()
+    return ordens[coluna]
+
+
+def _contem(serie, termo):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        categorias = serie.cat.categories.astype(str)
+        encontradas = np.flatnonzero(categorias.str.contains(termo, case=False, regex=False))
+        return np.isin(serie.cat.codes.to_numpy(), encontradas)
+    return serie.astype(str).str.contains(termo, case=False, regex=False).fillna(False).to_numpy(bool)
+
+
+def _igual(serie, valor):
+    if _eh_texto(serie):
+        return _contem(serie, valor)
+    try:
+        return (serie == pd.to_numeric(valor)).to_numpy()
+    except (TypeError, ValueError):
+        return np.zeros(len(serie), dtype=bool)
+
+
+def mascara(df, coluna, termo):
+    """Linhas em que ``coluna`` contém ``termo`` (ou, sem coluna, qualquer coluna de texto)."""
+    chave = (id(df), coluna, termo)
+    if chave in _mascaras and _mascaras[chave][0]() is df:
+        _mascaras.move_to_end(chave)
+        return _mascaras[chave][1]
+
+    if coluna is None:
+        resultado = np.zeros(len(df), dtype=bool)
+        for nome in df.columns:
+            if _eh_texto(df[nome]):
+                resultado |= _contem(df[nome], termo)
+    else:
+        resultado = _igual(df[coluna], termo)
+
+    _mascaras[chave] = (weakref.ref(df), resultado)
+    if len(_mascaras) > MAX_MASCARAS:
+        _mascaras.popitem(last=False)
+    return resultado
+
+
+def selecionar_posicoes(df, coluna_ordem=None, crescente=True, busca='', coluna_filtro=None, valor_filtro=''):
+    """Posições (em ordem de exibição) das linhas que passam pela busca e pelo filtro."""
+    if coluna_ordem is not None:
+        posicoes = ordem(df, coluna_ordem)
+        if not crescente:
+            posicoes = posicoes[::-1]
+    else:
+        posicoes = np.arange(len(df))
+
+    selecionadas = None
+    if busca:
+        selecionadas = mascara(df, None, busca)
+    if coluna_filtro is not None and valor_filtro:
+        filtro = mascara(df, coluna_filtro, valor_filtro)
+        selecionadas = filtro if selecionadas is None else selecionadas & filtro
+    if selecionadas is not None:
+        posicoes = posicoes[selecionadas[posicoes]]
+    return posicoes
+
+
+def visualizador_paginado(df, chave, height=600):
+    """Exibe ``df`` paginado; só a página atual é enviada ao navegador.
+
+    ``chave`` identifica os widgets do visualizador na página. O componente é
+    um fragmento: mudar de página ou de ordenação não reexecuta a página toda.
+    """
+    @st.fragment
+    def _visualizar():
+        colunas = list(df.columns)
+        col_busca, col_filtro, col_valor, col_ordem, col_sentido = st.columns([3, 2, 2, 2, 1])
+        busca = col_busca.text_input("🔎 Buscar", key=f"{chave}_busca").strip()
+        coluna_filtro = col_filtro.selectbox("Filtrar coluna", [None] + colunas, key=f"{chave}_coluna_filtro",
+                                             format_func=lambda c: "—" if c is None else c)
+        valor_filtro = col_valor.text_input("Valor", key=f"{chave}_valor_filtro",
+                                            disabled=coluna_filtro is None).strip()
+        coluna_ordem = col_ordem.selectbox("Ordenar por", [None] + colunas, key=f"{chave}_ordem",
+                                           format_func=lambda c: "—" if c is None else c)
+        crescente = col_sentido.toggle("↑", value=True, key=f"{chave}_crescente",
+                                       disabled=coluna_ordem is None)
+
+        posicoes = selecionar_posicoes(df, coluna_ordem, crescente, busca, coluna_filtro, valor_filtro)
+        total = len(posicoes)
+
+        col_tamanho, col_pagina, col_info = st.columns([1, 1, 4])
+        tamanho = col_tamanho.selectbox("Linhas por página", TAMANHOS_PAGINA, index=1, key=f"{chave}_tamanho")
+        paginas = max(1, math.ceil(total / tamanho))
+        if st.session_state.get(f"{chave}_pagina", 1) > paginas:
+            st.session_state[f"{chave}_pagina"] = paginas
+        pagina = col_pagina.number_input("Página", min_value=1, max_value=paginas, value=1, step=1,
+                                         key=f"{chave}_pagina")
+        inicio = (min(pagina, paginas) - 1) * tamanho
+        fim = min(inicio + tamanho, total)
+        col_info.caption(f"Linhas {inicio + 1 if total else 0:,}–{fim:,} de {total:,} ({len(df):,} no total)")
+
+        st.dataframe(df.iloc[posicoes[inicio:fim]], use_container_width=True, height=height)
+
+    _visualizar()
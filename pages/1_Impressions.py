@@ -1,11 +1,29 @@
 import pandas as pd
 import streamlit as st
 
+from core.backends import BACKEND_PADRAO
+from core.data import (
+    ESTADOS_NORDESTE,
+    LINHAS_PREVIA,
+    atendimentos_em_memoria,
+    carregar_atendimentos,
+    carregar_correspondencias,
+    carregar_ibge,
+    carregar_perfil_atendimentos,
+    carregar_perfil_ibge,
+    carregar_previa_atendimentos,
+)
+from core.instrumentation import iniciar_pagina, medir, painel_desempenho
+from core.municipalities import CORRESPONDENCIA_APROXIMADA, CORRESPONDENCIA_EXATA, SEM_CORRESPONDENCIA
+from core.profiling import tabela_perfil
+from core.viewer import visualizador_paginado
+
 st.set_page_config(
     page_title="Impressões - Análise SUS",
     page_icon="📊",
     layout="wide"
 )
+iniciar_pagina('impressions')
 
 # Carregar CSS
 def load_css():
@@ -21,13 +39,26 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Verificar se os dados estão carregados
-if "df_original" not in st.session_state or "df_ibge" not in st.session_state:
-    st.error("⚠️ Dados não encontrados. Volte à página principal para carregar os dados.")
+# Carregar dados compartilhados (atendimentos inteiros só no backend pandas)
+em_memoria = atendimentos_em_memoria()
+try:
+    with medir('dados.atendimentos') as etapa:
+        df_original = etapa.saida(carregar_atendimentos() if em_memoria else carregar_previa_atendimentos())
+    with medir('dados.ibge') as etapa:
+        df_ibge = etapa.saida(carregar_ibge())
+    with medir('perfil.atendimentos'):
+        perfil_sus = carregar_perfil_atendimentos()
+    with medir('perfil.ibge'):
+        perfil_ibge = carregar_perfil_ibge()
+except Exception as e:
+    st.error(f"⚠️ Dados não encontrados: {e}")
     st.stop()
 
-df_original = st.session_state.df_original
-df_ibge = st.session_state.df_ibge
+# Estatísticas pré-calculadas na ingestão (uma passada por coluna)
+colunas_sus = perfil_sus['colunas']
+colunas_ibge = perfil_ibge['colunas']
+nome_col_municipios = list(colunas_ibge)[0]
+nome_col_codigo = list(colunas_ibge)[1]
 
 # Estatísticas completas dos datasets
 col1, col2 = st.columns(2)
@@ -36,13 +67,13 @@ with col1:
     st.markdown(f"""
     <div class="custom-table">
         <h3>📊 Estatísticas do Dataset SUS</h3>
-        <p><strong>Forma do dataset:</strong> {df_original.shape[0]} linhas × {df_original.shape[1]} colunas</p>
-        <p><strong>Valores nulos:</strong> {df_original.isnull().sum().sum()} no total</p>
+        <p><strong>Forma do dataset:</strong> {perfil_sus['linhas']} linhas × {len(colunas_sus)} colunas</p>
+        <p><strong>Valores nulos:</strong> {perfil_sus['nulos_total']} no total</p>
         <p><strong>Tipos de dados:</strong></p>
         <ul>
-            <li>ID: {df_original['ID'].dtype} (Valores únicos: {df_original['ID'].nunique()})</li>
-            <li>MUNICÍPIO: {df_original['MUNICÍPIO'].dtype} (Valores únicos: {df_original['MUNICÍPIO'].nunique()})</li>
-            <li>PRIMEIRO_NOME: {df_original['PRIMEIRO_NOME'].dtype} (Valores únicos: {df_original['PRIMEIRO_NOME'].nunique()})</li>
+            <li>ID: {colunas_sus['ID']['dtype']} (Valores únicos: {colunas_sus['ID']['distintos']})</li>
+            <li>MUNICÍPIO: {colunas_sus['MUNICÍPIO']['dtype']} (Valores únicos: {colunas_sus['MUNICÍPIO']['distintos']})</li>
+            <li>PRIMEIRO_NOME: {colunas_sus['PRIMEIRO_NOME']['dtype']} (Valores únicos: {colunas_sus['PRIMEIRO_NOME']['distintos']})</li>
         </ul>
     </div>
     """, unsafe_allow_html=True)
@@ -51,14 +82,14 @@ with col2:
     st.markdown(f"""
     <div class="custom-table">
         <h3>🏙️ Estatísticas do Dataset IBGE</h3>
-        <p><strong>Forma do dataset:</strong> {df_ibge.shape[0]} linhas × {df_ibge.shape[1]} colunas</p>
-        <p><strong>Valores nulos:</strong> {df_ibge.isnull().sum().sum()} no total</p>
+        <p><strong>Forma do dataset:</strong> {perfil_ibge['linhas']} linhas × {len(colunas_ibge)} colunas</p>
+        <p><strong>Valores nulos:</strong> {perfil_ibge['nulos_total']} no total</p>
         <p><strong>Tipos de dados:</strong></p>
         <ul>
-            <li>Municípios: {df_ibge.iloc[:, 0].dtype} (Valores únicos: {df_ibge.iloc[:, 0].nunique()})</li>
-            <li>Código municipal: {df_ibge.iloc[:, 1].dtype}</li>
-            <li>UF: {df_ibge['UF'].dtype} (Valores únicos: {df_ibge['UF'].nunique()})</li>
-            <li>pessoas: {df_ibge['pessoas'].dtype if 'pessoas' in df_ibge.columns else 'N/A'}</li>
+            <li>Municípios: {colunas_ibge[nome_col_municipios]['dtype']} (Valores únicos: {colunas_ibge[nome_col_municipios]['distintos']})</li>
+            <li>Código municipal: {colunas_ibge[nome_col_codigo]['dtype']}</li>
+            <li>UF: {colunas_ibge['UF']['dtype']} (Valores únicos: {colunas_ibge['UF']['distintos']})</li>
+            <li>pessoas: {colunas_ibge['pessoas']['dtype'] if 'pessoas' in colunas_ibge else 'N/A'}</li>
         </ul>
     </div>
     """, unsafe_allow_html=True)
@@ -69,12 +100,20 @@ with st.expander("🔍 Visualização Completa dos Dados", expanded=True):
     
     with tab1:
         st.markdown("### Dataset Completo - Atendimentos SUS")
-        st.dataframe(df_original, use_container_width=True, height=600)
+        if not em_memoria:
+            st.info(
+                f"Com o backend `{BACKEND_PADRAO}` os atendimentos não são carregados inteiros na memória: "
+                f"exibindo as primeiras {LINHAS_PREVIA:,} linhas. Defina `SUS_BACKEND=pandas` para "
+                "navegar, ordenar e buscar no arquivo completo."
+            )
+        with medir('render.visualizador_sus', df_original):
+            visualizador_paginado(df_original, chave="sus")
         
     
     with tab2:
         st.markdown("### Dataset Completo - IBGE")
-        st.dataframe(df_ibge, use_container_width=True, height=600)
+        with medir('render.visualizador_ibge', df_ibge):
+            visualizador_paginado(df_ibge, chave="ibge")
 
 # Informações detalhadas dos datasets
 st.markdown('<div class="metric-container">', unsafe_allow_html=True)
@@ -85,7 +124,7 @@ with col1:
     st.markdown(f"""
     <div class="metric-card">
         <div class="metric-title">🏥 Atendimentos SUS</div>
-        <div class="metric-value">{df_original.shape[0]:,}</div>
+        <div class="metric-value">{perfil_sus['linhas']:,}</div>
         <div class="metric-desc">Registros totais</div>
     </div>
     """, unsafe_allow_html=True)
@@ -94,7 +133,7 @@ with col2:
     st.markdown(f"""
     <div class="metric-card">
         <div class="metric-title">🏙️ Municípios IBGE</div>
-        <div class="metric-value">{df_ibge.shape[0]:,}</div>
+        <div class="metric-value">{perfil_ibge['linhas']:,}</div>
         <div class="metric-desc">Registros totais</div>
     </div>
     """, unsafe_allow_html=True)
@@ -103,14 +142,13 @@ with col3:
     st.markdown(f"""
     <div class="metric-card">
         <div class="metric-title">👤 Nomes Únicos</div>
-        <div class="metric-value">{df_original['PRIMEIRO_NOME'].nunique():,}</div>
+        <div class="metric-value">{colunas_sus['PRIMEIRO_NOME']['distintos']:,}</div>
         <div class="metric-desc">Primeiros nomes</div>
     </div>
     """, unsafe_allow_html=True)
 
 with col4:
-    estados_ne = ["MA", "PI", "CE", "RN", "PB", "PE", "AL", "SE", "BA"]
-    ufs_ne = df_ibge[df_ibge['UF'].isin(estados_ne)]['UF'].nunique()
+    ufs_ne = df_ibge[df_ibge['UF'].isin(ESTADOS_NORDESTE)]['UF'].nunique()
     st.markdown(f"""
     <div class="metric-card">
         <div class="metric-title">📍 UFs Nordeste</div>
@@ -135,9 +173,9 @@ with col1:
         <tr><td>PRIMEIRO_NOME</td><td>Texto</td><td>Primeiro nome do paciente atendido</td></tr>
     </table>
     <div style="margin-top: 1.5rem;">
-        <span class="badge">Registros: {df_original.shape[0]:,}</span>
-        <span class="badge">Colunas: {df_original.shape[1]}</span>
-        <span class="badge">Municípios únicos: {df_original['MUNICÍPIO'].nunique()}</span>
+        <span class="badge">Registros: {perfil_sus['linhas']:,}</span>
+        <span class="badge">Colunas: {len(colunas_sus)}</span>
+        <span class="badge">Municípios únicos: {colunas_sus['MUNICÍPIO']['distintos']}</span>
     </div>
     </div>
     """, unsafe_allow_html=True)
@@ -154,13 +192,78 @@ with col2:
         <tr><td>pessoas</td><td>Numérico</td><td>População residente (Censo 2022)</td></tr>
     </table>
     <div style="margin-top: 1.5rem;">
-        <span class="badge">Registros: {df_ibge.shape[0]:,}</span>
-        <span class="badge">Colunas: {df_ibge.shape[1]}</span>
-        <span class="badge">UFs únicas: {df_ibge['UF'].nunique()}</span>
+        <span class="badge">Registros: {perfil_ibge['linhas']:,}</span>
+        <span class="badge">Colunas: {len(colunas_ibge)}</span>
+        <span class="badge">UFs únicas: {colunas_ibge['UF']['distintos']}</span>
     </div>
     </div>
     """, unsafe_allow_html=True)
 
+# Perfil das colunas (nulos, distintos, extremos e valores mais frequentes)
+with st.expander("📐 Perfil das Colunas"):
+    tab1, tab2 = st.tabs(["📋 Dados SUS", "🏙️ Dados IBGE"])
+
+    with tab1:
+        with medir('render.perfil_sus'):
+            st.dataframe(tabela_perfil(perfil_sus), use_container_width=True, hide_index=True)
+
+    with tab2:
+        with medir('render.perfil_ibge'):
+            st.dataframe(tabela_perfil(perfil_ibge), use_container_width=True, hide_index=True)
+
+# Qualidade da junção SUS × IBGE (um registro por nome de município distinto)
+st.markdown("### 🔗 Correspondência de Municípios (SUS × IBGE)")
+with medir('municipios.correspondencias') as etapa:
+    correspondencias = etapa.saida(carregar_correspondencias())
+
+por_tipo = correspondencias.groupby('CORRESPONDENCIA')[['ATENDIMENTOS']].agg(['size', 'sum'])['ATENDIMENTOS']
+por_tipo = por_tipo.reindex([CORRESPONDENCIA_EXATA, CORRESPONDENCIA_APROXIMADA, SEM_CORRESPONDENCIA], fill_value=0)
+total_correspondencia = max(int(por_tipo['sum'].sum()), 1)
+taxa_correspondencia = 1 - por_tipo.at[SEM_CORRESPONDENCIA, 'sum'] / total_correspondencia
+
+col1, col2, col3, col4 = st.columns(4)
+for coluna, titulo, valor, descricao in (
+    (col1, "✅ Taxa de Correspondência", f"{taxa_correspondencia:.1%}", "Atendimentos com município resolvido"),
+    (col2, "🎯 Exatas", f"{por_tipo.at[CORRESPONDENCIA_EXATA, 'sum']:,}",
+     f"{por_tipo.at[CORRESPONDENCIA_EXATA, 'size']:,} nomes distintos"),
+    (col3, "🧩 Aproximadas", f"{por_tipo.at[CORRESPONDENCIA_APROXIMADA, 'sum']:,}",
+     f"{por_tipo.at[CORRESPONDENCIA_APROXIMADA, 'size']:,} nomes recuperados"),
+    (col4, "❓ Sem Correspondência", f"{por_tipo.at[SEM_CORRESPONDENCIA, 'sum']:,}",
+     f"{por_tipo.at[SEM_CORRESPONDENCIA, 'size']:,} nomes fora do Nordeste ou irreconhecíveis"),
+):
+    coluna.markdown(f"""
+    <div class="metric-card">
+        <div class="metric-title">{titulo}</div>
+        <div class="metric-value">{valor}</div>
+        <div class="metric-desc">{descricao}</div>
+    </div>
+    """, unsafe_allow_html=True)
+
+with st.expander("🔎 Nomes de Município Recuperados e Sem Correspondência"):
+    tab1, tab2 = st.tabs(["🧩 Aproximadas", "❓ Sem correspondência"])
+
+    with tab1:
+        with medir('render.correspondencias_aproximadas'):
+            st.dataframe(
+                correspondencias.loc[
+                    correspondencias['CORRESPONDENCIA'] == CORRESPONDENCIA_APROXIMADA,
+                    ['NOME', 'MUNICIPIO_IBGE', 'UF', 'SIMILARIDADE', 'ATENDIMENTOS'],
+                ].sort_values('ATENDIMENTOS', ascending=False),
+                use_container_width=True,
+                hide_index=True,
+                column_config={'SIMILARIDADE': st.column_config.NumberColumn(format="%.2f")},
+            )
+
+    with tab2:
+        with medir('render.correspondencias_ausentes'):
+            st.dataframe(
+                correspondencias.loc[
+                    correspondencias['CORRESPONDENCIA'] == SEM_CORRESPONDENCIA, ['NOME', 'ATENDIMENTOS']
+                ].sort_values('ATENDIMENTOS', ascending=False),
+                use_container_width=True,
+                hide_index=True,
+            )
+
 # Observações detalhadas
 st.markdown(f"""
 <div class="custom-table">
@@ -171,7 +274,7 @@ st.markdown(f"""
     <li><strong>🕒 Temporalidade:</strong> Não há informações sobre datas dos atendimentos</li>
     <li><strong>👥 Identificação:</strong> Dados anonimizados - apenas primeiro nome dos pacientes</li>
     <li><strong>🌍 Abrangência:</strong> Foco na região Nordeste do Brasil</li>
-    <li><strong>📈 Volume:</strong> {df_original.shape[0]:,} registros representam uma amostra significativa</li>
+    <li><strong>📈 Volume:</strong> {perfil_sus['linhas']:,} registros representam uma amostra significativa</li>
 </ul>
 
 <h4>🏛️ Características dos Dados IBGE:</h4>
@@ -184,7 +287,7 @@ st.markdown(f"""
 <h4>⚠️ Considerações para Análise:</h4>
 <ul>
     <li><strong>🔗 Relacionamento:</strong> Os datasets podem ser unidos pela coluna de municípios</li>
-    <li><strong>🧹 Qualidade:</strong> {df_original[df_original.isnull().any(axis=1)].shape[0]} registros com valores nulos no dataset SUS</li>
+    <li><strong>🧹 Qualidade:</strong> {perfil_sus['linhas_com_nulos']} registros com valores nulos no dataset SUS</li>
     <li><strong>🎯 Foco Geográfico:</strong> Análise concentrada nos 9 estados do Nordeste</li>
     <li><strong>📋 Pré-processamento:</strong> Foram removidas colunas não essenciais para análise agregada</li>
 </ul>
@@ -197,4 +300,7 @@ st.markdown(f"""
     <li>Identificar possíveis disparidades regionais</li>
 </ul>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# Tempos das etapas desta execução (opcional)
+painel_desempenho()
@@ -1,6 +1,17 @@
-import pandas as pd
 import streamlit as st
-import plotly.express as px
+
+from core.data import carregar_cubo_atendimentos, carregar_indice_filtros, carregar_sexo_dos_nomes, versao_arquivo
+from core.figures import (
+    cache_figuras,
+    figura_barras_uf,
+    figura_sexo_municipios,
+    figura_sexo_uf,
+    figura_sunburst,
+    painel_cache_figuras,
+)
+from core.gender import CAMINHO_GENEROS, NAO_CLASSIFICADO
+from core.instrumentation import iniciar_pagina, medir, painel_desempenho
+from core.query import Consulta, FonteCubo
 
 # Configuração da página
 st.set_page_config(
@@ -8,6 +19,7 @@ st.set_page_config(
     page_icon="📈",
     layout="wide"
 )
+iniciar_pagina('analysis')
 
 # Carregar CSS
 def load_css():
@@ -18,32 +30,20 @@ load_css()
 
 st.title('📊 Análises Interativas')
 
-# --- Preparação dos dados ---
-df_filtered = st.session_state.df_original[['MUNICÍPIO', 'PRIMEIRO_NOME']].copy()
-df_filtered.dropna(subset=['PRIMEIRO_NOME'], inplace=True)
-df_filtered['MUNICÍPIO'] = df_filtered['MUNICÍPIO'].apply(lambda x: x.strip())
-df_filtered['PRIMEIRO_NOME'] = df_filtered['PRIMEIRO_NOME'].apply(
-    lambda x: ' '.join([w for w in x.strip().split() if len(w) >= 3])
-)
-
-# Cria df_nordeste se ainda não existir
-if "df_nordeste" not in st.session_state:
-    st.session_state.df_nordeste = st.session_state.df_ibge.query(
-        'UF in ["MA", "PI", "CE", "RN", "PB", "PE", "AL", "SE", "BA"]'
-    )
-    st.session_state.df_nordeste['Municípios'] = st.session_state.df_nordeste['Municípios'].apply(lambda x: x.strip().upper())
-    st.session_state.df_nordeste = st.session_state.df_nordeste.rename(columns={'Municípios': 'MUNICÍPIO'})
-
-# Merge entre os dados
-if 'df_merged' not in st.session_state:
-    st.session_state.df_merged = st.session_state.df_nordeste.merge(df_filtered, how='inner', on='MUNICÍPIO')
+# Carregar agregados compartilhados (uma linha por município do Nordeste)
+try:
+    with medir('dados.cubo') as etapa:
+        cubo = etapa.saida(carregar_cubo_atendimentos())
+except Exception as e:
+    st.error(f"⚠️ Dados não encontrados: {e}")
+    st.stop()
 
-df_merged = st.session_state.df_merged
+df_total = cubo.municipios
+# Bitmaps por UF e índice UF → municípios dos filtros (ver core.filters)
+indice_filtros = carregar_indice_filtros(cubo)
 
-df_pessoas_municipio = df_merged.groupby('MUNICÍPIO')['pessoas'].sum().reset_index()
-df_pessoas_atendimentos = df_merged.groupby('MUNICÍPIO')['PRIMEIRO_NOME'].count().reset_index().rename(columns={'PRIMEIRO_NOME': 'VOLUME_ATENDIMENTOS'})
-df_total = df_pessoas_municipio.merge(df_pessoas_atendimentos, how='inner', on='MUNICÍPIO')
-df_total['DISCREPANCIA'] = df_total['pessoas'] < df_total['VOLUME_ATENDIMENTOS']
+# Gráficos memorizados pelo estado dos filtros (ver core.figures)
+figuras = cache_figuras()
 
 # Total de municípios com atendimentos maior que o volume de pessoas
 # --- 🎛️ Filtros interativos ---
@@ -51,72 +51,146 @@ with st.sidebar.form("filtro_form"):
     st.markdown("### 🔍 Filtros")
 
     # Filtro por UF
-    ufs = sorted(df_merged['UF'].unique())
+    ufs = indice_filtros.ufs
     uf_selecionadas = st.multiselect("Selecione as UFs:", options=ufs, default=ufs)
 
-    # Filtro por Município (dependente das UFs)
-    municipios = sorted(df_merged.query("UF in @uf_selecionadas")['MUNICÍPIO'].unique())
-    municipios_selecionados = st.multiselect("Selecione os Municípios:", options=municipios, default=municipios)
+    # Filtro por Município (dependente das UFs), identificado pelo código IBGE
+    municipios = indice_filtros.municipios_das_ufs(uf_selecionadas)
+    municipios_selecionados = st.multiselect(
+        "Selecione os Municípios:",
+        options=municipios,
+        default=municipios,
+        format_func=indice_filtros.rotulos.get
+    )
 
     # Botão para aplicar
-    aplicar = st.form_submit_button("Aplicar Filtros")
+    st.form_submit_button("Aplicar Filtros")
+
+contagem_exata = st.sidebar.toggle(
+    "Contagem exata de nomes únicos",
+    value=False,
+    help="Desligado, a métrica é estimada pelos sketches pré-calculados de cada município."
+)
 
 # --- Aplicação dos filtros ---
-if aplicar or (len(uf_selecionadas) < len(ufs)) or (len(municipios_selecionados) < len(municipios)):
-    df_filtrado = df_merged.query("UF in @uf_selecionadas and MUNICÍPIO in @municipios_selecionados")
-else:
-    df_filtrado = df_merged.copy()
+# Recorte declarado uma vez; filtros e projeção são executados sobre o cubo (ver core.query)
+recorte = Consulta(FonteCubo(cubo, indice_filtros)).filtrar_ufs(uf_selecionadas).filtrar_municipios(municipios_selecionados)
+with medir('filtros', df_total) as etapa:
+    df_filtrado = etapa.saida(recorte.executar())
 
 # --- 📈 Cálculos e gráficos ---
-atendimentos_por_municipio = df_filtrado.groupby(
-    ['UF', 'MUNICÍPIO'], as_index=False
-).agg({'PRIMEIRO_NOME': 'count'}).rename(columns={'PRIMEIRO_NOME': 'VOLUME_ATENDIMENTOS'})
+with medir('projecao', df_filtrado) as etapa:
+    atendimentos_por_municipio = etapa.saida(recorte.selecionar('UF', 'MUNICÍPIO', 'VOLUME_ATENDIMENTOS').executar())
+
+estado_filtros = {
+    'dados': cubo.versao,
+    'ufs': sorted(uf_selecionadas),
+    'municipios': sorted(municipios_selecionados),
+}
 
 # Gráfico 1 - Barras por UF
-fig_bar = px.bar(
-    atendimentos_por_municipio.groupby('UF', as_index=False)['VOLUME_ATENDIMENTOS'].sum(),
-    x='UF',
-    y='VOLUME_ATENDIMENTOS',
-    color='UF',
-    text='VOLUME_ATENDIMENTOS',
-    title='📈 Volume de Atendimentos por UF (Região)'
-)
-fig_bar.update_traces(textposition='outside')
+fig_bar = figuras.obter('analise.barras_uf', estado_filtros, lambda: figura_barras_uf(atendimentos_por_municipio))
 
 # Gráfico 2 - Sunburst
-fig_sunburst = px.sunburst(
-    atendimentos_por_municipio,
-    path=['UF', 'MUNICÍPIO'],
-    values='VOLUME_ATENDIMENTOS',
-    color='UF',
-    color_discrete_sequence=px.colors.qualitative.Pastel,
-    title='🗺️ Volume de Atendimentos por UF e Município'
-)
+fig_sunburst = figuras.obter('analise.sunburst', estado_filtros, lambda: figura_sunburst(atendimentos_por_municipio))
 
 # Exibição lado a lado
 col1, col2 = st.columns(2)
-col1.plotly_chart(fig_bar, use_container_width=True)
-col2.plotly_chart(fig_sunburst, use_container_width=True)
+with medir('render.graficos'):
+    col1.plotly_chart(fig_bar, use_container_width=True)
+    col2.plotly_chart(fig_sunburst, use_container_width=True)
 
 # Estatísticas adicionais
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    total_atendimentos = df_filtrado.shape[0]
+    total_atendimentos = int(df_filtrado['VOLUME_ATENDIMENTOS'].sum())
     st.metric("Total de Atendimentos", f"{total_atendimentos:,}")
 
 with col2:
-    municipios_unicos = df_filtrado['MUNICÍPIO'].nunique()
+    municipios_unicos = df_filtrado.shape[0]
     st.metric("Municípios com Atendimento", municipios_unicos)
 
 with col3:
-    nomes_unicos = df_filtrado['PRIMEIRO_NOME'].nunique()
-    st.metric("Nomes Únicos", f"{nomes_unicos:,}")
+    with medir('nomes_unicos', df_filtrado):
+        nomes_unicos = cubo.nomes_unicos(df_filtrado.index, exato=contagem_exata)
+    st.metric(
+        "Nomes Únicos",
+        f"{nomes_unicos:,}",
+        help=None if contagem_exata else f"Estimativa HyperLogLog (erro padrão de ±{cubo.sketches.erro_padrao:.1%})"
+    )
 
 with col4:
     st.metric("Total de Discrepancias", df_total['DISCREPANCIA'].sum(), help="Total de municípios com atendimentos maior que o volume de pessoas")
 
 
+# --- 🚻 Sexo estimado pelo primeiro nome ---
+st.subheader("🚻 Atendimentos por Sexo Estimado")
+with medir('generos.sexo_dos_nomes'):
+    sexo_dos_nomes = carregar_sexo_dos_nomes(cubo)
+
+if sexo_dos_nomes is None:
+    st.info(
+        "O cache de gêneros ainda não foi gerado. Rode `python -m core.batch --generos` "
+        "para classificar os primeiros nomes (consulta a API de Nomes do IBGE)."
+    )
+else:
+    # Atendimentos por município × sexo, a partir dos pares município × nome do cubo
+    with medir('generos.por_municipio', df_filtrado) as etapa:
+        sexo_por_municipio = etapa.saida(cubo.volume_por_grupo_de_nome(sexo_dos_nomes, df_filtrado.index))
+        sexo_por_municipio = sexo_por_municipio.reindex(df_filtrado.index, fill_value=0)
+
+    estado_generos = {**estado_filtros, 'generos': versao_arquivo(CAMINHO_GENEROS)}
+
+    def dados_sexo_uf():
+        por_uf = sexo_por_municipio.groupby(df_filtrado['UF'], observed=True).sum()
+        return por_uf.reset_index().melt(id_vars='UF', var_name='SEXO', value_name='VOLUME_ATENDIMENTOS')
+
+    def dados_sexo_municipios(quantidade=15):
+        maiores = df_filtrado['VOLUME_ATENDIMENTOS'].nlargest(quantidade).index
+        dados = sexo_por_municipio.loc[maiores]
+        dados.index = df_filtrado.loc[maiores, 'MUNICÍPIO'] + ' (' + df_filtrado.loc[maiores, 'UF'].astype(str) + ')'
+        return dados.rename_axis('MUNICÍPIO').reset_index().melt(
+            id_vars='MUNICÍPIO', var_name='SEXO', value_name='VOLUME_ATENDIMENTOS'
+        )
+
+    fig_sexo_uf = figuras.obter('analise.sexo_uf', estado_generos, lambda: figura_sexo_uf(dados_sexo_uf()))
+    fig_sexo_municipios = figuras.obter(
+        'analise.sexo_municipios', estado_generos, lambda: figura_sexo_municipios(dados_sexo_municipios())
+    )
+
+    col1, col2 = st.columns(2)
+    with medir('render.generos'):
+        col1.plotly_chart(fig_sexo_uf, use_container_width=True)
+        col2.plotly_chart(fig_sexo_municipios, use_container_width=True)
+
+    nao_classificados = sexo_por_municipio[NAO_CLASSIFICADO].sum()
+    if nao_classificados:
+        st.caption(
+            f"{nao_classificados:,} atendimentos têm primeiro nome ainda fora do cache de gêneros "
+            "(rode `python -m core.batch --generos` para completá-lo)."
+        )
+
+    with st.expander("📋 Sexo Estimado por Município"):
+        with medir('render.tabela_generos', sexo_por_municipio):
+            percentuais = sexo_por_municipio.div(sexo_por_municipio.sum(axis=1).replace(0, 1), axis=0) * 100
+            tabela_sexo = df_filtrado[['UF', 'MUNICÍPIO', 'VOLUME_ATENDIMENTOS']].join(
+                percentuais.rename(columns=lambda sexo: f'% {sexo}')
+            )
+            st.dataframe(
+                tabela_sexo.sort_values('VOLUME_ATENDIMENTOS', ascending=False),
+                column_config={
+                    f'% {sexo}': st.column_config.NumberColumn(format="%.1f%%") for sexo in sexo_por_municipio.columns
+                },
+            )
+
+
 # Tabela detalhada
 with st.expander("📋 Ver Dados Detalhados"):
-    st.dataframe(atendimentos_por_municipio.sort_values('VOLUME_ATENDIMENTOS', ascending=False))
\ No newline at end of file
+    with medir('render.tabela', atendimentos_por_municipio):
+        st.dataframe(atendimentos_por_municipio.sort_values('VOLUME_ATENDIMENTOS', ascending=False))
+
+# Desempenho do cache de gráficos e tempos das etapas desta execução
+with st.sidebar:
+    painel_cache_figuras(figuras)
+painel_desempenho()
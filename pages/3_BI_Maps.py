@@ -1,15 +1,39 @@
-import pandas as pd
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import numpy as np
+import time
+
+from core.aggregates import resumo_por_uf
+from core.centroids import CAMINHO_CENTROIDES
+from core.data import (
+    carregar_centroides,
+    carregar_cubo_atendimentos,
+    carregar_geojson_municipios,
+    carregar_indice_espacial,
+    carregar_indice_populacional,
+    carregar_ranking_municipios,
+    versao_arquivo,
+)
+from core.figures import (
+    cache_figuras,
+    dados_mapa_uf,
+    figura_coropletico,
+    figura_distribuicao_taxa,
+    figura_mapa_municipios,
+    figura_mapa_uf,
+    figura_taxa_uf,
+    figura_top_municipios,
+    figura_volume_uf,
+    painel_cache_figuras,
+)
+from core.geometry import NIVEIS_DETALHE, NIVEL_PADRAO, localizar_malha
+from core.instrumentation import iniciar_pagina, medir, painel_desempenho
 
 st.set_page_config(
     page_title="BI e Mapas - Análise SUS",
     page_icon="🗺️",
     layout="wide"
 )
+iniciar_pagina('bi_maps')
 
 # Carregar CSS
 def load_css():
@@ -25,31 +49,29 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Verificar se os dados estão carregados
-if "df_original" not in st.session_state or "df_ibge" not in st.session_state:
-    st.error("⚠️ Dados não encontrados. Volte à página principal para carregar os dados.")
+# Carregar o agregado por município (mesmo cubo da página de análises)
+try:
+    with medir('dados.cubo') as etapa:
+        cubo = etapa.saida(carregar_cubo_atendimentos())
+except Exception as e:
+    st.error(f"⚠️ Dados não encontrados: {e}")
     st.stop()
 
-# Preparar dados
-df_original = st.session_state.df_original.copy()
-df_original.dropna(subset=['PRIMEIRO_NOME'], inplace=True)
-df_ibge = st.session_state.df_ibge.copy()
-
-# Limpar e padronizar dados
-df_original['MUNICÍPIO'] = df_original['MUNICÍPIO'].str.strip().str.upper()
-df_ibge['Municípios'] = df_ibge['Municípios'].str.strip().str.upper()
-
-# Filtrar apenas Nordeste
-estados_ne = ["MA", "PI", "CE", "RN", "PB", "PE", "AL", "SE", "BA"]
-df_ibge_ne = df_ibge[df_ibge['UF'].isin(estados_ne)].copy()
-df_ibge_ne = df_ibge_ne.rename(columns={'Municípios': 'MUNICÍPIO'})
-
-# Fazer merge dos dados
-df_merged = df_ibge_ne.merge(
-    df_original.groupby('MUNICÍPIO').size().reset_index(name='TOTAL_ATENDIMENTOS'),
-    on='MUNICÍPIO',
-    how='inner'
-)
+# Municípios do Nordeste já unidos ao Censo pelo código IBGE
+df_merged = cubo.municipios.rename(columns={'VOLUME_ATENDIMENTOS': 'TOTAL_ATENDIMENTOS'}).reset_index()
+
+# Municípios ordenados por população dentro de cada UF, com somas prefixadas
+indice_populacional = carregar_indice_populacional(cubo)
+
+# Ordenações por volume e por taxa pré-calculadas para os rankings
+ranking = carregar_ranking_municipios(cubo)
+
+# Coordenadas gravadas na ingestão (nenhuma consulta de rede aqui)
+centroides = carregar_centroides()
+indice_espacial = carregar_indice_espacial()
+
+# Gráficos memorizados pelo estado dos filtros (ver core.figures)
+figuras = cache_figuras()
 
 # Sidebar com filtros
 with st.sidebar:
@@ -79,20 +101,95 @@ with st.sidebar:
             step=1000
         )
     
-    # Aplicar filtros
-    df_filtrado = df_merged[df_merged['UF'].isin(ufs_selecionadas)]
-    if 'pessoas' in df_filtrado.columns:
-        df_filtrado = df_filtrado[
-            (df_filtrado['pessoas'] >= pop_range[0]) & 
-            (df_filtrado['pessoas'] <= pop_range[1])
-        ]
+    # Aplicar filtros: duas buscas binárias por UF no índice populacional
+    faixa_pop = pop_range if 'pessoas' in df_merged.columns else (-np.inf, np.inf)
+    with medir('filtros.uf_populacao', df_merged) as etapa:
+        df_filtrado = etapa.saida(df_merged.iloc[indice_populacional.posicoes(ufs_selecionadas, *faixa_pop)])
+
+    # Tudo o que determina o recorte; é a chave dos gráficos em cache
+    estado_filtros = {
+        'dados': cubo.versao,
+        'ufs': sorted(ufs_selecionadas),
+        'pop_range': pop_range if 'pessoas' in df_merged.columns else None,
+        'espacial': None,
+    }
+
+    # Filtro espacial sobre os centroides municipais
+    st.markdown("**📍 Filtro Espacial**")
+    if indice_espacial is None:
+        st.caption(
+            "Disponível depois que os centroides municipais forem calculados "
+            "(malha em `data/malhas` ou `python -m core.batch --geocodificar`)."
+        )
+    else:
+        modo_espacial = st.selectbox(
+            "Consulta:",
+            options=['Nenhuma', 'Raio', 'Mais próximos', 'Retângulo']
+        )
+        codigos_espaciais = None
+
+        if modo_espacial in ('Raio', 'Mais próximos'):
+            municipios_ref = df_merged.set_index('Código municipal')
+            referencias = [c for c in municipios_ref.sort_values('MUNICÍPIO').index if c in indice_espacial]
+            referencia = st.selectbox(
+                "Município de referência:",
+                options=referencias,
+                format_func=lambda c: f"{municipios_ref.at[c, 'MUNICÍPIO']} ({municipios_ref.at[c, 'UF']})"
+            )
+            lat_ref, lon_ref = indice_espacial.posicao(referencia)
+
+            if modo_espacial == 'Raio':
+                raio_km = st.slider("Raio (km):", min_value=10, max_value=500, value=100, step=10)
+                inicio_consulta = time.perf_counter()
+                codigos_espaciais, _ = indice_espacial.raio(lat_ref, lon_ref, raio_km)
+                estado_filtros['espacial'] = ('raio', referencia, raio_km)
+            else:
+                k_vizinhos = st.number_input("Quantidade de municípios:", min_value=1, max_value=100, value=10)
+                somente_anomalos = st.checkbox(
+                    "Somente taxas anômalas",
+                    help="Taxa por 100k hab. acima de Q3 + 1,5·IQR entre os municípios filtrados"
+                )
+                candidatos = df_filtrado
+                if somente_anomalos:
+                    q1, q3 = df_filtrado['TAXA_100K'].quantile([0.25, 0.75])
+                    candidatos = df_filtrado[df_filtrado['TAXA_100K'] > q3 + 1.5 * (q3 - q1)]
+                inicio_consulta = time.perf_counter()
+                codigos_espaciais, _ = indice_espacial.vizinhos(
+                    lat_ref, lon_ref, int(k_vizinhos), candidatos['Código municipal']
+                )
+                estado_filtros['espacial'] = ('vizinhos', referencia, int(k_vizinhos), somente_anomalos)
+
+        elif modo_espacial == 'Retângulo':
+            lat_min, lat_max = float(np.floor(indice_espacial.lat.min())), float(np.ceil(indice_espacial.lat.max()))
+            lon_min, lon_max = float(np.floor(indice_espacial.lon.min())), float(np.ceil(indice_espacial.lon.max()))
+            faixa_lat = st.slider("Latitude:", min_value=lat_min, max_value=lat_max, value=(lat_min, lat_max), step=0.1)
+            faixa_lon = st.slider("Longitude:", min_value=lon_min, max_value=lon_max, value=(lon_min, lon_max), step=0.1)
+            inicio_consulta = time.perf_counter()
+            codigos_espaciais = indice_espacial.retangulo(*faixa_lat, *faixa_lon)
+            estado_filtros['espacial'] = ('retangulo', faixa_lat, faixa_lon)
+
+        if codigos_espaciais is not None:
+            df_filtrado = df_filtrado[df_filtrado['Código municipal'].isin(codigos_espaciais)]
+            st.caption(
+                f"{len(df_filtrado)} municípios na consulta "
+                f"({(time.perf_counter() - inicio_consulta) * 1000:.1f} ms)"
+            )
+
+# Totais por UF do recorte (volume, população, municípios e taxas). Sem consulta
+# espacial saem das somas prefixadas; com ela, de um agrupamento do recorte.
+with medir('resumo_uf', df_filtrado) as etapa:
+    if estado_filtros['espacial'] is None:
+        resumo_uf = indice_populacional.resumo(ufs_selecionadas, *faixa_pop)
+    else:
+        resumo_uf = resumo_por_uf(df_filtrado.rename(columns={'TOTAL_ATENDIMENTOS': 'VOLUME_ATENDIMENTOS'}))
+    resumo_uf = etapa.saida(resumo_uf.rename(columns={'VOLUME_ATENDIMENTOS': 'TOTAL_ATENDIMENTOS'}))
 
 # Métricas principais
 st.markdown('<div class="metric-container">', unsafe_allow_html=True)
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    total_atendimentos = df_filtrado['TOTAL_ATENDIMENTOS'].sum()
+    total_atendimentos = resumo_uf['TOTAL_ATENDIMENTOS'].sum()
     st.markdown(f"""
     <div class="metric-card">
         <div class="metric-title">🏥 Total de Atendimentos</div>
@@ -102,7 +199,7 @@ with col1:
     """, unsafe_allow_html=True)
 
 with col2:
-    municipios_ativos = df_filtrado.shape[0]
+    municipios_ativos = resumo_uf['QTD_MUNICIPIOS'].sum()
     st.markdown(f"""
     <div class="metric-card">
         <div class="metric-title">🏙️ Municípios Ativos</div>
@@ -113,7 +210,7 @@ with col2:
 
 with col3:
     if 'pessoas' in df_filtrado.columns:
-        populacao_total = df_filtrado['pessoas'].sum()
+        populacao_total = resumo_uf['pessoas'].sum()
         st.markdown(f"""
         <div class="metric-card">
             <div class="metric-title">👥 População Total</div>
@@ -146,49 +243,20 @@ col1, col2 = st.columns(2)
 
 with col1:
     # Volume por UF
-    volume_uf = df_filtrado.groupby('UF').agg({
-        'TOTAL_ATENDIMENTOS': 'sum',
-        'pessoas': 'sum'
-    }).reset_index()
-    
-    fig_uf = px.bar(
-        volume_uf,
-        x='UF',
-        y='TOTAL_ATENDIMENTOS',
-        title='📈 Volume de Atendimentos por Estado',
-        color='UF',
-        text='TOTAL_ATENDIMENTOS',
-        color_discrete_sequence=px.colors.qualitative.Bold
-    )
-    fig_uf.update_traces(texttemplate='%{text:,}', textposition='outside')
-    fig_uf.update_layout(
-        xaxis_title='Estado',
-        yaxis_title='Total de Atendimentos',
-        showlegend=False
-    )
-    st.plotly_chart(fig_uf, use_container_width=True)
+    fig_uf = figuras.obter('bi.volume_uf', estado_filtros, lambda: figura_volume_uf(resumo_uf))
+    with medir('render.uf'):
+        st.plotly_chart(fig_uf, use_container_width=True)
 
 with col2:
     # Top 15 municípios por volume
-    top_municipios = df_filtrado.nlargest(15, 'TOTAL_ATENDIMENTOS')
-    
-    fig_municipios = px.bar(
-        top_municipios,
-        x='TOTAL_ATENDIMENTOS',
-        y='MUNICÍPIO',
-        orientation='h',
-        title='🏆 Top 15 Municípios - Volume de Atendimentos',
-        color='TOTAL_ATENDIMENTOS',
-        color_continuous_scale='Viridis',
-        text='TOTAL_ATENDIMENTOS'
-    )
-    fig_municipios.update_traces(texttemplate='%{text:,}', textposition='outside')
-    fig_municipios.update_layout(
-        xaxis_title='Total de Atendimentos',
-        yaxis_title='Município',
-        yaxis={'categoryorder': 'total ascending'}
+    fig_municipios = figuras.obter(
+        'bi.top_municipios', estado_filtros,
+        lambda: figura_top_municipios(
+            df_merged.iloc[ranking.maiores('VOLUME_ATENDIMENTOS', 15, posicoes=df_filtrado.index)]
+        )
     )
-    st.plotly_chart(fig_municipios, use_container_width=True)
+    with medir('render.municipios'):
+        st.plotly_chart(fig_municipios, use_container_width=True)
 
 # 2. PROPORÇÃO POR 100 MIL HABITANTES
 st.markdown("""
@@ -198,46 +266,22 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 if 'pessoas' in df_filtrado.columns:
-    # Calcular taxa por 100k habitantes
-    df_filtrado['TAXA_100K'] = (df_filtrado['TOTAL_ATENDIMENTOS'] / df_filtrado['pessoas']) * 100000
-    df_filtrado['TAXA_100K'] = df_filtrado['TAXA_100K'].round(2)
-    
+    # A taxa por 100k habitantes de cada município já vem calculada no cubo
     col1, col2 = st.columns(2)
     
     with col1:
-        # Taxa por UF
-        taxa_uf = df_filtrado.groupby('UF').agg({
-            'TAXA_100K': 'mean',
-            'pessoas': 'sum',
-            'TOTAL_ATENDIMENTOS': 'sum'
-        }).reset_index()
-        
-        fig_taxa_uf = px.bar(
-            taxa_uf,
-            x='UF',
-            y='TAXA_100K',
-            title='📊 Taxa Média de Atendimentos por 100k hab. - por Estado',
-            color='TAXA_100K',
-            color_continuous_scale='Blues',
-            text='TAXA_100K'
-        )
-        fig_taxa_uf.update_traces(texttemplate='%{text:.1f}', textposition='outside')
-        fig_taxa_uf.update_layout(
-            xaxis_title='Estado',
-            yaxis_title='Atendimentos por 100k habitantes'
-        )
-        st.plotly_chart(fig_taxa_uf, use_container_width=True)
+        # Taxa por UF (média das taxas municipais)
+        fig_taxa_uf = figuras.obter('bi.taxa_uf', estado_filtros, lambda: figura_taxa_uf(resumo_uf))
+        with medir('render.taxa_uf'):
+            st.plotly_chart(fig_taxa_uf, use_container_width=True)
     
     with col2:
         # Distribuição da taxa
-        fig_distribuicao = px.box(
-            df_filtrado,
-            x='TAXA_100K',
-            title='📋 Distribuição da Taxa de Atendimentos por 100k hab.',
-            orientation='h'
+        fig_distribuicao = figuras.obter(
+            'bi.distribuicao_taxa', estado_filtros, lambda: figura_distribuicao_taxa(df_filtrado)
         )
-        fig_distribuicao.update_layout(xaxis_title='Atendimentos por 100k habitantes')
-        st.plotly_chart(fig_distribuicao, use_container_width=True)
+        with medir('render.distribuicao'):
+            st.plotly_chart(fig_distribuicao, use_container_width=True)
 
 # 3. RANKING DE MUNICÍPIOS
 st.markdown("""
@@ -247,11 +291,23 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 if 'pessoas' in df_filtrado.columns:
+    colunas_ranking = ['MUNICÍPIO', 'UF', 'TAXA_100K', 'TOTAL_ATENDIMENTOS', 'pessoas']
+    # A formatação fica com a tabela; os valores continuam numéricos (ordenáveis)
+    formato_ranking = {
+        "MUNICÍPIO": "Município",
+        "UF": "UF",
+        "TAXA_100K": st.column_config.NumberColumn("Taxa/100k", format="%.1f"),
+        "TOTAL_ATENDIMENTOS": st.column_config.NumberColumn("Atendimentos", format="localized"),
+        "pessoas": st.column_config.NumberColumn("População", format="localized")
+    }
     col1, col2 = st.columns(2)
     
     with col1:
         # Top 10 maiores taxas
-        top_maiores = df_filtrado.nlargest(10, 'TAXA_100K')[['MUNICÍPIO', 'UF', 'TAXA_100K', 'TOTAL_ATENDIMENTOS', 'pessoas']]
+        with medir('ranking.maiores_taxas', df_filtrado) as etapa:
+            top_maiores = etapa.saida(
+                df_merged.iloc[ranking.maiores('TAXA_100K', 10, posicoes=df_filtrado.index)][colunas_ranking]
+            )
         
         st.markdown("""
         <div style="background: white; padding: 1.5rem; border-radius: 10px; margin-bottom: 1rem;">
@@ -259,27 +315,15 @@ if 'pessoas' in df_filtrado.columns:
         </div>
         """, unsafe_allow_html=True)
         
-        # Formatar a tabela
-        top_maiores_display = top_maiores.copy()
-        top_maiores_display['TAXA_100K'] = top_maiores_display['TAXA_100K'].apply(lambda x: f"{x:,.1f}")
-        top_maiores_display['pessoas'] = top_maiores_display['pessoas'].apply(lambda x: f"{x:,.0f}")
-        top_maiores_display['TOTAL_ATENDIMENTOS'] = top_maiores_display['TOTAL_ATENDIMENTOS'].apply(lambda x: f"{x:,.0f}")
-        
-        st.dataframe(
-            top_maiores_display,
-            column_config={
-                "MUNICÍPIO": "Município",
-                "UF": "UF",
-                "TAXA_100K": "Taxa/100k",
-                "TOTAL_ATENDIMENTOS": "Atendimentos",
-                "pessoas": "População"
-            },
-            use_container_width=True
-        )
+        with medir('render.top_maiores', top_maiores):
+            st.dataframe(top_maiores, column_config=formato_ranking, use_container_width=True)
     
     with col2:
         # Top 10 menores taxas
-        top_menores = df_filtrado.nsmallest(10, 'TAXA_100K')[['MUNICÍPIO', 'UF', 'TAXA_100K', 'TOTAL_ATENDIMENTOS', 'pessoas']]
+        with medir('ranking.menores_taxas', df_filtrado) as etapa:
+            top_menores = etapa.saida(
+                df_merged.iloc[ranking.menores('TAXA_100K', 10, posicoes=df_filtrado.index)][colunas_ranking]
+            )
         
         st.markdown("""
         <div style="background: white; padding: 1.5rem; border-radius: 10px; margin-bottom: 1rem;">
@@ -287,23 +331,8 @@ if 'pessoas' in df_filtrado.columns:
         </div>
         """, unsafe_allow_html=True)
         
-        # Formatar a tabela
-        top_menores_display = top_menores.copy()
-        top_menores_display['TAXA_100K'] = top_menores_display['TAXA_100K'].apply(lambda x: f"{x:,.1f}")
-        top_menores_display['pessoas'] = top_menores_display['pessoas'].apply(lambda x: f"{x:,.0f}")
-        top_menores_display['TOTAL_ATENDIMENTOS'] = top_menores_display['TOTAL_ATENDIMENTOS'].apply(lambda x: f"{x:,.0f}")
-        
-        st.dataframe(
-            top_menores_display,
-            column_config={
-                "MUNICÍPIO": "Município",
-                "UF": "UF",
-                "TAXA_100K": "Taxa/100k",
-                "TOTAL_ATENDIMENTOS": "Atendimentos",
-                "pessoas": "População"
-            },
-            use_container_width=True
-        )
+        with medir('render.top_menores', top_menores):
+            st.dataframe(top_menores, column_config=formato_ranking, use_container_width=True)
 
 # 4. MAPA INTERATIVO
 st.markdown("""
@@ -312,82 +341,91 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Criar coordenadas aproximadas para os estados do Nordeste (para demonstração)
-coordenadas_estados = {
-    'MA': {'lat': -4.9609, 'lon': -45.2744, 'nome': 'Maranhão'},
-    'PI': {'lat': -8.2377, 'lon': -43.1001, 'nome': 'Piauí'},
-    'CE': {'lat': -5.4984, 'lon': -39.3206, 'nome': 'Ceará'},
-    'RN': {'lat': -5.4026, 'lon': -36.9541, 'nome': 'Rio Grande do Norte'},
-    'PB': {'lat': -7.2400, 'lon': -36.7810, 'nome': 'Paraíba'},
-    'PE': {'lat': -8.8137, 'lon': -36.9541, 'nome': 'Pernambuco'},
-    'AL': {'lat': -9.5713, 'lon': -36.7820, 'nome': 'Alagoas'},
-    'SE': {'lat': -10.5741, 'lon': -37.3857, 'nome': 'Sergipe'},
-    'BA': {'lat': -12.5797, 'lon': -41.7007, 'nome': 'Bahia'}
-}
-
-# Preparar dados para o mapa
-dados_mapa = df_filtrado.groupby('UF').agg({
-    'TOTAL_ATENDIMENTOS': 'sum',
-    'pessoas': 'sum',
-    'MUNICÍPIO': 'count'
-}).reset_index()
-dados_mapa = dados_mapa.rename(columns={'MUNICÍPIO': 'QTD_MUNICIPIOS'})
-
-# Adicionar coordenadas e calcular taxa
-dados_mapa['lat'] = dados_mapa['UF'].map(lambda x: coordenadas_estados.get(x, {}).get('lat', 0))
-dados_mapa['lon'] = dados_mapa['UF'].map(lambda x: coordenadas_estados.get(x, {}).get('lon', 0))
-dados_mapa['TAXA_100K'] = (dados_mapa['TOTAL_ATENDIMENTOS'] / dados_mapa['pessoas']) * 100000
-dados_mapa['TAXA_100K'] = dados_mapa['TAXA_100K'].round(2)
+# Os mapas dependem também das coordenadas gravadas
+estado_mapas = {**estado_filtros, 'centroides': versao_arquivo(CAMINHO_CENTROIDES)}
 
 # Criar mapa
 col1, col2 = st.columns(2)
 
 with col1:
-    # Mapa de calor por volume
-    fig_mapa_volume = px.scatter_mapbox(
-        dados_mapa,
-        lat="lat",
-        lon="lon",
-        size="TOTAL_ATENDIMENTOS",
-        color="TOTAL_ATENDIMENTOS",
-        hover_name="UF",
-        hover_data={
-            "TOTAL_ATENDIMENTOS": True,
-            "QTD_MUNICIPIOS": True,
-            "TAXA_100K": True,
-            "lat": False,
-            "lon": False
-        },
-        size_max=30,
-        zoom=4,
-        title="🗺️ Mapa de Calor - Volume de Atendimentos por Estado",
-        color_continuous_scale="Viridis",
-        mapbox_style="carto-positron"
+    # Mapa de calor por volume (posição de cada UF: centroide dos municípios ponderado pela população)
+    fig_mapa_volume = figuras.obter(
+        'bi.mapa_volume', estado_mapas,
+        lambda: figura_mapa_uf(dados_mapa_uf(resumo_uf, df_filtrado, centroides), 'TOTAL_ATENDIMENTOS')
     )
-    fig_mapa_volume.update_layout(height=500)
-    st.plotly_chart(fig_mapa_volume, use_container_width=True)
+    with medir('render.mapa_volume'):
+        st.plotly_chart(fig_mapa_volume, use_container_width=True)
 
 with col2:
     # Mapa por taxa
-    fig_mapa_taxa = px.scatter_mapbox(
-        dados_mapa,
-        lat="lat",
-        lon="lon",
-        size="TAXA_100K",
-        color="TAXA_100K",
-        hover_name="UF",
-        hover_data={
-            "TOTAL_ATENDIMENTOS": True,
-            "QTD_MUNICIPIOS": True,
-            "TAXA_100K": True,
-            "lat": False,
-            "lon": False
-        },
-        size_max=30,
-        zoom=4,
-        title="📊 Mapa - Taxa de Atendimentos por 100k hab.",
-        color_continuous_scale="Blues",
-        mapbox_style="carto-positron"
+    fig_mapa_taxa = figuras.obter(
+        'bi.mapa_taxa', estado_mapas,
+        lambda: figura_mapa_uf(dados_mapa_uf(resumo_uf, df_filtrado, centroides), 'TAXA_100K')
+    )
+    with medir('render.mapa_taxa'):
+        st.plotly_chart(fig_mapa_taxa, use_container_width=True)
+
+# Bolhas por município, quando há coordenadas municipais gravadas
+if centroides is not None:
+    fig_mapa_municipios = figuras.obter(
+        'bi.mapa_municipios', estado_mapas, lambda: figura_mapa_municipios(df_filtrado, centroides)
     )
-    fig_mapa_taxa.update_layout(height=500)
-    st.plotly_chart(fig_mapa_taxa, use_container_width=True)
\ No newline at end of file
+    with medir('render.mapa_municipios'):
+        st.plotly_chart(fig_mapa_municipios, use_container_width=True)
+
+# 5. MAPA COROPLÉTICO POR MUNICÍPIO
+st.markdown("""
+<div class="custom-table">
+    <h2>🧭 Mapa Coroplético por Município</h2>
+</div>
+""", unsafe_allow_html=True)
+
+metricas_mapa = {
+    'TAXA_100K': 'Atendimentos por 100k hab.',
+    'TOTAL_ATENDIMENTOS': 'Total de atendimentos',
+}
+rotulos_detalhe = {'baixo': 'Baixo (mais rápido)', 'medio': 'Médio', 'alto': 'Alto'}
+
+col1, col2 = st.columns([2, 1])
+with col1:
+    metrica_mapa = st.radio(
+        "Indicador:",
+        options=list(metricas_mapa),
+        format_func=metricas_mapa.get,
+        horizontal=True
+    )
+with col2:
+    nivel_detalhe = st.select_slider(
+        "Nível de detalhe dos contornos:",
+        options=list(NIVEIS_DETALHE),
+        value=NIVEL_PADRAO,
+        format_func=rotulos_detalhe.get
+    )
+
+with medir(f'geojson.{nivel_detalhe}'):
+    geojson_municipios = carregar_geojson_municipios(nivel_detalhe)
+if geojson_municipios is None:
+    st.info(
+        "🗂️ Malha municipal não encontrada. Baixe a malha municipal do IBGE "
+        "(shapefile, GeoPackage ou GeoJSON com a coluna CD_MUN) e coloque-a em `data/malhas` "
+        "para habilitar o mapa por município."
+    )
+else:
+    caminho_malha = localizar_malha()
+    estado_coropletico = {
+        **estado_filtros,
+        'metrica': metrica_mapa,
+        'nivel': nivel_detalhe,
+        'malha': (caminho_malha, versao_arquivo(caminho_malha)),
+    }
+    fig_coropletico = figuras.obter(
+        'bi.coropletico', estado_coropletico,
+        lambda: figura_coropletico(df_filtrado, geojson_municipios, metrica_mapa, metricas_mapa)
+    )
+    with medir('render.coropletico'):
+        st.plotly_chart(fig_coropletico, use_container_width=True)
+
+# Desempenho do cache de gráficos e tempos das etapas desta execução
+with st.sidebar:
+    painel_cache_figuras(figuras)
+painel_desempenho()
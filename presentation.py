@@ -1,5 +1,7 @@
 import streamlit as st
-import pandas as pd
+
+from core.data import carregar_perfil_atendimentos, carregar_perfil_ibge
+from core.instrumentation import iniciar_pagina, medir, painel_desempenho
 
 # Configuração da página
 st.set_page_config(
@@ -8,6 +10,7 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
+iniciar_pagina('presentation')
 
 # Carregar CSS personalizado
 def load_css():
@@ -49,45 +52,45 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Carregar dados na session state
-if "df_original" not in st.session_state:
-    try:
-        st.session_state.df_original = pd.read_csv('./data/DADOS.txt')
-        st.success("✅ Dados de atendimentos SUS carregados com sucesso!")
-    except Exception as e:
-        st.error(f"❌ Erro ao carregar dados de atendimentos: {e}")
-
-if "df_ibge" not in st.session_state:
-    try:
-        st.session_state.df_ibge = pd.read_csv(
-            './data/populacao_municipios/Censo 2022 - População residente - Municípios.csv', 
-            sep=';'
-        )
-        st.success("✅ Dados do IBGE carregados com sucesso!")
-    except Exception as e:
-        st.error(f"❌ Erro ao carregar dados do IBGE: {e}")
+# Carregar o perfil dos dados (calculado na ingestão, sem ler as linhas)
+perfil_sus = None
+perfil_ibge = None
+
+try:
+    with medir('perfil.atendimentos'):
+        perfil_sus = carregar_perfil_atendimentos()
+    st.success("✅ Dados de atendimentos SUS carregados com sucesso!")
+except Exception as e:
+    st.error(f"❌ Erro ao carregar dados de atendimentos: {e}")
+
+try:
+    with medir('perfil.ibge'):
+        perfil_ibge = carregar_perfil_ibge()
+    st.success("✅ Dados do IBGE carregados com sucesso!")
+except Exception as e:
+    st.error(f"❌ Erro ao carregar dados do IBGE: {e}")
 
 # Resumo dos dados
 st.markdown('<div class="metric-container">', unsafe_allow_html=True)
 
 col1, col2, col3 = st.columns(3)
 
-if "df_original" in st.session_state:
+if perfil_sus is not None:
     with col1:
         st.markdown(f"""
         <div class="metric-card">
             <div class="metric-title">📋 Total de Atendimentos</div>
-            <div class="metric-value">{st.session_state.df_original.shape[0]:,}</div>
+            <div class="metric-value">{perfil_sus['linhas']:,}</div>
             <div class="metric-desc">Registros do SUS</div>
         </div>
         """, unsafe_allow_html=True)
 
-if "df_ibge" in st.session_state:
+if perfil_ibge is not None:
     with col2:
         st.markdown(f"""
         <div class="metric-card">
             <div class="metric-title">🏙️ Municípios no IBGE</div>
-            <div class="metric-value">{st.session_state.df_ibge.shape[0]:,}</div>
+            <div class="metric-value">{perfil_ibge['linhas']:,}</div>
             <div class="metric-desc">Registros municipais</div>
         </div>
         """, unsafe_allow_html=True)
@@ -125,7 +128,7 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Análise Rápida dos Dados
-if "df_original" in st.session_state and "df_ibge" in st.session_state:
+if perfil_sus is not None and perfil_ibge is not None:
     st.markdown("""
     <div class="custom-table">
         <h3>🚀 Análise Rápida dos Dados</h3>
@@ -138,8 +141,8 @@ if "df_original" in st.session_state and "df_ibge" in st.session_state:
         st.markdown(f"""
         <div class="custom-table">
             <h4>📋 Dataset de Atendimentos SUS</h4>
-            <p><strong>Dimensões:</strong> {st.session_state.df_original.shape[0]} linhas × {st.session_state.df_original.shape[1]} colunas</p>
-            <p><strong>Colunas:</strong> {', '.join(st.session_state.df_original.columns)}</p>
+            <p><strong>Dimensões:</strong> {perfil_sus['linhas']} linhas × {len(perfil_sus['colunas'])} colunas</p>
+            <p><strong>Colunas:</strong> {', '.join(perfil_sus['colunas'])}</p>
             <p><strong>Tipos de dados:</strong></p>
             <ul>
                 <li>ID: Identificador único</li>
@@ -153,8 +156,8 @@ if "df_original" in st.session_state and "df_ibge" in st.session_state:
         st.markdown(f"""
         <div class="custom-table">
             <h4>🏙️ Dataset do IBGE</h4>
-            <p><strong>Dimensões:</strong> {st.session_state.df_ibge.shape[0]} linhas × {st.session_state.df_ibge.shape[1]} colunas</p>
-            <p><strong>Colunas:</strong> {', '.join(st.session_state.df_ibge.columns)}</p>
+            <p><strong>Dimensões:</strong> {perfil_ibge['linhas']} linhas × {len(perfil_ibge['colunas'])} colunas</p>
+            <p><strong>Colunas:</strong> {', '.join(perfil_ibge['colunas'])}</p>
             <p><strong>Tipos de dados:</strong></p>
             <ul>
                 <li>Municípios: Nomes dos municípios</li>
@@ -163,4 +166,7 @@ if "df_original" in st.session_state and "df_ibge" in st.session_state:
                 <li>pessoas: Dados populacionais numéricos</li>
             </ul>
         </div>
-        """, unsafe_allow_html=True)
\ No newline at end of file
+        """, unsafe_allow_html=True)
+
+# Tempos das etapas desta execução (opcional)
+painel_desempenho()